@@ -0,0 +1,202 @@
+"""
+Collector Plugin Interface
+
+Every grant source is a BaseCollector subclass. Collectors are created from
+their config/sources-grants.yaml entry and expose one fetch contract:
+
+- fetch() yields opportunity dicts (sync collectors)
+- fetch_async() async-yields opportunity dicts (async collectors)
+- collect_batches() streams whichever one the collector implements in
+  fixed-size batches, so the runner can store a source's output as it
+  arrives instead of holding the whole catalog
+- collect() drains everything into one list (small sources, tests)
+
+collect_batches() and collect() take a deadline and a cancel event. The
+runner can't stop a collector thread from outside, so collectors call
+check_cancelled() between requests and stop at the next check.
+
+Collectors that keep sync state (watermarks, seen ids)
+stage it during a run and only persist it in commit_sync_state(), which the
+runner calls once the results have been stored. A run that times out or
+fails before that point is repeated in full next time.
+
+Delta collectors skip listings that haven't changed. So the store doesn't
+mistake those for withdrawn listings, a delta run leaves the ids of
+everything still listed upstream in `listed_ids`; the runner refreshes
+their last-seen time once the run is accepted.
+
+HTTP GETs go through http_get(). When the runner hands the collector its
+shared APIResponseCache (http_cache), responses are cached for the source's
+cache_ttl_hours and then revalidated with ETag / Last-Modified, and
+concurrent requests for the same URL share one fetch.
+
+Capability flags tell the runner what a collector can do:
+
+- supports_delta: fetch(delta=True) only yields changes since the last run
+- supports_pagination: the collector pages through a remote API itself
+- is_async: the collector implements fetch_async() instead of fetch()
+"""
+
+import time
+import asyncio
+import logging
+import threading
+import requests
+from typing import Any, AsyncIterator, Callable, Dict, Iterator, List, Optional, Set
+
+from utils.cache import NOT_MODIFIED, APIResponseCache, response_validators
+
+logger = logging.getLogger(__name__)
+
+
+class CollectionCancelled(Exception):
+    """A collector run was cancelled or passed its deadline"""
+
+
+class BaseCollector:
+    """Base class for grant source collectors"""
+
+    supports_delta: bool = False
+    supports_pagination: bool = False
+    is_async: bool = False
+
+    def __init__(self, source_config: Dict[str, Any] = None, org_profile: Any = None, name: str = None):
+        """
+        Args:
+            source_config: The source's entry from sources-grants.yaml
+            org_profile: OrgProfile, for collectors that search by keyword
+            name: Source name (the YAML key)
+        """
+        self.source_config = source_config or {}
+        self.org_profile = org_profile
+        self.name = name or self.__class__.__name__
+        self._deadline: Optional[float] = None
+        self._cancel: Optional[threading.Event] = None
+        # Delta runs: ids still listed upstream, including ones not yielded
+        self.listed_ids: Optional[Set[str]] = None
+        # Shared response cache, set by the runner; None fetches directly
+        self.http_cache: Optional[APIResponseCache] = None
+        self.cache_ttl_hours = self.source_config.get('cache_ttl_hours', 6)
+
+    def fetch(self, delta: bool = False) -> Iterator[Dict[str, Any]]:
+        """
+        Yield opportunity dicts
+
+        Args:
+            delta: Only yield opportunities changed since the last run
+                (ignored unless supports_delta is set)
+        """
+        raise NotImplementedError(f"{self.__class__.__name__} does not implement fetch()")
+
+    async def fetch_async(self, delta: bool = False) -> AsyncIterator[Dict[str, Any]]:
+        """Async variant of fetch() for collectors with is_async set"""
+        raise NotImplementedError(f"{self.__class__.__name__} does not implement fetch_async()")
+        yield  # pragma: no cover - makes this an async generator
+
+    def use_delta(self) -> bool:
+        """Whether this run should ask for changes only"""
+        return self.supports_delta and self.source_config.get('sync_mode', 'full') == 'delta'
+
+    def check_cancelled(self):
+        """Raise CollectionCancelled if this run was cancelled or is past its deadline"""
+        if self._cancel is not None and self._cancel.is_set():
+            raise CollectionCancelled(f"{self.name} cancelled")
+        if self._deadline is not None and time.time() > self._deadline:
+            raise CollectionCancelled(f"{self.name} passed its deadline")
+
+    def http_get(self, url: str, params: Optional[Dict[str, Any]] = None,
+                 headers: Optional[Dict[str, str]] = None, timeout: float = 30,
+                 session: Optional[requests.Session] = None,
+                 parse: Callable[[requests.Response], Any] = lambda response: response.text) -> Any:
+        """
+        GET a URL, through http_cache when there is one
+
+        A cached response is reused until cache_ttl_hours have passed and
+        then revalidated before it is returned, so a run never works from a
+        stale page.
+
+        Args:
+            session: Session to send the request on (default: plain requests)
+            parse: Turns the response into the value returned and cached;
+                it must be JSON-compatible (text, parsed JSON)
+
+        Raises:
+            requests.RequestException: The request failed
+        """
+        http = session or requests
+
+        def fetch(validators: Dict[str, str]):
+            response = http.get(url, params=params, headers={**(headers or {}), **validators}, timeout=timeout)
+            if response.status_code == 304:
+                return NOT_MODIFIED
+            response.raise_for_status()
+            return parse(response), response_validators(response)
+
+        if self.http_cache is None:
+            value, _ = fetch({})
+            return value
+
+        value = self.http_cache.get_or_fetch(self.name, {'url': url, **(params or {})}, fetch,
+                                             ttl_hours=self.cache_ttl_hours, conditional=True,
+                                             serve_stale=False)
+        if value is None:
+            raise requests.RequestException(f"Fetching {url} failed")
+        return value
+
+    def collect_batches(self, batch_size: int = 500, deadline: Optional[float] = None,
+                        cancel: Optional[threading.Event] = None) -> Iterator[List[Dict[str, Any]]]:
+        """
+        Run the collector, yielding its opportunities in batches
+
+        Only one batch is held at a time. Cancellation is checked after
+        every opportunity and again before each batch is handed over.
+
+        Args:
+            batch_size: Opportunities per batch (the last one may be smaller)
+            deadline: time.time() after which the run stops
+            cancel: Event the runner sets to stop the run
+
+        Raises:
+            CollectionCancelled: The run was stopped; sync state was not committed
+        """
+        self._deadline, self._cancel = deadline, cancel
+        delta = self.use_delta()
+        opportunities = self._iter_async(delta) if self.is_async else self.fetch(delta=delta)
+        batch = []
+        for opportunity in opportunities:
+            batch.append(opportunity)
+            self.check_cancelled()
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        self.check_cancelled()
+        if batch:
+            yield batch
+
+    def collect(self, deadline: Optional[float] = None,
+                cancel: Optional[threading.Event] = None) -> List[Dict[str, Any]]:
+        """Run the collector to completion and return everything it yielded"""
+        return [opportunity for batch in self.collect_batches(deadline=deadline, cancel=cancel)
+                for opportunity in batch]
+
+    def _iter_async(self, delta: bool) -> Iterator[Dict[str, Any]]:
+        """Drive fetch_async() on a private event loop, one opportunity at a time"""
+        loop = asyncio.new_event_loop()
+        agen = self.fetch_async(delta=delta)
+        try:
+            while True:
+                try:
+                    yield loop.run_until_complete(agen.__anext__())
+                except StopAsyncIteration:
+                    return
+        finally:
+            loop.run_until_complete(agen.aclose())
+            loop.close()
+
+    def commit_sync_state(self):
+        """
+        Persist sync state staged by the last collect()
+
+        Call only after that run's results have been stored. Collectors
+        without sync state have nothing to do.
+        """
@@ -9,15 +9,18 @@ Reference implementations:
 """
 
 import logging
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator
+
+from collectors.base import BaseCollector
 
 logger = logging.getLogger(__name__)
 
 
-class FoundationCollector:
+class FoundationCollector(BaseCollector):
     """Collector for foundation grant opportunities"""
 
-    def __init__(self):
+    def __init__(self, source_config: Dict[str, Any] = None, org_profile: Any = None, name: str = None):
+        super().__init__(source_config, org_profile, name or "kauffman")
         # Kauffman Foundation - primary target
         self.kauffman_url = "https://www.kauffman.org/grants/"
 
@@ -25,6 +28,10 @@ class FoundationCollector:
         # Contains historical foundation grants
         self.grantmakers_api = None  # TODO: Research API access
 
+    def fetch(self, delta: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yield Kauffman Foundation opportunities"""
+        yield from self.fetch_kauffman_opportunities()
+
     def fetch_kauffman_opportunities(self) -> List[Dict[str, Any]]:
         """
         Fetch Kauffman Foundation opportunities
@@ -4,36 +4,82 @@ Grants.gov API Collector
 Fetches federal grant opportunities from grants.gov
 See: https://www.grants.gov/web/grants/search-grants.html
 
+The full catalog comes from the daily XML extract (a zip of one large XML
+document). The extract is hundreds of MB uncompressed, so it is downloaded
+to disk in chunks and parsed incrementally with iterparse - each opportunity
+element is converted to a dict and cleared before the next one is read.
+
+Delta mode (fetch_updates) keeps a sync watermark on disk and only emits
+opportunities created, modified or closed since the last successful run.
+The new watermark is staged when the stream ends and only written by
+commit_sync_state(), after the caller has stored the batch.
+
 Reference implementations:
 - archive/src/collectors/rss_collector_enhanced.py (caching patterns)
 - https://github.com/ericmuckley/foa-finder (XML parsing)
 - https://github.com/HHS/simpler-grants-gov (official API)
 """
 
+import os
+import re
+import json
+import html
+import zipfile
 import logging
-from typing import List, Dict, Any, Optional
-from datetime import datetime
+import requests
+import xml.etree.ElementTree as ET
+from typing import List, Dict, Any, Optional, Iterator
+from datetime import datetime, timedelta
+
+from collectors.base import BaseCollector
 
 logger = logging.getLogger(__name__)
 
+# Daily extract published by grants.gov (see https://www.grants.gov/xml-extract)
+EXTRACT_URL_TEMPLATE = "https://prod-grants-gov-chatbot.s3.amazonaws.com/extracts/GrantsDBExtract{date}v2.zip"
+
+# Top-level record elements in the extract
+OPPORTUNITY_TAGS = {'OpportunitySynopsisDetail_1_0', 'OpportunityForecastDetail_1_0'}
+
+# Child elements that may repeat within a single opportunity
+MULTI_VALUE_TAGS = {'EligibleApplicants', 'CFDANumbers', 'CategoryOfFundingActivity', 'FundingInstrumentType'}
 
-class GrantsGovCollector:
+
+class GrantsGovCollector(BaseCollector):
     """Collector for grants.gov federal opportunities"""
 
-    def __init__(self):
+    supports_delta = True
+
+    def __init__(self, source_config: Dict[str, Any] = None, org_profile: Any = None, name: str = None,
+                 cache_dir: str = "cache/grants_gov", timeout: int = 60):
+        super().__init__(source_config, org_profile, name or "grants_gov")
         self.base_url = "https://www.grants.gov/grantsws/rest"
-        # TODO: Implement XML download approach (daily export)
-        # or REST API approach
+        self.cache_dir = cache_dir
+        self.timeout = timeout
+        self.chunk_size = 1024 * 1024  # 1MB download chunks
+        self.sync_state_file = os.path.join(cache_dir, "sync_state.json")
+        self._pending_sync_state: Optional[Dict[str, Any]] = None
+
+    def fetch(self, delta: bool = False) -> Iterator[Dict[str, Any]]:
+        """Stream the full catalog, or only changes when delta is set"""
+        if delta:
+            yield from self.iter_updates()
+            return
 
-    def fetch_opportunities(self, keywords: List[str] = None) -> List[Dict[str, Any]]:
+        extract_path = self.download_extract()
+        if extract_path:
+            yield from self.iter_extract(extract_path)
+
+    def fetch_opportunities(self, keywords: List[str] = None) -> Iterator[Dict[str, Any]]:
         """
-        Fetch grant opportunities matching keywords
+        Stream grant opportunities matching keywords
 
         Args:
-            keywords: List of keywords to filter by (from org profile)
+            keywords: Optional keywords to pre-filter by. Leave empty to get
+                the full federal catalog (relevance is scored by the matcher).
 
-        Returns:
-            List of grant opportunity dicts with:
+        Yields:
+            Grant opportunity dicts with:
             - opportunity_id
             - title
             - agency
@@ -44,14 +90,341 @@ class GrantsGovCollector:
             - award_floor
             - url
         """
-        # TODO: Implement
-        # Option 1: Download daily XML export and parse
-        # Option 2: Use REST API with search
-        logger.warning("GrantsGovCollector.fetch_opportunities() not implemented")
-        return []
+        extract_path = self.download_extract()
+        if not extract_path:
+            return
+
+        count = 0
+        for opportunity in self.iter_extract(extract_path):
+            if keywords and not self._matches_keywords(opportunity, keywords):
+                continue
+            count += 1
+            yield opportunity
+
+        logger.info(f"Parsed {count} opportunities from grants.gov extract")
+
+    def fetch_updates(self) -> List[Dict[str, Any]]:
+        """
+        Fetch only opportunities that changed since the last successful sync
+
+        Each returned dict carries a 'change_type' of 'new', 'updated' or
+        'closed'. The first run (no watermark yet) returns the full catalog.
+        Call commit_sync_state() once the results are stored.
+        """
+        return list(self.iter_updates())
+
+    def iter_updates(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream opportunities that changed since the last successful sync
+
+        The new watermark is staged once the generator has been consumed to
+        the end and only persisted by commit_sync_state(), so a run that is
+        interrupted or never stored is repeated in full next time.
+        """
+        self._pending_sync_state = None
+        self.listed_ids = None
+        extract_path = self.download_extract()
+        if not extract_path:
+            return
+
+        state = self._load_sync_state()
+        extract_name = os.path.basename(extract_path)
+        if state.get('extract') == extract_name:
+            logger.info(f"grants.gov extract {extract_name} already synced, no updates")
+            return
+
+        counts = {'new': 0, 'updated': 0, 'closed': 0}
+        tracker = _WatermarkTracker(state.get('watermark'), state.get('boundary_ids', []))
+        today = datetime.now().date().isoformat()
+        last_run = state.get('last_run')
+        listed_ids = set()
+
+        for opportunity in self.iter_extract(extract_path):
+            listed_ids.add(opportunity['opportunity_id'])
+            change_type = tracker.classify(opportunity)
+            if not change_type and last_run and opportunity['deadline']:
+                if last_run < opportunity['deadline'] <= today:
+                    change_type = 'closed'
+            if change_type:
+                opportunity['change_type'] = change_type
+                counts[change_type] += 1
+                yield opportunity
+
+        # Unchanged records aren't yielded but are still listed
+        self.listed_ids = listed_ids
+        self._pending_sync_state = {
+            'watermark': tracker.new_watermark,
+            'boundary_ids': sorted(tracker.new_boundary_ids),
+            'last_run': today,
+            'extract': extract_name,
+            'synced_at': datetime.now().isoformat(),
+        }
+
+        logger.info(f"grants.gov delta sync: {counts['new']} new, {counts['updated']} updated, "
+                    f"{counts['closed']} closed (watermark {tracker.new_watermark})")
+
+    def commit_sync_state(self):
+        """Persist the watermark staged by the last completed delta run"""
+        if self._pending_sync_state is None:
+            return
+        self._save_sync_state(self._pending_sync_state)
+        self._pending_sync_state = None
+
+    def reset_sync(self):
+        """Forget the sync watermark so the next delta run returns everything"""
+        self._pending_sync_state = None
+        if os.path.exists(self.sync_state_file):
+            os.remove(self.sync_state_file)
+            logger.info("grants.gov sync watermark reset")
+
+    def _load_sync_state(self) -> Dict[str, Any]:
+        """Load the persisted sync watermark"""
+        if os.path.exists(self.sync_state_file):
+            try:
+                with open(self.sync_state_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading grants.gov sync state: {e}")
+        return {}
+
+    def _save_sync_state(self, state: Dict[str, Any]):
+        """Persist the sync watermark atomically"""
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            tmp_path = f"{self.sync_state_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.sync_state_file)
+        except Exception as e:
+            logger.error(f"Error saving grants.gov sync state: {e}")
 
     def get_opportunity_details(self, opportunity_id: str) -> Optional[Dict[str, Any]]:
         """Fetch full details for a specific opportunity"""
         # TODO: Implement
         logger.warning("GrantsGovCollector.get_opportunity_details() not implemented")
         return None
+
+    def download_extract(self, date: datetime = None) -> Optional[str]:
+        """
+        Download the daily XML extract zip to the cache directory
+
+        The extract for today may not be published yet, so this falls back
+        to the previous day. An extract already on disk is reused.
+
+        Returns:
+            Path to the downloaded zip, or None if no extract was available
+        """
+        os.makedirs(self.cache_dir, exist_ok=True)
+        date = date or datetime.now()
+
+        for days_back in range(2):
+            date_str = (date - timedelta(days=days_back)).strftime("%Y%m%d")
+            path = os.path.join(self.cache_dir, f"GrantsDBExtract{date_str}v2.zip")
+
+            if os.path.exists(path):
+                logger.info(f"Using cached grants.gov extract {path}")
+                return path
+
+            url = EXTRACT_URL_TEMPLATE.format(date=date_str)
+            try:
+                self._download_file(url, path)
+                self._remove_old_extracts(keep=path)
+                return path
+            except requests.exceptions.HTTPError as e:
+                logger.info(f"grants.gov extract for {date_str} not available: {e.response.status_code}")
+            except Exception as e:
+                logger.error(f"Failed to download grants.gov extract {url}: {str(e)}")
+
+        return None
+
+    def _download_file(self, url: str, path: str):
+        """Stream a URL to disk without holding the body in memory"""
+        logger.info(f"Downloading grants.gov extract from {url}")
+        tmp_path = f"{path}.part"
+        with requests.get(url, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            with open(tmp_path, 'wb') as f:
+                for chunk in response.iter_content(chunk_size=self.chunk_size):
+                    self.check_cancelled()
+                    f.write(chunk)
+        os.replace(tmp_path, path)
+
+    def _remove_old_extracts(self, keep: str):
+        """Delete previously downloaded extracts so only one stays on disk"""
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.startswith("GrantsDBExtract") and path != keep:
+                try:
+                    os.remove(path)
+                except OSError as e:
+                    logger.debug(f"Could not remove old extract {path}: {e}")
+
+    def iter_extract(self, extract_path: str) -> Iterator[Dict[str, Any]]:
+        """
+        Stream opportunities out of a grants.gov extract
+
+        Accepts either the zip as published or a bare XML file. Memory use
+        stays flat regardless of extract size: the XML is decompressed on the
+        fly and each record is cleared from the tree once converted.
+
+        An opportunity can appear both as a forecast and as the synopsis
+        that replaced it. Everything streams straight through; a forecast
+        after its synopsis is dropped, and one before it is replaced when
+        the synopsis is stored under the same opportunity_id.
+        """
+        if zipfile.is_zipfile(extract_path):
+            with zipfile.ZipFile(extract_path) as archive:
+                xml_names = [n for n in archive.namelist() if n.lower().endswith('.xml')]
+                if not xml_names:
+                    logger.error(f"No XML file found in {extract_path}")
+                    return
+                with archive.open(xml_names[0]) as xml_file:
+                    yield from self._prefer_synopses(self._iter_xml(xml_file))
+        else:
+            with open(extract_path, 'rb') as xml_file:
+                yield from self._prefer_synopses(self._iter_xml(xml_file))
+
+    def _prefer_synopses(self, opportunities: Iterator[Dict[str, Any]]) -> Iterator[Dict[str, Any]]:
+        """Drop forecasts whose opportunity already had a synopsis in the extract"""
+        synopsis_ids = set()
+        for opportunity in opportunities:
+            if not opportunity['is_forecast']:
+                synopsis_ids.add(opportunity['opportunity_id'])
+            elif opportunity['opportunity_id'] in synopsis_ids:
+                continue
+            yield opportunity
+
+    def _iter_xml(self, xml_file) -> Iterator[Dict[str, Any]]:
+        """Incrementally parse opportunity records from an XML stream"""
+        context = ET.iterparse(xml_file, events=('start', 'end'))
+        root = None
+        for event, elem in context:
+            if root is None:
+                root = elem
+                continue
+            if event != 'end' or _local_name(elem.tag) not in OPPORTUNITY_TAGS:
+                continue
+            # Delta runs can read many records between yields
+            self.check_cancelled()
+
+            try:
+                yield self._parse_opportunity(elem)
+            except Exception as e:
+                logger.debug(f"Error parsing grants.gov record: {str(e)}")
+            finally:
+                # Drop the finished record (and any siblings) from the tree
+                elem.clear()
+                root.clear()
+
+    def _parse_opportunity(self, elem: ET.Element) -> Dict[str, Any]:
+        """Convert one opportunity element into the collector's dict shape"""
+        fields: Dict[str, Any] = {}
+        for child in elem:
+            tag = _local_name(child.tag)
+            text = (child.text or '').strip()
+            if tag in MULTI_VALUE_TAGS:
+                fields.setdefault(tag, []).append(text)
+            else:
+                fields[tag] = text
+
+        opportunity_id = fields.get('OpportunityID', '')
+        eligibility_codes = [c for c in fields.get('EligibleApplicants', []) if c]
+
+        return {
+            'opportunity_id': opportunity_id,
+            'opportunity_number': fields.get('OpportunityNumber', ''),
+            'title': html.unescape(fields.get('OpportunityTitle', '')),
+            'agency': fields.get('AgencyName', ''),
+            'agency_code': fields.get('AgencyCode', ''),
+            'description': _clean_html(fields.get('Description', '')),
+            'deadline': _parse_date(fields.get('CloseDate')),
+            'posted_date': _parse_date(fields.get('PostDate')),
+            'last_updated': _parse_date(fields.get('LastUpdatedDate')),
+            'eligibility': _clean_html(fields.get('AdditionalInformationOnEligibility', '')),
+            'eligibility_codes': eligibility_codes,
+            'award_ceiling': _parse_amount(fields.get('AwardCeiling')),
+            'award_floor': _parse_amount(fields.get('AwardFloor')),
+            'cfda_numbers': fields.get('CFDANumbers', []),
+            'category': fields.get('CategoryOfFundingActivity', []),
+            'is_forecast': _local_name(elem.tag) == 'OpportunityForecastDetail_1_0',
+            'url': f"https://www.grants.gov/search-results-detail/{opportunity_id}",
+            'source': 'grants.gov',
+        }
+
+    def _matches_keywords(self, opportunity: Dict[str, Any], keywords: List[str]) -> bool:
+        """Check if any keyword appears in the title or description"""
+        text = f"{opportunity['title']} {opportunity['description']}".lower()
+        return any(keyword.lower().replace('_', ' ') in text for keyword in keywords)
+
+
+class _WatermarkTracker:
+    """
+    Decides whether an opportunity changed since the previous watermark
+
+    grants.gov dates have day granularity, so opportunities updated on the
+    watermark day itself are told apart by remembering their ids.
+    """
+
+    def __init__(self, watermark: Optional[str], boundary_ids: List[str]):
+        self.watermark = watermark
+        self.boundary_ids = set(boundary_ids)
+        self.new_watermark = watermark
+        self.new_boundary_ids = set(boundary_ids)
+
+    def classify(self, opportunity: Dict[str, Any]) -> Optional[str]:
+        """Return 'new', 'updated' or None and advance the pending watermark"""
+        updated = opportunity['last_updated'] or opportunity['posted_date']
+        self._advance(updated, opportunity['opportunity_id'])
+
+        if self.watermark is None:
+            return 'new'
+        if not updated or updated < self.watermark:
+            return None
+        if updated == self.watermark and opportunity['opportunity_id'] in self.boundary_ids:
+            return None
+
+        posted = opportunity['posted_date']
+        if posted and posted >= self.watermark:
+            return 'new'
+        return 'updated'
+
+    def _advance(self, updated: Optional[str], opportunity_id: str):
+        if not updated:
+            return
+        if self.new_watermark is None or updated > self.new_watermark:
+            self.new_watermark = updated
+            self.new_boundary_ids = {opportunity_id}
+        elif updated == self.new_watermark:
+            self.new_boundary_ids.add(opportunity_id)
+
+
+def _local_name(tag: str) -> str:
+    """Strip the XML namespace from a tag"""
+    return tag.rsplit('}', 1)[-1]
+
+
+def _clean_html(text: str) -> str:
+    """Remove HTML tags and entities and collapse whitespace"""
+    text = re.sub('<[^<]+?>', ' ', html.unescape(text or ''))
+    return ' '.join(text.split())
+
+
+def _parse_date(value: Optional[str]) -> Optional[str]:
+    """Convert grants.gov MMDDYYYY dates to ISO format"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value.strip(), "%m%d%Y").date().isoformat()
+    except ValueError:
+        return None
+
+
+def _parse_amount(value: Optional[str]) -> Optional[float]:
+    """Parse an award amount, treating blanks and zero as unknown"""
+    if not value:
+        return None
+    try:
+        amount = float(value.replace(',', '').replace('$', ''))
+    except ValueError:
+        return None
+    return amount or None
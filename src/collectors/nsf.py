@@ -4,27 +4,94 @@ NSF Awards API Collector
 Fetches National Science Foundation grant opportunities
 See: https://www.nsf.gov/awardsearch/
 
+The Awards API returns 25 records per page addressed by a 1-based offset.
+Every keyword's first page is requested concurrently; once a page reports
+the total count the remaining pages are queued on the same bounded pool.
+Awards are yielded as pages arrive and de-duplicated by award id.
+
+Award pages and program announcement RSS feeds go through the collector's
+response cache (BaseCollector.http_get): within cache_ttl_hours a repeat
+request is served from the cache, after that it is a conditional GET with
+the stored ETag/Last-Modified. Only feed entries not seen before are
+emitted. Seen ids are staged and only written (atomically) by
+commit_sync_state(), after the caller has stored the announcements.
+
 Reference implementations:
 - https://github.com/samapriya/nsfsearch (CLI tool)
 - https://github.com/titipata/grant_database (parser)
 """
 
+import os
+import re
+import json
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import requests
+import feedparser
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from datetime import datetime, timedelta
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+from typing import List, Dict, Any, Optional, Iterator, Tuple
+
+from collectors.base import BaseCollector, CollectionCancelled
 
 logger = logging.getLogger(__name__)
 
+# Only request the fields we map - keeps responses small
+AWARD_FIELDS = [
+    'id', 'title', 'abstractText', 'startDate', 'expDate',
+    'awardeeName', 'piFirstName', 'piLastName', 'fundProgramName',
+]
+
+PAGE_SIZE = 25  # Fixed by the API
 
-class NSFCollector:
+
+class NSFCollector(BaseCollector):
     """Collector for NSF funding opportunities"""
 
-    def __init__(self):
-        self.api_url = "https://api.nsf.gov/services/v1/awards.json"
+    supports_pagination = True
+
+    def __init__(self, source_config: Dict[str, Any] = None, org_profile: Any = None, name: str = None,
+                 timeout: int = 30):
+        super().__init__(source_config, org_profile, name or "nsf")
+        self.api_url = self.source_config.get('api_url', "https://api.nsf.gov/services/v1/awards.json")
+        self.timeout = timeout
+        self.max_concurrency = self.source_config.get('max_concurrency', 4)
+        self.max_results_per_keyword = self.source_config.get('max_results_per_keyword', 500)
+        self.awards_since_days = self.source_config.get('awards_since_days', 730)
+        self.session = self._create_session()
         # NSF also has RSS feeds for program announcements
-        self.rss_feeds = [
-            # TODO: Add relevant NSF program feeds
-            # Based on focus areas: entrepreneurship, AI, pedagogy
-        ]
+        self.rss_feeds = self.source_config.get('rss_feeds', [])
+        self.feed_state_file = os.path.join(
+            self.source_config.get('cache_dir', "cache/nsf"), "feed_state.json"
+        )
+        self.max_seen_per_feed = 1000
+        self._pending_feed_state: Optional[Dict[str, Any]] = None
+
+    def _create_session(self) -> requests.Session:
+        """Create a requests session with retry strategy"""
+        session = requests.Session()
+        retry_strategy = Retry(
+            total=3,
+            backoff_factor=1,
+            status_forcelist=[429, 500, 502, 503, 504],
+            allowed_methods=["GET"]
+        )
+        adapter = HTTPAdapter(
+            max_retries=retry_strategy,
+            pool_connections=self.max_concurrency,
+            pool_maxsize=self.max_concurrency
+        )
+        session.mount("https://", adapter)
+        session.headers.update({'User-Agent': 'GrantBot/0.2 (NSF collector)'})
+        return session
+
+    def fetch(self, delta: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yield new program announcements, then awards for the org profile's focus areas"""
+        yield from self.iter_program_announcements()
+        keywords = self.org_profile.focus_areas if self.org_profile else None
+        yield from self.iter_awards(keywords or [])
 
     def fetch_opportunities(self, keywords: List[str] = None) -> List[Dict[str, Any]]:
         """
@@ -36,14 +103,269 @@ class NSFCollector:
         Returns:
             List of opportunity dicts
         """
-        # TODO: Implement using NSF Awards API
-        # Fields: id, title, abstractText, startDate, expDate,
-        #         awardeeName, piFirstName, piLastName, fundProgramName
-        logger.warning("NSFCollector.fetch_opportunities() not implemented")
+        return list(self.iter_awards(keywords or []))
+
+    def iter_awards(self, keywords: List[str]) -> Iterator[Dict[str, Any]]:
+        """
+        Stream awards matching any of the keywords
+
+        Pages for all keywords share one pool of max_concurrency workers.
+        Awards found under several keywords are yielded once.
+        """
+        keywords = list(dict.fromkeys(k.replace('_', ' ').strip() for k in keywords if k and k.strip()))
+        if not keywords:
+            return
+
+        seen_ids = set()
+        pages_fetched = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency) as executor:
+            pending = {
+                executor.submit(self._fetch_page, keyword, 1): (keyword, 1)
+                for keyword in keywords
+            }
+
+            while pending:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                try:
+                    self.check_cancelled()
+                except CollectionCancelled:
+                    # Leave only the in-flight requests for the pool to wait on
+                    for future in pending:
+                        future.cancel()
+                    raise
+                for future in done:
+                    keyword, offset = pending.pop(future)
+                    try:
+                        awards, total = future.result()
+                    except Exception as e:
+                        logger.warning(f"NSF page {offset} for {keyword!r} failed: {str(e)}")
+                        continue
+                    pages_fetched += 1
+
+                    for next_offset in self._next_offsets(offset, len(awards), total):
+                        next_future = executor.submit(self._fetch_page, keyword, next_offset)
+                        pending[next_future] = (keyword, next_offset)
+
+                    for award in awards:
+                        award_id = award.get('id')
+                        if not award_id or award_id in seen_ids:
+                            continue
+                        seen_ids.add(award_id)
+                        yield self._award_to_opportunity(award, keyword)
+
+        logger.info(f"NSF: {len(seen_ids)} unique awards from {pages_fetched} pages "
+                    f"across {len(keywords)} keywords")
+
+    def _next_offsets(self, offset: int, page_count: int, total: Optional[int]) -> List[int]:
+        """Offsets to queue after a page has arrived"""
+        limit = self.max_results_per_keyword
+        if total is not None:
+            # First page tells us everything that is left - queue it all at once
+            if offset != 1:
+                return []
+            last = min(total, limit)
+            return list(range(1 + PAGE_SIZE, last + 1, PAGE_SIZE))
+
+        # No total reported - walk forward one page at a time until a short page
+        next_offset = offset + PAGE_SIZE
+        if page_count == PAGE_SIZE and next_offset <= limit:
+            return [next_offset]
         return []
 
+    def _fetch_page(self, keyword: str, offset: int) -> Tuple[List[Dict[str, Any]], Optional[int]]:
+        """
+        Fetch one page of awards
+
+        Returns:
+            (awards, total_count) - total_count is None if not reported
+        """
+        params = {
+            'keyword': f'"{keyword}"' if ' ' in keyword else keyword,
+            'printFields': ','.join(AWARD_FIELDS),
+            'offset': offset,
+            'rpp': PAGE_SIZE,
+        }
+        if self.awards_since_days:
+            since = datetime.now() - timedelta(days=self.awards_since_days)
+            params['dateStart'] = since.strftime("%m/%d/%Y")
+
+        body = self.http_get(self.api_url, params=params, timeout=self.timeout, session=self.session,
+                             parse=lambda response: response.json()).get('response', {})
+
+        total = body.get('metadata', {}).get('totalCount')
+        return body.get('award', []), int(total) if total is not None else None
+
+    def _award_to_opportunity(self, award: Dict[str, Any], keyword: str) -> Dict[str, Any]:
+        """Map an NSF award record to the common opportunity dict shape"""
+        award_id = award['id']
+        pi_name = ' '.join(p for p in (award.get('piFirstName'), award.get('piLastName')) if p)
+        return {
+            'opportunity_id': f"nsf-{award_id}",
+            'title': award.get('title', ''),
+            'agency': 'National Science Foundation',
+            'description': award.get('abstractText', ''),
+            'deadline': None,
+            'eligibility': '',
+            'award_ceiling': None,
+            'award_floor': None,
+            'url': f"https://www.nsf.gov/awardsearch/showAward?AWD_ID={award_id}",
+            'program': award.get('fundProgramName', ''),
+            'awardee': award.get('awardeeName', ''),
+            'pi_name': pi_name,
+            'start_date': _parse_nsf_date(award.get('startDate')),
+            'end_date': _parse_nsf_date(award.get('expDate')),
+            'matched_keyword': keyword,
+            'record_type': 'award',
+            'source': 'nsf',
+        }
+
     def fetch_program_announcements(self) -> List[Dict[str, Any]]:
-        """Fetch new program announcements from RSS feeds"""
-        # TODO: Implement RSS parsing for program announcements
-        logger.warning("NSFCollector.fetch_program_announcements() not implemented")
-        return []
+        """
+        Fetch new program announcements from RSS feeds
+
+        Call commit_sync_state() once the results are stored.
+        """
+        return list(self.iter_program_announcements())
+
+    def iter_program_announcements(self) -> Iterator[Dict[str, Any]]:
+        """
+        Stream program announcements not seen in a previous run
+
+        Seen entry ids are staged once every feed has been processed and only persisted by commit_sync_state(), so
+        announcements from a run that never gets stored are emitted again.
+        """
+        self._pending_feed_state = None
+        if not self.rss_feeds:
+            return
+
+        state = self._load_feed_state()
+        unchanged = 0
+        new_entries = 0
+
+        with ThreadPoolExecutor(max_workers=min(len(self.rss_feeds), self.max_concurrency)) as executor:
+            futures = {
+                executor.submit(self._fetch_feed, feed, state.get(feed['url'], {})): feed
+                for feed in self.rss_feeds
+            }
+            for future in futures:
+                feed = futures[future]
+                try:
+                    self.check_cancelled()
+                except CollectionCancelled:
+                    for pending in futures:
+                        pending.cancel()
+                    raise
+                try:
+                    feed_state, entries = future.result()
+                except Exception as e:
+                    logger.warning(f"Failed to fetch NSF feed {feed.get('name', feed['url'])}: {str(e)}")
+                    continue
+
+                if entries is None:
+                    unchanged += 1
+                    continue
+
+                state[feed['url']] = feed_state
+                for entry in entries:
+                    new_entries += 1
+                    yield self._entry_to_opportunity(entry, feed)
+
+        self._pending_feed_state = state
+        logger.info(f"NSF feeds: {new_entries} new announcements, "
+                    f"{unchanged}/{len(self.rss_feeds)} feeds with nothing new")
+
+    def commit_sync_state(self):
+        """Persist the feed state staged by the last completed feed run"""
+        if self._pending_feed_state is None:
+            return
+        self._save_feed_state(self._pending_feed_state)
+        self._pending_feed_state = None
+
+    def _fetch_feed(self, feed: Dict[str, Any], feed_state: Dict[str, Any]) -> Tuple[Dict[str, Any], Optional[list]]:
+        """
+        Fetch one feed (cached and revalidated by http_get)
+
+        Returns:
+            (updated feed state, new entries) - entries is None if nothing is new
+        """
+        text = self.http_get(feed['url'], timeout=self.timeout, session=self.session,
+                             headers={'Accept': 'application/rss+xml, application/xml, text/xml, */*'})
+        parsed = feedparser.parse(text)
+        if parsed.bozo and parsed.bozo_exception:
+            logger.debug(f"Feed parsing warning for {feed.get('name')}: {parsed.bozo_exception}")
+
+        seen = list(feed_state.get('seen', []))
+        seen_set = set(seen)
+        new_entries = []
+        for entry in parsed.entries:
+            entry_id = entry.get('id') or entry.get('link')
+            if not entry_id or entry_id in seen_set:
+                continue
+            seen_set.add(entry_id)
+            seen.append(entry_id)
+            new_entries.append(entry)
+
+        if not new_entries:
+            return feed_state, None
+        return {'seen': seen[-self.max_seen_per_feed:]}, new_entries
+
+    def _entry_to_opportunity(self, entry: Dict[str, Any], feed: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a program announcement feed entry to the common opportunity dict shape"""
+        entry_id = entry.get('id') or entry.get('link')
+        posted = None
+        if entry.get('published_parsed'):
+            posted = datetime(*entry.published_parsed[:6]).date().isoformat()
+
+        return {
+            'opportunity_id': f"nsf-rss-{hashlib.md5(entry_id.encode()).hexdigest()[:16]}",
+            'title': entry.get('title', 'Untitled'),
+            'agency': 'National Science Foundation',
+            'description': _clean_html(entry.get('summary', '')),
+            'deadline': None,
+            'posted_date': posted,
+            'eligibility': '',
+            'award_ceiling': None,
+            'award_floor': None,
+            'url': entry.get('link', ''),
+            'feed': feed.get('name', ''),
+            'record_type': 'program_announcement',
+            'source': 'nsf',
+        }
+
+    def _load_feed_state(self) -> Dict[str, Any]:
+        """Load persisted seen entry ids"""
+        if os.path.exists(self.feed_state_file):
+            try:
+                with open(self.feed_state_file, 'r') as f:
+                    return json.load(f)
+            except Exception as e:
+                logger.error(f"Error loading NSF feed state: {e}")
+        return {}
+
+    def _save_feed_state(self, state: Dict[str, Any]):
+        """Persist seen entry ids atomically"""
+        try:
+            os.makedirs(os.path.dirname(self.feed_state_file), exist_ok=True)
+            tmp_path = f"{self.feed_state_file}.tmp"
+            with open(tmp_path, 'w') as f:
+                json.dump(state, f, indent=2)
+            os.replace(tmp_path, self.feed_state_file)
+        except Exception as e:
+            logger.error(f"Error saving NSF feed state: {e}")
+
+
+def _clean_html(text: str) -> str:
+    """Remove HTML tags and collapse whitespace"""
+    text = re.sub('<[^<]+?>', ' ', text or '')
+    return ' '.join(text.split())
+
+
+def _parse_nsf_date(value: Optional[str]) -> Optional[str]:
+    """Convert NSF mm/dd/yyyy dates to ISO format"""
+    if not value:
+        return None
+    try:
+        return datetime.strptime(value, "%m/%d/%Y").date().isoformat()
+    except ValueError:
+        return None
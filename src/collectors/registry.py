@@ -0,0 +1,89 @@
+"""
+Collector Registry
+
+Maps source names in config/sources-grants.yaml to BaseCollector plugins so
+GrantBot can fan out over every enabled source without per-source code.
+
+Collectors are registered as "module:ClassName" strings and only imported
+when an enabled source needs them, so a disabled source never pulls in its
+dependencies. A source uses the collector registered under its own YAML key
+unless it names one explicitly:
+
+    dept_education:
+      enabled: true
+      collector: web_page                      # registered name
+      # collector: mypackage.collectors:MyOne  # or any importable class
+"""
+
+import logging
+import importlib
+from typing import Any, Dict, Iterator, Optional, Tuple, Type
+
+from collectors.base import BaseCollector
+from utils.cache import APIResponseCache
+
+logger = logging.getLogger(__name__)
+
+_REGISTRY: Dict[str, str] = {
+    'grants_gov': 'collectors.grants_gov:GrantsGovCollector',
+    'nsf': 'collectors.nsf:NSFCollector',
+    'kauffman': 'collectors.foundations:FoundationCollector',
+    'web_page': 'collectors.web_page:WebPageCollector',
+}
+
+
+def register_collector(name: str, target: str):
+    """
+    Register a collector class under a source name
+
+    Args:
+        name: Name sources refer to (YAML key or `collector:` value)
+        target: Import path in "module:ClassName" form
+    """
+    if name in _REGISTRY:
+        logger.warning(f"Collector for {name} registered twice, replacing")
+    _REGISTRY[name] = target
+
+
+def load_collector_class(spec: str) -> Type[BaseCollector]:
+    """Import a collector class from a registered name or "module:ClassName" path"""
+    target = _REGISTRY.get(spec, spec)
+    if ':' not in target:
+        raise ValueError(f"Unknown collector {spec!r}")
+
+    module_name, class_name = target.split(':', 1)
+    collector_class = getattr(importlib.import_module(module_name), class_name)
+    if not issubclass(collector_class, BaseCollector):
+        raise TypeError(f"{target} is not a BaseCollector")
+    return collector_class
+
+
+def create_collector(name: str, source_config: Dict[str, Any], org_profile: Any,
+                     http_cache: Optional[APIResponseCache] = None) -> Optional[BaseCollector]:
+    """
+    Instantiate the collector for a source entry
+
+    Args:
+        http_cache: Response cache shared by all collectors' http_get()
+
+    Returns:
+        Collector instance, or None if the source has no collector
+    """
+    spec = source_config.get('collector', name)
+    if spec not in _REGISTRY and ':' not in spec:
+        return None
+
+    collector_class = load_collector_class(spec)
+    collector = collector_class(source_config=source_config, org_profile=org_profile, name=name)
+    collector.http_cache = http_cache
+    return collector
+
+
+def iter_enabled_sources(config: Dict[str, Any]) -> Iterator[Tuple[str, str, Dict[str, Any]]]:
+    """
+    Yield (category, source_name, source_config) for every enabled source
+    """
+    for category, sources in (config.get('sources') or {}).items():
+        for name, source_config in (sources or {}).items():
+            if isinstance(source_config, dict) and source_config.get('enabled'):
+                yield category, name, source_config
@@ -0,0 +1,107 @@
+"""
+Web Page Collector
+
+Generic collector for sources that only publish an HTML listing page
+(Department of Education forecasts, state agencies). Links whose text
+looks like a funding opportunity are turned into opportunity dicts. Links
+in the page's nav, header and footer are never considered, and the default
+pattern only accepts wording specific to a funding call - site-wide words
+like "program" or "award" would turn every menu entry into an opportunity.
+Sources whose listings are worded differently set their own pattern.
+
+Configured per source in config/sources-grants.yaml:
+
+    dept_education:
+      enabled: true
+      collector: web_page
+      urls: [...]                  # or a single `url`
+      link_pattern: "grant|fund"   # optional, matched against the link text
+      url_pattern: "/programs/"    # optional, links whose URL matches also count
+"""
+
+import re
+import hashlib
+import logging
+from bs4 import BeautifulSoup
+from urllib.parse import urljoin
+from typing import Any, Dict, Iterator, List, Optional
+
+from collectors.base import BaseCollector
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LINK_PATTERN = (r"\bgrants?\b|funding opportunit|\bcompetitions?\b|solicitation|"
+                        r"request for (?:proposals|applications)|\brf[ap]s?\b|\bnofo\b|fellowship")
+
+# Site chrome: links here are navigation, not listings
+CHROME_TAGS = ['nav', 'header', 'footer']
+
+
+class WebPageCollector(BaseCollector):
+    """Collector for opportunity links on HTML listing pages"""
+
+    def __init__(self, source_config: Dict[str, Any] = None, org_profile: Any = None, name: str = None,
+                 timeout: int = 30):
+        super().__init__(source_config, org_profile, name or "web_page")
+        self.timeout = timeout
+        self.link_pattern = re.compile(
+            self.source_config.get('link_pattern', DEFAULT_LINK_PATTERN), re.IGNORECASE
+        )
+        url_pattern = self.source_config.get('url_pattern')
+        self.url_pattern: Optional[re.Pattern] = re.compile(url_pattern, re.IGNORECASE) if url_pattern else None
+
+    def _page_urls(self) -> List[str]:
+        urls = list(self.source_config.get('urls') or [])
+        if not urls and self.source_config.get('url'):
+            urls.append(self.source_config['url'])
+        return urls
+
+    def fetch(self, delta: bool = False) -> Iterator[Dict[str, Any]]:
+        """Yield one opportunity per matching link across the configured pages"""
+        seen = set()
+        for page_url in self._page_urls():
+            self.check_cancelled()
+            try:
+                html = self.http_get(page_url, timeout=self.timeout, headers={
+                    'User-Agent': 'GrantBot/0.2 (grant discovery)'
+                })
+            except Exception as e:
+                logger.warning(f"Failed to fetch {self.name} page {page_url}: {str(e)}")
+                continue
+
+            for opportunity in self._parse_links(page_url, html):
+                if opportunity['url'] not in seen:
+                    seen.add(opportunity['url'])
+                    yield opportunity
+
+    def _parse_links(self, page_url: str, html: str) -> Iterator[Dict[str, Any]]:
+        """Extract opportunity-looking links from a listing page"""
+        soup = BeautifulSoup(html, 'html.parser')
+        agency = self.source_config.get('description', self.name)
+
+        for anchor in soup.find_all('a', href=True):
+            title = ' '.join(anchor.get_text().split())
+            href = urljoin(page_url, anchor['href'])
+            if len(title) < 12 or href.startswith(('mailto:', 'javascript:')):
+                continue
+            if anchor.find_parent(CHROME_TAGS):
+                continue
+            if not (self.link_pattern.search(title) or (self.url_pattern and self.url_pattern.search(href))):
+                continue
+
+            # Use the enclosing block's text as a short description
+            container = anchor.find_parent(['li', 'p', 'tr', 'div']) or anchor
+            description = ' '.join(container.get_text().split())[:500]
+
+            yield {
+                'opportunity_id': f"{self.name}:{hashlib.md5(href.encode()).hexdigest()[:16]}",
+                'title': title,
+                'agency': agency,
+                'description': description,
+                'deadline': None,
+                'eligibility': '',
+                'award_ceiling': None,
+                'award_floor': None,
+                'url': href,
+                'source': self.name,
+            }
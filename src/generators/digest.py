@@ -44,6 +44,8 @@ class DigestGenerator:
             lines.append(f"## {grant.get('title', 'Unknown')}")
             lines.append(f"**Fit Score:** {grant.get('fit_score', 'N/A')}/10")
             lines.append(f"**Deadline:** {grant.get('deadline', 'Unknown')}")
+            if len(grant.get('sources', [])) > 1:
+                lines.append(f"**Listed on:** {', '.join(s['source'] or 'unknown' for s in grant['sources'])}")
             lines.append("")
 
         return "\n".join(lines)
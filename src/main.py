@@ -11,21 +11,28 @@ import os
 import sys
 import yaml
 import logging
+import time
+import threading
 import argparse
+from collections import Counter
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
 from dotenv import load_dotenv
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Tuple
 
 # Add src directory to path
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
-from collectors.grants_gov import GrantsGovCollector
-from collectors.nsf import NSFCollector
-from collectors.foundations import FoundationCollector
+from collectors.base import BaseCollector, CollectionCancelled
+from collectors.registry import create_collector, iter_enabled_sources
 from processors.matcher import GrantMatcher, OrgProfile
-from processors.analyzer import GrantAnalyzer
+from processors.semantic import DEFAULT_MODEL
+from processors.analyzer import (GrantAnalyzer, DEFAULT_CLAUDE_MODEL, DEFAULT_OPENAI_MODEL,
+                                 DEFAULT_TRIAGE_CLAUDE_MODEL, DEFAULT_TRIAGE_OPENAI_MODEL)
 from generators.digest import DigestGenerator
-from utils.deduplication import ArticleDeduplicator
+from utils.cache import AnalysisCache, APIResponseCache, ContentCache
+from utils.deduplication import OpportunityDeduplicator
+from utils.opportunity_store import OpportunityStore
 from utils.version import VersionManager
 
 # Set up logging
@@ -45,20 +52,59 @@ class GrantBot:
         self.config = self._load_config(config_path)
         self.org_profile = self._load_org_profile()
 
-        # Initialize collectors
-        self.grants_gov = GrantsGovCollector()
-        self.nsf = NSFCollector()
-        self.foundations = FoundationCollector()
+        # Per-source results of the last collect_grants() run
+        self.collection_stats = {}
+        # Collectors whose sync state waits for commit_collection_state()
+        self._collected_sources: List[BaseCollector] = []
+        # Store outcome counts of the last collect_grants() run, summed across workers
+        self.store_counts: Counter = Counter()
+        self._store_lock = threading.Lock()
+        self.batch_size = 500
 
         # Initialize processors
-        self.matcher = GrantMatcher(self.org_profile)
-        self.analyzer = GrantAnalyzer()
+        matching = self.config.get('matching', {})
+        self.matcher = GrantMatcher(
+            self.org_profile,
+            mode=matching.get('mode', 'bm25'),
+            cache_dir=matching.get('cache_dir', 'cache/relevance'),
+            embedding_model=matching.get('embedding_model', DEFAULT_MODEL),
+            embedding_cache_dir=matching.get('embedding_cache_dir', 'cache/embeddings')
+        )
+        analysis = self.config.get('analysis', {})
+        self.max_analyzed = analysis.get('max_grants', 50)
+        self.analyzer = GrantAnalyzer(
+            max_concurrency=analysis.get('max_concurrency', 8),
+            requests_per_minute=analysis.get('requests_per_minute', 50),
+            claude_model=analysis.get('claude_model', DEFAULT_CLAUDE_MODEL),
+            openai_model=analysis.get('openai_model', DEFAULT_OPENAI_MODEL),
+            openai_base_url=analysis.get('openai_base_url'),
+            request_timeout=analysis.get('request_timeout', 60),
+            cache=AnalysisCache(analysis.get('cache_dir', 'cache/analysis')),
+            triage_mode=analysis.get('triage', {}).get('mode', 'llm'),
+            triage_threshold=analysis.get('triage', {}).get('threshold', 6.0),
+            triage_claude_model=analysis.get('triage', {}).get('claude_model', DEFAULT_TRIAGE_CLAUDE_MODEL),
+            triage_openai_model=analysis.get('triage', {}).get('openai_model', DEFAULT_TRIAGE_OPENAI_MODEL),
+            pack_max_tokens=analysis.get('packing', {}).get('max_tokens', 0),
+            pack_max_grants=analysis.get('packing', {}).get('max_grants', 5),
+            pack_grant_tokens=analysis.get('packing', {}).get('short_grant_tokens', 400)
+        )
 
         # Initialize generators
         self.digest = DigestGenerator()
 
         # Utils
-        self.deduplicator = ArticleDeduplicator()
+        self.store = OpportunityStore(
+            expire_unseen_days=self.config.get('store', {}).get('expire_unseen_days', 30))
+        dedup = self.config.get('deduplication', {})
+        self.deduplicator = OpportunityDeduplicator(threshold=dedup.get('threshold', 0.5))
+        # Replaces cache/seen_articles, which never held grant ids (nothing to migrate)
+        seen = self.config.get('seen_grants', {})
+        self.seen_grants = ContentCache(seen.get('cache_dir', 'cache/seen_grants'),
+                                        max_age_days=seen.get('max_age_days', 90),
+                                        bloom_capacity=seen.get('bloom_capacity', 0))
+        # Shared by every collector's HTTP requests
+        self.http_cache = APIResponseCache(
+            self.config.get('collection', {}).get('http_cache_dir', 'cache/http'))
         self.version = VersionManager()
 
         logger.info(f"GrantBot initialized - {self.version.get_version_string()}")
@@ -73,6 +119,11 @@ class GrantBot:
             logger.error(f"Failed to load config: {e}")
             return {}
 
+    @staticmethod
+    def _grant_keys(grant: Dict[str, Any]) -> List[str]:
+        """Keys a grant is remembered by in the seen-grants log, including merged duplicates"""
+        return [grant.get('opportunity_id') or grant.get('title', ''), *grant.get('duplicate_ids', [])]
+
     def _load_org_profile(self) -> OrgProfile:
         """Load organization profile"""
         profile_path = os.path.join(
@@ -87,7 +138,11 @@ class GrantBot:
                 location=data['location']['state'],
                 focus_areas=data['focus_areas']['primary'] + data['focus_areas']['secondary'],
                 grant_size_min=data['grant_preferences']['size_min'],
-                grant_size_max=data['grant_preferences']['size_max']
+                grant_size_max=data['grant_preferences']['size_max'],
+                include_keywords=data.get('keywords', {}).get('include', []),
+                exclude_keywords=data.get('keywords', {}).get('exclude', []),
+                eligibility_types=data.get('eligibility_types', []),
+                excluded_entity_types=data.get('excluded_entity_types', [])
             )
         except Exception as e:
             logger.error(f"Failed to load org profile: {e}")
@@ -100,37 +155,159 @@ class GrantBot:
                 grant_size_max=1000000
             )
 
-    def collect_grants(self) -> List[Dict[str, Any]]:
-        """Collect grants from all enabled sources"""
-        all_grants = []
+    def collect_grants(self) -> int:
+        """
+        Collect grants from all enabled sources concurrently into the store
+
+        Every enabled source with a registered collector runs in its own
+        worker, which writes the collector's output to the opportunity store
+        in batches as it arrives - the catalog is never held in memory. A
+        source that fails or exceeds its timeout is logged and skipped.
 
-        # Collect from grants.gov
-        if self.config.get('sources', {}).get('federal', {}).get('grants_gov', {}).get('enabled'):
-            logger.info("Collecting from grants.gov...")
-            grants = self.grants_gov.fetch_opportunities(
-                keywords=self.org_profile.focus_areas
-            )
-            all_grants.extend(grants)
-            logger.info(f"Found {len(grants)} grants from grants.gov")
-
-        # Collect from NSF
-        if self.config.get('sources', {}).get('federal', {}).get('nsf', {}).get('enabled'):
-            logger.info("Collecting from NSF...")
-            grants = self.nsf.fetch_opportunities(
-                keywords=self.org_profile.focus_areas
-            )
-            all_grants.extend(grants)
-            logger.info(f"Found {len(grants)} grants from NSF")
+        A source's timeout starts when its worker picks it up, not while it
+        waits in the queue. A timed-out source is told to stop through its
+        cancel event; batches it already stored stay (they are real
+        listings), but its sync state is not committed, so its next run
+        repeats in full. Sync state is persisted by commit_collection_state().
+
+        Returns:
+            Number of opportunities stored from sources that finished
+        """
+        settings = self.config.get('collection', {})
+        default_timeout = settings.get('timeout_seconds', 300)
+        self.batch_size = settings.get('batch_size', 500)
+
+        tasks = []
+        for category, name, source_config in iter_enabled_sources(self.config):
+            try:
+                collector = create_collector(name, source_config, self.org_profile, self.http_cache)
+            except Exception as e:
+                logger.error(f"Failed to load collector for {category}.{name}: {str(e)}")
+                continue
+            if collector is None:
+                logger.debug(f"No collector registered for {category}.{name}, skipping")
+                continue
+            tasks.append((name, collector, source_config.get('timeout_seconds', default_timeout)))
+
+        self._collected_sources = []
+        if not tasks:
+            logger.warning("No enabled sources with a registered collector")
+            return 0
+
+        total = 0
+        self.collection_stats = {}
+        self.store_counts = Counter()
+        max_workers = min(len(tasks), settings.get('max_workers', 8))
+        executor = ThreadPoolExecutor(max_workers=max_workers)
+        start_time = time.time()
+
+        futures = {}
+        started: Dict[str, float] = {}
+        for name, collector, timeout in tasks:
+            logger.info(f"Collecting from {name}...")
+            cancel = threading.Event()
+            future = executor.submit(self._run_collector, name, collector, timeout, cancel, started)
+            futures[future] = (name, collector, timeout, cancel)
+
+        pending = set(futures)
+        while pending:
+            deadlines = [started[futures[f][0]] + futures[f][2] for f in pending if futures[f][0] in started]
+            # Poll while some sources are still queued: their clocks haven't started
+            wait_for = min(deadlines) - time.time() if deadlines else None
+            if len(deadlines) < len(pending):
+                wait_for = min(wait_for, 1.0) if wait_for is not None else 1.0
+            done, pending = wait(pending, timeout=max(0, wait_for) if wait_for is not None else None,
+                                 return_when=FIRST_COMPLETED)
+
+            for future in done:
+                name, collector = futures[future][:2]
+                elapsed = time.time() - started.get(name, start_time)
+                try:
+                    count = future.result()
+                except CollectionCancelled:
+                    self.collection_stats[name] = {'status': 'timeout', 'count': 0, 'seconds': elapsed}
+                    logger.warning(f"Collector {name} timed out after {elapsed:.1f}s, skipping")
+                    continue
+                except Exception as e:
+                    self.collection_stats[name] = {'status': 'failed', 'count': 0, 'seconds': elapsed}
+                    logger.error(f"Collector {name} failed after {elapsed:.1f}s: {str(e)}")
+                    continue
+                total += count
+                self._collected_sources.append(collector)
+                self.collection_stats[name] = {'status': 'ok', 'count': count, 'seconds': elapsed}
+                logger.info(f"Stored {count} grants from {name} in {elapsed:.1f}s")
+
+            now = time.time()
+            for future in list(pending):
+                name, _, timeout, cancel = futures[future]
+                if name in started and started[name] + timeout <= now:
+                    # Can't interrupt the thread; it stops at its next check_cancelled()
+                    cancel.set()
+                    pending.discard(future)
+                    self.collection_stats[name] = {'status': 'timeout', 'count': 0,
+                                                   'seconds': now - started[name]}
+                    logger.warning(f"Collector {name} timed out after {now - started[name]:.1f}s, skipping")
+
+        # Don't block on timed-out collectors; they exit at their next cancellation check
+        executor.shutdown(wait=False)
+
+        self._log_collection_stats(time.time() - start_time)
+        counts = self.store_counts
+        logger.info(f"Total grants collected: {total} ({counts['new']} new, {counts['updated']} updated, "
+                    f"{counts['closed']} closed, {counts['unchanged']} unchanged)")
+        return total
+
+    def commit_collection_state(self):
+        """
+        Accept the sources that finished the last collect_grants()
 
-        # Collect from foundations
-        if self.config.get('sources', {}).get('foundations', {}).get('kauffman', {}).get('enabled'):
-            logger.info("Collecting from Kauffman Foundation...")
-            grants = self.foundations.fetch_kauffman_opportunities()
-            all_grants.extend(grants)
-            logger.info(f"Found {len(grants)} grants from Kauffman")
+        Records a delta source still lists but didn't resend are touched so
+        they don't expire, then each source's sync state is persisted.
+        """
+        for collector in self._collected_sources:
+            try:
+                if collector.listed_ids:
+                    touched = self.store.touch(collector.listed_ids)
+                    logger.debug(f"{collector.name}: {touched} unchanged listings still present")
+                    collector.listed_ids = None
+                collector.commit_sync_state()
+            except Exception as e:
+                logger.error(f"Failed to commit sync state for {collector.name}: {str(e)}")
+        self._collected_sources = []
+
+    def _run_collector(self, name: str, collector: BaseCollector, timeout: float,
+                       cancel: threading.Event, started: Dict[str, float]) -> int:
+        """
+        Run one collector with a deadline counted from when it actually starts,
+        storing its output batch by batch
 
-        logger.info(f"Total grants collected: {len(all_grants)}")
-        return all_grants
+        Returns:
+            Number of opportunities stored
+        """
+        started[name] = time.time()
+        count = 0
+        for batch in collector.collect_batches(self.batch_size, deadline=started[name] + timeout,
+                                               cancel=cancel):
+            self._store_batch(batch)
+            count += len(batch)
+        return count
+
+    def _store_batch(self, batch: List[Dict[str, Any]]):
+        """Upsert one batch and drop cached analyses of grants that just closed"""
+        counts = self.store.upsert_many(batch)
+        with self._store_lock:
+            self.store_counts.update(counts)
+            # Closed grants will never be analyzed again
+            for grant in batch:
+                if grant.get('change_type') == 'closed':
+                    self.analyzer.cache.evict_opportunity(grant['opportunity_id'])
+
+    def _log_collection_stats(self, total_time: float):
+        """Log per-source collection timing"""
+        logger.info("=== Collection Statistics ===")
+        for name, stats in sorted(self.collection_stats.items(), key=lambda x: -x[1]['seconds']):
+            logger.info(f"  {name}: {stats['status']}, {stats['count']} grants, {stats['seconds']:.1f}s")
+        logger.info(f"Total collection time: {total_time:.1f}s")
 
     def run(self, test_mode: bool = False) -> str:
         """
@@ -146,28 +323,39 @@ class GrantBot:
         logger.info("Starting GrantBot run")
         logger.info("=" * 50)
 
-        # Step 1: Collect grants
-        all_grants = self.collect_grants()
-
-        # Step 2: Filter and match
-        matched_grants = self.matcher.filter_and_rank(all_grants)
+        # Step 1: Collect grants into the opportunity store (stored as they stream in)
+        self.collect_grants()
+        # Only now is it safe for collectors to advance their watermarks
+        self.commit_collection_state()
+        self.store.expire_unseen()
+        self.analyzer.cache.cleanup_expired()
+        self.http_cache.cleanup_expired()
+
+        # Step 2: Filter and match every open opportunity we know about
+        open_grants = list(self.store.query(open_only=True))
+        logger.info(f"Open opportunities in store: {len(open_grants)}")
+        # The same program listed by several sources becomes one record
+        open_grants = self.deduplicator.merge(open_grants)
+        matched_grants = self.matcher.filter_and_rank(open_grants)
         logger.info(f"Matched grants after filtering: {len(matched_grants)}")
 
-        # Step 3: Deduplicate (skip already-seen grants)
-        new_grants = []
-        for grant in matched_grants:
-            grant_id = grant.get('opportunity_id') or grant.get('title', '')
-            if not self.deduplicator.is_duplicate(grant_id, grant_id):
-                new_grants.append(grant)
-                self.deduplicator.mark_seen(grant_id, grant_id)
+        # Step 3: Skip grants already reported (under any of their sources' ids)
+        new_grants = [g for g in matched_grants
+                      if not any(self.seen_grants.is_duplicate(key) for key in self._grant_keys(g))]
         logger.info(f"New grants after deduplication: {len(new_grants)}")
 
-        # Step 4: Deep analysis (top grants only to save API calls)
-        analyzed_grants = []
-        for grant in new_grants[:10]:  # Analyze top 10
-            analysis = self.analyzer.analyze_grant(grant, vars(self.org_profile))
+        # Step 4: Triage the top candidates, deep-analyze those that pass (concurrently)
+        candidates = new_grants[:self.max_analyzed]
+        for grant, analysis in self.analyzer.analyze_batch(candidates, vars(self.org_profile)):
             grant.update(analysis)
-            analyzed_grants.append(grant)
+        # Still in relevance order
+        analyzed_grants = [g for g in candidates if g.get('triage_passed', True)]
+        # Only grants with a real analysis or triage verdict are remembered; ones past
+        # the analysis cap or left with a fallback analysis are retried next run
+        settled = [g for g in candidates if g.get('analysis_complete', True)]
+        self.seen_grants.mark_many(key for g in settled for key in self._grant_keys(g))
+        if len(settled) < len(candidates):
+            logger.info(f"{len(candidates) - len(settled)} grants without a usable analysis will be retried")
 
         # Step 5: Generate digest
         markdown = self.digest.generate_markdown(analyzed_grants)
@@ -0,0 +1,222 @@
+"""
+Analysis Schema
+
+JSON schemas for LLM analysis results, plus a validator that repairs
+malformed fields locally instead of asking the model again.
+
+The schemas are sent to the provider as structured-output definitions
+(Claude tool input schema, OpenAI response_format). Models still return
+"8/10" for a number, a bare string for a list or "yes" for a boolean;
+validate() coerces those against the schema, fills optional fields from
+their defaults and reports only the required fields it could not recover,
+so the analyzer can re-ask for exactly those.
+
+Only the subset of JSON schema used here is supported: object, array,
+string, number, boolean, enum, required, default, minimum/maximum.
+
+packed() wraps a schema for responses that answer several grants at once;
+the caller validates each item against the original schema.
+"""
+
+import re
+import logging
+from copy import deepcopy
+from typing import Any, Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+ANALYSIS_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "summary": {"type": "string", "description": "1-2 sentences on what the grant funds"},
+        "fit_score": {"type": "number", "minimum": 1, "maximum": 10, "description": "Fit with the org, 1-10"},
+        "fit_reasoning": {"type": "string", "description": "Why this score, 1-3 sentences"},
+        "eligibility_check": {
+            "type": "object",
+            "properties": {
+                "eligible": {"type": "boolean"},
+                "concerns": {"type": "array", "items": {"type": "string"}, "default": []},
+            },
+            "required": ["eligible"],
+        },
+        "competition_level": {"type": "string", "enum": ["High", "Medium", "Low", "Unknown"], "default": "Unknown"},
+        "strategic_fit": {"type": "string", "description": "How this aligns with the lab's goals"},
+        "action_items": {
+            "type": "array",
+            "items": {
+                "type": "object",
+                "properties": {
+                    "action": {"type": "string"},
+                    "deadline": {"type": "string", "description": "YYYY-MM-DD or empty", "default": ""},
+                    "priority": {"type": "string", "enum": ["High", "Medium", "Low"], "default": "Medium"},
+                },
+                "required": ["action"],
+            },
+            "default": [],
+        },
+        "key_contacts": {"type": "array", "items": {"type": "string"}, "default": []},
+        "similar_funded": {"type": "array", "items": {"type": "string"}, "default": []},
+    },
+    "required": ["summary", "fit_score", "fit_reasoning", "eligibility_check", "strategic_fit"],
+}
+
+TRIAGE_SCHEMA: Dict[str, Any] = {
+    "type": "object",
+    "properties": {
+        "score": {"type": "number", "minimum": 0, "maximum": 10},
+        "reason": {"type": "string", "default": ""},
+    },
+    "required": ["score"],
+}
+
+_NUMBER = re.compile(r"-?\d+(?:\.\d+)?")
+_TRUE = {"true", "yes", "y", "eligible", "1"}
+_FALSE = {"false", "no", "n", "ineligible", "not eligible", "0"}
+
+
+class _Invalid(Exception):
+    """A value that can't be coerced to its schema"""
+
+
+def subschema(schema: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    """Object schema restricted to the given top-level fields, all required"""
+    return {
+        "type": "object",
+        "properties": {f: schema["properties"][f] for f in fields if f in schema["properties"]},
+        "required": [f for f in fields if f in schema["properties"]],
+    }
+
+
+def packed(schema: Dict[str, Any], id_field: str = "grant_id") -> Dict[str, Any]:
+    """Schema for several results in one response, each tagged with an id"""
+    item = deepcopy(schema)
+    item["properties"] = {id_field: {"type": "string"}, **item["properties"]}
+    item["required"] = [id_field, *item.get("required", [])]
+    return {
+        "type": "object",
+        "properties": {"results": {"type": "array", "items": item}},
+        "required": ["results"],
+    }
+
+
+def validate(data: Any, schema: Dict[str, Any]) -> Tuple[Dict[str, Any], List[str]]:
+    """
+    Validate and repair a parsed response against an object schema
+
+    Returns:
+        (repaired, missing) - missing lists required top-level fields that
+        were absent or unrecoverable; they are left out of repaired
+    """
+    if not isinstance(data, dict):
+        return {}, list(schema.get("required", []))
+
+    repaired: Dict[str, Any] = {}
+    missing: List[str] = []
+    for name, field_schema in schema["properties"].items():
+        if name in data and data[name] is not None:
+            try:
+                repaired[name] = _coerce(data[name], field_schema)
+                continue
+            except _Invalid as e:
+                logger.debug(f"Dropping invalid field {name!r}: {e}")
+        if name in schema.get("required", []):
+            missing.append(name)
+        elif "default" in field_schema:
+            repaired[name] = deepcopy(field_schema["default"])
+    return repaired, missing
+
+
+def _coerce(value: Any, schema: Dict[str, Any]) -> Any:
+    """Coerce a value to its schema, raising _Invalid when it can't be repaired"""
+    kind = schema.get("type")
+
+    if kind == "string":
+        if isinstance(value, list):
+            value = "; ".join(str(v) for v in value)
+        elif isinstance(value, dict):
+            raise _Invalid("object where string expected")
+        value = str(value).strip()
+        if "enum" in schema:
+            for option in schema["enum"]:
+                if value.casefold() == option.casefold() or value.casefold().startswith(option.casefold()):
+                    return option
+            if "default" in schema:
+                return schema["default"]
+            raise _Invalid(f"{value!r} not in {schema['enum']}")
+        return value
+
+    if kind == "number":
+        if isinstance(value, bool):
+            raise _Invalid("boolean where number expected")
+        if not isinstance(value, (int, float)):
+            match = _NUMBER.search(str(value))  # "8/10", "Score: 7.5"
+            if not match:
+                raise _Invalid(f"{value!r} is not a number")
+            value = float(match.group())
+        value = float(value)
+        if "minimum" in schema:
+            value = max(value, schema["minimum"])
+        if "maximum" in schema:
+            value = min(value, schema["maximum"])
+        return value
+
+    if kind == "boolean":
+        if isinstance(value, bool):
+            return value
+        text = str(value).strip().casefold()
+        if text in _TRUE:
+            return True
+        if text in _FALSE:
+            return False
+        raise _Invalid(f"{value!r} is not a boolean")
+
+    if kind == "array":
+        if value in ("", None):
+            value = []
+        elif not isinstance(value, list):
+            value = [value]
+        items = []
+        for item in value:
+            try:
+                items.append(_coerce(item, schema.get("items", {})))
+            except _Invalid as e:
+                logger.debug(f"Dropping invalid list item: {e}")
+        return items
+
+    if kind == "object":
+        if isinstance(value, str) and schema.get("required"):
+            # A bare string for an object: treat it as the first required field
+            value = {schema["required"][0]: value}
+        repaired, missing = validate(value, schema)
+        if missing:
+            raise _Invalid(f"missing {missing}")
+        return repaired
+
+    return value
+
+
+if __name__ == "__main__":
+    response = {
+        "summary": "Funds AI curriculum.",
+        "fit_score": "8/10",
+        "eligibility_check": {"eligible": "Yes", "concerns": "Requires a cost share"},
+        "competition_level": "high",
+        "strategic_fit": ["Matches AI focus", "Builds teaching capacity"],
+        "action_items": ["Contact the program officer", {"action": "Draft LOI", "priority": "urgent"}, 42],
+        "key_contacts": "jane@nsf.gov",
+    }
+    repaired, missing = validate(response, ANALYSIS_SCHEMA)
+    assert missing == ["fit_reasoning"]
+    assert repaired["fit_score"] == 8.0
+    assert repaired["eligibility_check"] == {"eligible": True, "concerns": ["Requires a cost share"]}
+    assert repaired["competition_level"] == "High"
+    assert repaired["strategic_fit"] == "Matches AI focus; Builds teaching capacity"
+    assert repaired["action_items"][0] == {"action": "Contact the program officer", "deadline": "", "priority": "Medium"}
+    assert repaired["action_items"][1]["priority"] == "Medium"
+    assert repaired["key_contacts"] == ["jane@nsf.gov"] and repaired["similar_funded"] == []
+    assert validate({"score": "12"}, TRIAGE_SCHEMA) == ({"score": 10.0, "reason": ""}, [])
+    assert validate("not json", TRIAGE_SCHEMA) == ({}, ["score"])
+    schema = packed(TRIAGE_SCHEMA)
+    assert schema["properties"]["results"]["items"]["required"] == ["grant_id", "score"]
+    assert "grant_id" not in TRIAGE_SCHEMA["properties"]
+    print("Analysis schema tests passed!")
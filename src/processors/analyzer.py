@@ -4,24 +4,245 @@ Grant Analyzer
 Performs deep analysis of matched grants using LLM.
 Generates fit assessments, action items, and recommendations.
 
+Analyses are cached by content (see utils.cache.AnalysisCache): a grant
+that hasn't changed since its last analysis costs no API call. Bump
+PROMPT_VERSION whenever the prompt changes so cached answers to the old
+prompt are not reused.
+
+Prompts are split into a prefix that is identical for every grant
+(instructions, scoring guidelines and org profile) and a short per-grant
+suffix, so providers can serve the prefix from their prompt cache.
+Providers only cache prefixes past a minimum length: 1024 tokens for
+OpenAI and most Claude models, 2048 for Claude Haiku. The analysis prefix
+is sized to clear both. The triage prefix is far shorter and is never
+cached; triage prompts are small enough that it doesn't matter.
+
+Short grants (a few sentences, common for foundation and NSF listings) can
+be packed several to a request: the response carries one result per grant
+tagged with its id, and any grant whose result is missing or fails
+validation falls back to its own single-grant request.
+
+Before the full analysis every candidate goes through triage: a small,
+fast model (or, with triage mode "heuristic", the matcher's relevance
+score) rates it 0-10 from a short prompt, and only grants at or above the
+triage threshold get the full analysis with action items and contacts.
+When LLM triage fails the relevance score stands in, but a rejection on
+that basis isn't final: the grant stays incomplete and is triaged again
+on the next run.
+
+Responses are requested as schema-constrained JSON (processors.analysis_schema),
+validated and repaired locally. Required fields that can't be recovered
+are asked for again on their own - a bad field never costs a full re-run.
+
+analyze_batch() runs many analyses concurrently: a semaphore bounds the
+requests in flight, a shared RateLimiter keeps the run under the
+provider's requests-per-minute limit, and results are yielded as each
+request completes. Requests go through processors.llm_client, which routes
+each one to the healthier provider and fails over when one breaks.
+
 Reference implementations:
 - archive/src/processors/ai_summarizer_v5.py (LLM patterns)
 - https://github.com/UABPeriopAI/Grant_Guide (NIH analysis)
 """
 
 import os
+import re
+import json
+import time
 import logging
-from typing import Dict, Any, Optional
+import threading
+from collections import Counter
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+from processors.analysis_schema import ANALYSIS_SCHEMA, TRIAGE_SCHEMA, packed, subschema, validate
+from processors.llm_client import CHARS_PER_TOKEN, LLMClient
+from utils.cache import AnalysisCache
 
 logger = logging.getLogger(__name__)
 
+DEFAULT_CLAUDE_MODEL = "claude-3-5-haiku-20241022"
+DEFAULT_OPENAI_MODEL = "gpt-4o"
+
+DEFAULT_TRIAGE_CLAUDE_MODEL = "claude-3-haiku-20240307"
+DEFAULT_TRIAGE_OPENAI_MODEL = "gpt-4o-mini"
+
+# Part of every analysis cache key
+PROMPT_VERSION = "grant-analysis-v4"
+TRIAGE_PROMPT_VERSION = "grant-triage-v3"
+
+# Scoring guidance and a worked example sent in every analysis prefix.
+# Besides steadying the scores, they bring the prefix (with the tool schema)
+# past the 2048-token minimum Claude Haiku needs before it caches a prompt;
+# a shorter prefix is never cached and pays full price on every grant.
+ANALYSIS_GUIDELINES = """HOW TO ASSESS A GRANT
+
+Work through the grant in this order: who may apply, what is funded, how well that matches the organization, how hard it will be to win, and what the lab would have to do next. Base every judgement on the grant text and the organization profile only. If the listing leaves something out, say that it is not listed instead of guessing, and let missing information lower your confidence rather than raise the score.
+
+fit_score - use the whole scale:
+- 9-10: The grant's stated purpose is one of the organization's focus areas. The organization is clearly an eligible applicant, and the award size is in its preferred range. You would tell the lab to drop other work to apply.
+- 7-8: Strong overlap with at least one focus area, and eligibility is clear or very likely. There may be one real gap, such as an award size outside the preferred range, a required partner the lab would have to find, or a focus that is adjacent rather than central.
+- 5-6: Partial fit. The lab could write a credible proposal by framing its work toward the funder's priorities, but the grant was not written with this kind of organization in mind. Worth a closer look if the deadline allows.
+- 3-4: Weak fit. Only a keyword or a side interest matches, or eligibility depends on a partnership the lab does not have. Mention it only so the lab knows it exists.
+- 1-2: No meaningful fit, or the organization is not eligible.
+A poor-fit keyword from the profile appearing in the grant's core purpose caps the score at 4. If the organization cannot apply as any entity type the grant allows, the score is at most 2, however good the topic match.
+
+fit_reasoning - one to three sentences that name the specific focus area, requirement or gap behind the score. Avoid generic praise such as "aligns well with the lab's mission".
+
+eligibility_check - set "eligible" to false only when the grant text rules the organization out. Examples: the applicant type is excluded, the grant is restricted to a region or state the organization is not in, a career-stage or citizenship rule applies, or it is limited to prior awardees. List anything uncertain in "concerns" instead of marking the grant ineligible. This includes limited-submission rules that need internal selection, cost-sharing or matching-fund requirements, required registrations (SAM.gov, Grants.gov, eRA Commons), partner or consortium requirements, and letters of intent.
+
+competition_level:
+- "High": Large federal programs, prizes or fellowships that are open nationally and draw many applicants, and programs whose listing gives a low success rate.
+- "Medium": Topic-restricted federal programs, regional foundations, and calls open to a defined applicant pool.
+- "Low": Limited-submission, invitation-only, or very narrow calls with few eligible applicants.
+- "Unknown": The listing gives too little to judge.
+
+strategic_fit - one or two sentences on what winning would do for the lab beyond the money. For example, whether it builds a track record with a funder it wants to work with, supports students or teaching, opens a partnership, or leads to a larger follow-on award. Mention a drawback if there is one, such as heavy reporting or a scope the lab would have to stretch to.
+
+action_items - concrete next steps in the order the lab should take them, each with a deadline and a priority.
+- Include the proposal deadline itself.
+- Include any earlier dates the grant names, such as letters of intent, pre-proposals, webinars or internal limited-submission deadlines.
+- Add steps the eligibility concerns imply, such as confirming the cost share with the sponsored programs office or contacting a partner.
+- Leave "deadline" empty when no date applies; never invent one.
+- "High" priority means it must happen within two weeks or the opportunity is lost.
+
+key_contacts - program officers, help desks or email addresses named in the listing, exactly as written. Return an empty list if none are given.
+
+similar_funded - past awards, funded projects or programs from the same funder that the listing mentions or that you can name with confidence. Return an empty list rather than guessing.
+
+Keep every field factual and specific to this grant. The lab reads many of these in one digest, so brevity matters more than completeness in the free-text fields.
+
+EXAMPLE (a fictional grant and organization, to show the expected depth - not a template to copy)
+
+Organization: a university lab for applied machine learning in public health that applies through its university (public four-year institution), with focus areas "health informatics" and "AI for social good", preferring awards of $100,000 to $750,000.
+
+GRANT
+Title: Community Data Science Capacity Building Program
+Funder: Example Family Foundation
+Deadline: 2025-03-14
+Award range: $150,000 - $400,000
+Eligibility: Accredited U.S. colleges and universities in partnership with at least one community-based nonprofit. One application per institution. Letter of intent due 2025-01-31.
+Description: Two-year awards to help community organizations use their own data for program decisions. Projects must include training for nonprofit staff and a plan to sustain the work after the award. Priority for projects serving rural counties.
+
+Analysis:
+{"summary": "Two-year awards for university-nonprofit teams that build data capacity inside community organizations, with staff training and a sustainability plan.",
+ "fit_score": 7,
+ "fit_reasoning": "Directly supports the lab's AI for social good focus, and the award range sits inside the preferred size. It needs a community nonprofit partner the profile doesn't mention, and the training emphasis is lighter on research than the lab's usual work.",
+ "eligibility_check": {"eligible": true, "concerns": ["Requires a community-based nonprofit partner", "Limited to one application per institution - may need internal selection"]},
+ "competition_level": "Medium",
+ "strategic_fit": "Builds a relationship with a private funder and a community partner that could feed later federal public-health proposals. The cost is that it leans toward training and service rather than publishable research.",
+ "action_items": [{"action": "Check with the sponsored programs office whether an internal limited-submission round applies", "deadline": "", "priority": "High"},
+                  {"action": "Confirm a community nonprofit partner, ideally serving a rural county", "deadline": "2025-01-24", "priority": "High"},
+                  {"action": "Submit letter of intent", "deadline": "2025-01-31", "priority": "High"},
+                  {"action": "Submit full proposal", "deadline": "2025-03-14", "priority": "Medium"}],
+ "key_contacts": [],
+ "similar_funded": []}"""
+
+# Output cap for one packed request, whatever the per-grant max_tokens
+PACKED_MAX_OUTPUT_TOKENS = 8192
+
+
+def default_analysis(grant: Dict[str, Any], reason: str = 'Analysis not available') -> Dict[str, Any]:
+    """
+    Analysis used when the LLM is unavailable or its answer is unusable
+
+    'analysis_complete' is False so callers can tell it from a real
+    analysis and try the grant again on a later run.
+    """
+    return {
+        'summary': grant.get('title', 'Unknown'),
+        'fit_score': 5.0,
+        'fit_reasoning': reason,
+        'eligibility_check': {'eligible': True, 'concerns': []},
+        'competition_level': 'Unknown',
+        'strategic_fit': reason,
+        'action_items': [],
+        'key_contacts': [],
+        'similar_funded': [],
+        'analysis_complete': False,
+    }
+
 
 class GrantAnalyzer:
     """Deep analysis of grant opportunities using LLM"""
 
-    def __init__(self, claude_api_key: str = None, openai_api_key: str = None):
+    def __init__(self, claude_api_key: str = None, openai_api_key: str = None,
+                 max_concurrency: int = 8,
+                 requests_per_minute: int = 50,
+                 claude_model: str = DEFAULT_CLAUDE_MODEL,
+                 openai_model: str = DEFAULT_OPENAI_MODEL,
+                 openai_base_url: Optional[str] = None,
+                 max_tokens: int = 1500,
+                 max_retries: int = 3,
+                 request_timeout: float = 60.0,
+                 cache: Optional[AnalysisCache] = None,
+                 triage_mode: str = "llm",
+                 triage_threshold: float = 6.0,
+                 triage_claude_model: str = DEFAULT_TRIAGE_CLAUDE_MODEL,
+                 triage_openai_model: str = DEFAULT_TRIAGE_OPENAI_MODEL,
+                 pack_max_tokens: int = 0,
+                 pack_max_grants: int = 5,
+                 pack_grant_tokens: int = 400):
+        """
+        Args:
+            claude_api_key / openai_api_key: Default to CLAUDE_API_KEY / OPENAI_API_KEY
+            max_concurrency: Analysis requests in flight at once
+            requests_per_minute: Provider rate limit shared by all workers
+            claude_model / openai_model: Model to use on each provider
+            openai_base_url: OpenAI-compatible endpoint, e.g. a local model server
+            max_tokens: Response token limit per analysis
+            max_retries: Rounds over all providers on rate-limit / overload errors
+            request_timeout: Seconds before a provider call is abandoned (and
+                counted against that provider's health)
+            cache: Analysis cache; pass None to always call the LLM
+            triage_mode: "llm" (small model), "heuristic" (relevance score) or
+                "off" (every grant gets the full analysis)
+            triage_threshold: Minimum triage score (0-10) for a full analysis
+            triage_claude_model / triage_openai_model: Small models for triage.
+                A provider whose triage model is its analysis model isn't used
+                for triage (it would only add a call); with neither left, LLM
+                triage is turned off.
+            pack_max_tokens: Token budget for the grant text of one packed
+                request; 0 analyzes every grant on its own
+            pack_max_grants: Most grants packed into one request
+            pack_grant_tokens: Grants longer than this are never packed
+        """
         self.claude_key = claude_api_key or os.getenv('CLAUDE_API_KEY')
         self.openai_key = openai_api_key or os.getenv('OPENAI_API_KEY')
+        self.claude_model = claude_model
+        self.openai_model = openai_model
+        self.max_concurrency = max(1, max_concurrency)
+        self.max_tokens = max_tokens
+        self.cache = cache
+        # How responses parsed: valid, reasked, incomplete
+        self.parse_stats: Counter = Counter()
+        self._stats_lock = threading.Lock()
+        self.triage_mode = triage_mode
+        self.triage_threshold = triage_threshold
+        analysis_models = {'claude': claude_model, 'openai': openai_model}
+        self.triage_models = {
+            provider: model
+            for provider, model in (('claude', triage_claude_model), ('openai', triage_openai_model))
+            if model and model != analysis_models[provider]
+        }
+        if triage_mode == "llm" and not self.triage_models:
+            logger.info("Triage models are the same as the analysis models; skipping triage")
+            self.triage_mode = "off"
+        self.pack_max_tokens = pack_max_tokens
+        self.pack_max_grants = max(1, pack_max_grants)
+        self.pack_grant_tokens = pack_grant_tokens
+        # Shared by every batch, so overlapping batches still respect the bound
+        self._in_flight = threading.BoundedSemaphore(self.max_concurrency)
+
+        self.llm = LLMClient.from_keys(
+            self.claude_key, self.openai_key,
+            openai_base_url=openai_base_url,
+            timeout=request_timeout,
+            requests_per_minute=requests_per_minute,
+            max_retries=max_retries
+        )
+        if not self.llm.available:
+            logger.warning("No AI clients initialized. Grants will get default analyses.")
 
     def analyze_grant(self, grant: Dict[str, Any], org_profile: Dict[str, Any]) -> Dict[str, Any]:
         """
@@ -45,23 +266,375 @@ class GrantAnalyzer:
                 'similar_funded': List[str]  # Similar grants that were funded
             }
         """
-        # TODO: Implement LLM-based analysis
-        # Use Claude or OpenAI to analyze grant against org profile
-        logger.warning("GrantAnalyzer.analyze_grant() not implemented")
-        return {
-            'summary': grant.get('title', 'Unknown'),
-            'fit_score': 5.0,
-            'fit_reasoning': 'Analysis not implemented',
-            'eligibility_check': {'eligible': True, 'concerns': []},
-            'competition_level': 'Unknown',
-            'strategic_fit': 'Analysis not implemented',
-            'action_items': [],
-            'key_contacts': [],
-            'similar_funded': []
-        }
+        if not self.llm.available:
+            return default_analysis(grant, 'Analysis not available (no API key)')
+
+        models = {'claude': self.claude_model, 'openai': self.openai_model}
+        cached = self._cached(grant, org_profile, PROMPT_VERSION, models)
+        if cached is not None:
+            return cached
+
+        prefix, prompt = self._build_analysis_prompt(grant, org_profile)
+        with self._in_flight:
+            response, model = self.llm.generate(prompt, models, self.max_tokens, schema=ANALYSIS_SCHEMA,
+                                                prefix=prefix)
+        if not response:
+            return default_analysis(grant, 'Analysis failed')
+
+        analysis, missing = validate(self._parse_json(response), ANALYSIS_SCHEMA)
+        outcome = 'valid'
+        if missing:
+            outcome = 'reasked'
+            analysis, missing = self._reask_missing(prefix, prompt, analysis, missing, models)
+        if missing:
+            outcome = 'incomplete'
+            logger.warning(f"Analysis of {grant.get('title', '')[:60]} still missing {missing}")
+        with self._stats_lock:
+            self.parse_stats[outcome] += 1
+
+        analysis = {**default_analysis(grant), **analysis, 'analysis_complete': not missing}
+        # Incomplete analyses are retried on the next run rather than cached
+        if self.cache and not missing:
+            self.cache.set_analysis(grant, org_profile, PROMPT_VERSION, model, analysis)
+        return analysis
+
+    def _reask_missing(self, prefix: str, prompt: str, partial: Dict[str, Any], missing: List[str],
+                       models: Dict[str, str]) -> Tuple[Dict[str, Any], List[str]]:
+        """
+        Ask only for the fields the first response lacked
+
+        Returns:
+            (merged analysis, fields still missing)
+        """
+        logger.debug(f"Re-asking for missing analysis fields {missing}")
+        schema = subschema(ANALYSIS_SCHEMA, missing)
+        followup = (f"{prompt}\n\nYou already provided: {json.dumps(partial)}\n"
+                    f"Now respond with only a JSON object containing these keys: {', '.join(missing)}")
+        with self._in_flight:
+            response, _ = self.llm.generate(followup, models, 600, schema=schema, prefix=prefix)
+        if not response:
+            return partial, missing
+
+        extra, still_missing = validate(self._parse_json(response), schema)
+        return {**partial, **extra}, still_missing
+
+    def _analyze_packed(self, grants: List[Dict[str, Any]],
+                        org_profile: Dict[str, Any]) -> List[Optional[Dict[str, Any]]]:
+        """
+        Analyze several short grants in one request
+
+        Returns:
+            One analysis per grant, None where the packed result was missing
+            or invalid - those grants need a single-grant analysis
+        """
+        models = {'claude': self.claude_model, 'openai': self.openai_model}
+        results = [self._cached(grant, org_profile, PROMPT_VERSION, models) for grant in grants]
+        todo = {f"G{n}": i for n, i in enumerate((i for i, r in enumerate(results) if r is None), 1)}
+        if len(todo) < 2:
+            return results
+
+        prefix, _ = self._build_analysis_prompt(grants[0], org_profile)
+        prompt = self._build_packed_prompt({gid: grants[i] for gid, i in todo.items()})
+        max_tokens = min(self.max_tokens * len(todo), PACKED_MAX_OUTPUT_TOKENS)
+        with self._in_flight:
+            response, model = self.llm.generate(prompt, models, max_tokens, schema=packed(ANALYSIS_SCHEMA),
+                                                prefix=prefix)
+        parsed = self._parse_json(response) if response else None
+        items = parsed.get('results') if parsed else None
+
+        unpacked = dict(todo)
+        for item in items if isinstance(items, list) else []:
+            if not isinstance(item, dict):
+                continue
+            gid = str(item.get('grant_id', '')).strip().upper()
+            if gid.isdigit():
+                gid = f"G{gid}"
+            i = unpacked.pop(gid, None)
+            if i is None:
+                continue  # Unknown or repeated id
+            analysis, missing = validate(item, ANALYSIS_SCHEMA)
+            if missing:
+                logger.debug(f"Packed result for {grants[i].get('title', '')[:60]} missing {missing}")
+                unpacked[gid] = i
+                continue
+            results[i] = {**default_analysis(grants[i]), **analysis, 'analysis_complete': True}
+            if self.cache:
+                self.cache.set_analysis(grants[i], org_profile, PROMPT_VERSION, model, results[i])
+
+        with self._stats_lock:
+            self.parse_stats['packed'] += len(todo) - len(unpacked)
+            self.parse_stats['unpacked'] += len(unpacked)
+        return results
+
+    def _pack_tokens(self, grant: Dict[str, Any]) -> Optional[int]:
+        """Estimated tokens of a grant's packed section, or None if it should go alone"""
+        if self.pack_max_tokens <= 0:
+            return None
+        tokens = len(self._grant_section(grant)) // CHARS_PER_TOKEN
+        return tokens if tokens <= self.pack_grant_tokens else None
+
+    def _cached(self, grant: Dict[str, Any], org_profile: Dict[str, Any], prompt_version: str,
+                models: Dict[str, str]) -> Optional[Dict[str, Any]]:
+        """Cached result from whichever provider's model answered last time"""
+        if not self.cache:
+            return None
+        for model in dict.fromkeys(models.values()):
+            cached = self.cache.get_analysis(grant, org_profile, prompt_version, model)
+            if cached is not None:
+                return cached
+        return None
+
+    def triage_grant(self, grant: Dict[str, Any], org_profile: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Quick 0-10 fit rating deciding whether a grant deserves full analysis
+
+        Returns:
+            {'triage_score': float, 'triage_reason': str, 'triage_passed': bool,
+             'triage_source': 'llm', 'heuristic' or 'fallback'}. 'fallback'
+            means LLM triage was wanted but unavailable or failed, and the
+            relevance score was used instead.
+        """
+        result = None
+        if self.triage_mode == "llm" and self.llm.available:
+            result = self._triage_with_llm(grant, org_profile)
+            if result is not None:
+                result['triage_source'] = 'llm'
+        if result is None:
+            result = {
+                'triage_score': float(grant.get('relevance_score') or 0.0),
+                'triage_reason': 'Keyword relevance to focus areas',
+                'triage_source': 'heuristic' if self.triage_mode == "heuristic" else 'fallback',
+            }
+        result['triage_passed'] = result['triage_score'] >= self.triage_threshold
+        return result
+
+    def _triage_with_llm(self, grant: Dict[str, Any], org_profile: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+        models = self.triage_models
+        cached = self._cached(grant, org_profile, TRIAGE_PROMPT_VERSION, models)
+        if cached is not None:
+            return dict(cached)
+
+        prefix, prompt = self._build_triage_prompt(grant, org_profile)
+        with self._in_flight:
+            response, model = self.llm.generate(prompt, models, 150, schema=TRIAGE_SCHEMA, prefix=prefix)
+        if not response:
+            return None
+        parsed, missing = validate(self._parse_json(response), TRIAGE_SCHEMA)
+        if missing:
+            return None
+
+        result = {'triage_score': parsed['score'], 'triage_reason': parsed['reason']}
+        if self.cache:
+            self.cache.set_analysis(grant, org_profile, TRIAGE_PROMPT_VERSION, model, result, slot='triage')
+        return result
+
+    def analyze_batch(self, grants: List[Dict[str, Any]],
+                      org_profile: Dict[str, Any]) -> Iterator[Tuple[Dict[str, Any], Dict[str, Any]]]:
+        """
+        Triage and analyze grants concurrently, yielding (grant, analysis) as each completes
+
+        Each grant is triaged first; one that passes is queued for full
+        analysis as soon as its own triage finishes. Grants below the triage
+        threshold yield a short analysis built from the triage result, with
+        'triage_passed' False; it only counts as complete when the verdict
+        didn't come from the fallback for a failed LLM triage.
+
+        With packing on, short grants that need a full analysis are held
+        back and sent together once the pack reaches its token or grant limit
+        (or no triage is left that could add to it).
+
+        At most max_concurrency requests are in flight and all workers share
+        the rate limiter. A failed analysis yields the default analysis rather
+        than stopping the batch.
+        """
+        if not grants:
+            return
+
+        started = time.time()
+        hits_before = self.cache.analysis_hits if self.cache else 0
+        triage = self.triage_mode != "off"
+        full_count = 0
+
+        with ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="analyze") as executor:
+            pending: Dict[Any, Tuple[Any, str]] = {}
+            triage_results: Dict[int, Dict[str, Any]] = {}
+            triaging = len(grants) if triage else 0
+            pack: List[Dict[str, Any]] = []
+            pack_tokens = 0
+
+            def flush_pack():
+                nonlocal pack, pack_tokens
+                if len(pack) == 1:
+                    pending[executor.submit(self.analyze_grant, pack[0], org_profile)] = (pack[0], 'full')
+                elif pack:
+                    pending[executor.submit(self._analyze_packed, pack, org_profile)] = (pack, 'pack')
+                pack, pack_tokens = [], 0
+
+            def queue_full(grant):
+                nonlocal pack_tokens
+                tokens = self._pack_tokens(grant)
+                if tokens is None:
+                    pending[executor.submit(self.analyze_grant, grant, org_profile)] = (grant, 'full')
+                    return
+                if pack and (pack_tokens + tokens > self.pack_max_tokens or len(pack) >= self.pack_max_grants):
+                    flush_pack()
+                pack.append(grant)
+                pack_tokens += tokens
+
+            def finish(grant, analysis):
+                nonlocal full_count
+                full_count += 1
+                logger.debug(f"Analyzed {grant.get('title', '')[:60]}")
+                return grant, {**analysis, **triage_results.pop(id(grant), {})}
+
+            for grant in grants:
+                if triage:
+                    pending[executor.submit(self.triage_grant, grant, org_profile)] = (grant, 'triage')
+                else:
+                    queue_full(grant)
+
+            while pending or pack:
+                if pack and not triaging:
+                    flush_pack()
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+                for future in done:
+                    grant, stage = pending.pop(future)
+                    try:
+                        result = future.result()
+                    except Exception as e:
+                        label = f"{len(grant)} packed grants" if stage == 'pack' else grant.get('title', '')[:60]
+                        logger.error(f"{stage.title()} failed for {label}: {str(e)}")
+                        result = None
+
+                    if stage == 'triage':
+                        triaging -= 1
+                        result = result or {'triage_score': 0.0, 'triage_reason': 'Triage failed',
+                                            'triage_passed': True, 'triage_source': 'fallback'}
+                        if result['triage_passed']:
+                            triage_results[id(grant)] = result
+                            queue_full(grant)
+                        else:
+                            analysis = default_analysis(grant, result['triage_reason'])
+                            # A triage verdict is final, even without a full analysis -
+                            # unless it is only the fallback for a failed LLM triage
+                            analysis.update(result, fit_score=result['triage_score'],
+                                            analysis_complete=result['triage_source'] != 'fallback')
+                            yield grant, analysis
+                        continue
+
+                    if stage == 'pack':
+                        for packed_grant, analysis in zip(grant, result or [None] * len(grant)):
+                            if analysis is None:
+                                # Fall back to a request of its own
+                                pending[executor.submit(self.analyze_grant, packed_grant, org_profile)] = \
+                                    (packed_grant, 'full')
+                            else:
+                                yield finish(packed_grant, analysis)
+                        continue
+
+                    yield finish(grant, result or default_analysis(grant, 'Analysis failed'))
+
+        cached = (self.cache.analysis_hits - hits_before) if self.cache else 0
+        if self.parse_stats:
+            logger.info(f"Analysis responses so far: {dict(self.parse_stats)}")
+        for provider, stats in self.llm.get_stats().items():
+            if stats['calls']:
+                logger.info(f"  {provider}: {stats['calls']} recent calls, p50 {stats['p50']:.1f}s, "
+                            f"p95 {stats['p95']:.1f}s, {stats['error_rate']:.0%} errors, circuit {stats['circuit']}")
+        usage = self.llm.get_usage()
+        if usage:
+            logger.info(f"  tokens: prefix ~{usage.get('prefix_tokens_est', 0):,}, "
+                        f"suffix ~{usage.get('suffix_tokens_est', 0):,} over {usage['requests']} requests; "
+                        f"provider-reported input {usage.get('input_tokens', 0):,}, "
+                        f"cache reads {usage.get('cache_read_tokens', 0):,}, "
+                        f"cache writes {usage.get('cache_write_tokens', 0):,}, "
+                        f"output {usage.get('output_tokens', 0):,}")
+        triage_note = f"{full_count} of {len(grants)} passed triage, " if triage else ""
+        logger.info(f"Analyzed {len(grants)} grants in {time.time() - started:.1f}s "
+                    f"({triage_note}{cached} from cache, concurrency {self.max_concurrency})")
+
+    # Prompt and response
+
+    def _profile_section(self, org_profile: Dict[str, Any]) -> str:
+        """Org profile as it appears in every prompt prefix"""
+        size_max = org_profile.get('grant_size_max')
+        return f"""ORGANIZATION
+Entity type: {org_profile.get('entity_type', '')}
+Location: {org_profile.get('location', '')}
+Focus areas: {', '.join(org_profile.get('focus_areas', []))}
+Good-fit keywords: {', '.join(org_profile.get('include_keywords', [])) or 'None'}
+Poor-fit keywords: {', '.join(org_profile.get('exclude_keywords', [])) or 'None'}
+Can apply as: {'; '.join(org_profile.get('eligibility_types', [])) or org_profile.get('entity_type', '')}
+Cannot apply as: {', '.join(org_profile.get('excluded_entity_types', [])) or 'None'}
+Preferred award size: ${org_profile.get('grant_size_min') or 0:,} {f"to ${size_max:,}" if size_max else "and up"}"""
+
+    def _grant_section(self, grant: Dict[str, Any], description_chars: int = 4000, label: str = '') -> str:
+        """Per-grant part of a prompt; label is the id a packed response refers to"""
+        award = ''
+        if grant.get('award_floor') or grant.get('award_ceiling'):
+            award = f"${grant.get('award_floor') or 0:,.0f} - ${grant.get('award_ceiling') or 0:,.0f}"
+        return f"""GRANT{f" {label}" if label else ""}
+Title: {grant.get('title', '')}
+Funder: {grant.get('agency', '')}
+Deadline: {grant.get('deadline') or 'Not listed'}
+Award range: {award or 'Not listed'}
+Eligibility: {(grant.get('eligibility') or 'Not listed')[:1500]}
+Description: {(grant.get('description') or '')[:description_chars]}"""
+
+    def _build_analysis_prompt(self, grant: Dict[str, Any], org_profile: Dict[str, Any]) -> Tuple[str, str]:
+        """
+        Build prompt for LLM analysis
+
+        Returns:
+            (prefix, suffix) - the prefix is the same for every grant
+        """
+        prefix = f"""You are a grant advisor for a university research lab. For each funding opportunity you are given, assess how well it fits the organization below.
+
+{self._profile_section(org_profile)}
+
+{ANALYSIS_GUIDELINES}
+
+Respond with only a JSON object with these keys:
+- "summary": 1-2 sentences on what the grant funds
+- "fit_score": number from 1 to 10
+- "fit_reasoning": why this score, 1-3 sentences
+- "eligibility_check": {{"eligible": true/false, "concerns": [strings]}}
+- "competition_level": "High", "Medium", "Low" or "Unknown"
+- "strategic_fit": how this aligns with the lab's goals
+- "action_items": [{{"action": string, "deadline": "YYYY-MM-DD or empty", "priority": "High/Medium/Low"}}]
+- "key_contacts": [strings]
+- "similar_funded": [strings]"""
+        return prefix, self._grant_section(grant)
+
+    def _build_packed_prompt(self, grants: Dict[str, Dict[str, Any]]) -> str:
+        """Per-request part of a packed analysis prompt, grants keyed by the id to echo back"""
+        sections = "\n\n".join(self._grant_section(grant, label=gid) for gid, grant in grants.items())
+        return f"""Analyze each of the {len(grants)} grants below on its own; do not let one grant's details affect another's assessment.
+Respond with only a JSON object {{"results": [...]}} holding one object per grant, with "grant_id" (e.g. "G1") and the keys above.
+
+{sections}"""
+
+    def _build_triage_prompt(self, grant: Dict[str, Any], org_profile: Dict[str, Any]) -> Tuple[str, str]:
+        """Short prompt for the triage model, as (prefix, suffix)"""
+        prefix = f"""Rate from 0 to 10 how well a funding opportunity fits this organization.
+
+{self._profile_section(org_profile)}
+
+Reply with only JSON: {{"score": <0-10>, "reason": "<one sentence>"}}"""
+        return prefix, self._grant_section(grant, description_chars=800)
 
-    def _build_analysis_prompt(self, grant: Dict[str, Any], org_profile: Dict[str, Any]) -> str:
-        """Build prompt for LLM analysis"""
-        # TODO: Implement prompt engineering
-        # Include: grant details, org profile, analysis requirements
-        pass
+    def _parse_json(self, response: str) -> Optional[Dict[str, Any]]:
+        """Extract the JSON object from a response, tolerating code fences and surrounding prose"""
+        text = re.sub(r"^```(?:json)?\s*|\s*```$", "", response.strip())
+        start, end = text.find('{'), text.rfind('}')
+        if start < 0 or end <= start:
+            return None
+        try:
+            parsed = json.loads(text[start:end + 1])
+        except json.JSONDecodeError:
+            # Trailing commas are the most common slip
+            try:
+                parsed = json.loads(re.sub(r",\s*([}\]])", r"\1", text[start:end + 1]))
+            except json.JSONDecodeError:
+                return None
+        return parsed if isinstance(parsed, dict) else None
@@ -0,0 +1,314 @@
+"""
+Eligibility Engine
+
+Decides cheaply whether the org can apply for a grant, before any
+relevance scoring or AI analysis is spent on it.
+
+The profile's `eligibility_types`, `excluded_entity_types`, location and
+grant-size preferences are compiled once into an ordered list of rules:
+
+1. grant_size       - award ceiling below our minimum / floor above our maximum
+2. eligibility_code - grants.gov applicant codes that exclude every type we apply as
+3. excluded_entity  - free text restricting the grant to an excluded entity type
+4. restricted_text  - "limited to ..." clauses naming only other applicant types
+5. geography        - eligibility tied to a US state other than ours
+
+The first rule that fails rejects the grant; its name is reported, counted
+in `EligibilityEngine.rejections` and stored on the grant as
+'eligibility_rejection' so the decision can be audited later. Unknown
+information (no codes, no amounts, empty eligibility text) never rejects a
+grant.
+
+The geography rule reads only the eligibility text when a grant has one:
+descriptions mention states for many other reasons ("a pilot in Ohio
+schools"). Grants without eligibility text fall back to title and
+description.
+"""
+
+import re
+import logging
+from collections import Counter
+from typing import Any, Callable, Dict, FrozenSet, List, Optional, Tuple
+
+from processors.keyword_matcher import normalize_text
+
+logger = logging.getLogger(__name__)
+
+# grants.gov EligibleApplicants codes
+ELIGIBILITY_CODES = {
+    '00': "State governments",
+    '01': "County governments",
+    '02': "City or township governments",
+    '04': "Special district governments",
+    '05': "Independent school districts",
+    '06': "Public and State controlled institutions of higher education",
+    '07': "Native American tribal governments (Federally recognized)",
+    '08': "Public housing authorities/Indian housing authorities",
+    '11': "Native American tribal organizations (other than Federally recognized tribal governments)",
+    '12': "Nonprofits having a 501(c)(3) status with the IRS, other than institutions of higher education",
+    '13': "Nonprofits that do not have a 501(c)(3) status with the IRS, other than institutions of higher education",
+    '20': "Private institutions of higher education",
+    '21': "Individuals",
+    '22': "For profit organizations other than small businesses",
+    '23': "Small businesses",
+    '25': "Others (see text field entitled \"Additional Information on Eligibility\" for clarification)",
+    '99': "Unrestricted (i.e., open to any type of entity above), subject to any clarification "
+          "in text field entitled \"Additional Information on Eligibility\"",
+}
+
+# Codes that never narrow eligibility by themselves
+OPEN_CODES = frozenset({'25', '99'})
+
+# Short profile entity types -> grants.gov codes
+ENTITY_TYPE_CODES = {
+    'university': {'06', '20'},
+    'college': {'06', '20'},
+    'higher_education': {'06', '20'},
+    'educational_institution': {'06', '20'},
+    'public_university': {'06'},
+    'private_university': {'20'},
+    'nonprofit': {'12'},
+    'nonprofit_without_501c3': {'13'},
+    'state_government': {'00'},
+    'local_government': {'01', '02', '04'},
+    'school_district': {'05'},
+    'tribal': {'07', '11'},
+    'housing_authority': {'08'},
+    'individual': {'21'},
+    'for_profit': {'22'},
+    'small_business': {'23'},
+}
+
+# How each code's applicants are named in free text
+CODE_TERMS = {
+    '00': r"state governments?|state agencies",
+    '01': r"county governments?|counties",
+    '02': r"city governments?|township governments?|municipalities",
+    '04': r"special district governments?",
+    '05': r"school districts?|local educational agenc(?:y|ies)|LEAs?",
+    '06': r"institutions? of higher (?:education|learning)|IHEs?|universit(?:y|ies)|colleges?",
+    '07': r"tribal governments?|tribes|tribal nations?",
+    '08': r"housing authorit(?:y|ies)",
+    '11': r"tribal organizations?",
+    '12': r"non-?profits?|not-for-profit|501\s*\(c\)\s*\(3\)",
+    '13': r"non-?profits?|not-for-profit",
+    '20': r"institutions? of higher (?:education|learning)|IHEs?|universit(?:y|ies)|colleges?",
+    '21': r"individuals",
+    '22': r"for-profit|commercial (?:entities|organizations)",
+    '23': r"small businesses",
+}
+
+# Free-text patterns for common excluded entity types
+EXCLUDED_ENTITY_PATTERNS = {
+    'individual': r"\bindividuals only\b|\bonly (?:to )?individuals\b|\bopen (?:only )?to individuals\b",
+    'k12_only': r"\bK-?12 (?:schools? |educators |teachers )?only\b|\bonly (?:to )?(?:K-?12|elementary and secondary)"
+                r" (?:schools|students|educators|teachers)\b",
+    'international_only': r"\b(?:foreign|non-U\.?S\.?|international) (?:organizations|institutions|entities|applicants)"
+                          r" only\b|\bonly (?:to )?(?:foreign|non-U\.?S\.?) (?:organizations|institutions|entities)\b",
+}
+
+# "Eligibility is limited to ...", "Only ... are eligible", "open only to ..."
+RESTRICTION_PATTERN = re.compile(
+    r"\b(?:limited|restricted) to ([^.;]+)|\bopen only to ([^.;]+)|\bonly ([^.;]{3,120}?) (?:are|is|will be) eligible",
+    re.IGNORECASE
+)
+
+US_STATES = [
+    "Alabama", "Alaska", "Arizona", "Arkansas", "California", "Colorado", "Connecticut", "Delaware",
+    "Florida", "Georgia", "Hawaii", "Idaho", "Illinois", "Indiana", "Iowa", "Kansas", "Kentucky",
+    "Louisiana", "Maine", "Maryland", "Massachusetts", "Michigan", "Minnesota", "Mississippi",
+    "Missouri", "Montana", "Nebraska", "Nevada", "New Hampshire", "New Jersey", "New Mexico",
+    "New York", "North Carolina", "North Dakota", "Ohio", "Oklahoma", "Oregon", "Pennsylvania",
+    "Rhode Island", "South Carolina", "South Dakota", "Tennessee", "Texas", "Utah", "Vermont",
+    "Virginia", "Washington", "West Virginia", "Wisconsin", "Wyoming", "District of Columbia",
+    "Puerto Rico",
+]
+
+_STATES = "|".join(sorted((re.escape(s) for s in US_STATES), key=len, reverse=True))
+GEOGRAPHY_PATTERN = re.compile(
+    rf"\b(?:located|based|headquartered|residing|residents?|operating|domiciled) (?:in|of) "
+    rf"(?:the (?:state|commonwealth) of )?({_STATES})\b(?!,? D\.?C\b)"
+    rf"|\b({_STATES})[- ]based\b"
+    rf"|\b({_STATES}) (?:organizations|institutions|nonprofits|residents|applicants) only\b",
+    re.IGNORECASE
+)
+
+Rule = Tuple[str, Callable[[Dict[str, Any], str], Optional[str]]]
+
+
+class EligibilityEngine:
+    """
+    Compiled eligibility predicate for one org profile
+
+    Usage:
+        engine = EligibilityEngine(org_profile)
+        reason = engine.check(grant)   # None if eligible, else "rule: detail"
+        engine.rejections              # Counter of rejecting rule names
+    """
+
+    def __init__(self, org_profile: Any):
+        """
+        Args:
+            org_profile: OrgProfile with entity_type, eligibility_types,
+                excluded_entity_types, location and grant size bounds
+        """
+        self.profile = org_profile
+        self.rejections: Counter = Counter()
+
+        self.codes = self._compile_codes([org_profile.entity_type] + list(org_profile.eligibility_types))
+        own_terms = "|".join(CODE_TERMS[c] for c in sorted(self.codes) if c in CODE_TERMS)
+        other_terms = "|".join(CODE_TERMS[c] for c in sorted(CODE_TERMS) if c not in self.codes)
+        self._own_entity = re.compile(rf"\b(?:{own_terms})\b", re.IGNORECASE) if own_terms else None
+        self._other_entity = re.compile(rf"\b(?:{other_terms})\b", re.IGNORECASE) if other_terms else None
+        self._excluded = self._compile_excluded(org_profile.excluded_entity_types)
+        self.state = (org_profile.location or '').strip().casefold()
+
+        self.rules: List[Rule] = [
+            ('grant_size', self._check_size),
+            ('eligibility_code', self._check_codes),
+            ('excluded_entity', self._check_excluded),
+            ('restricted_text', self._check_restriction),
+            ('geography', self._check_geography),
+        ]
+
+    # Compilation
+
+    def _compile_codes(self, entity_types: List[str]) -> FrozenSet[str]:
+        """Map profile entity types (short names or grants.gov labels) to codes"""
+        labels = {code: normalize_text(label) for code, label in ELIGIBILITY_CODES.items()}
+        codes = set()
+        for entity_type in entity_types:
+            if not entity_type:
+                continue
+            key = normalize_text(entity_type).replace(' ', '_')
+            if key in ENTITY_TYPE_CODES:
+                codes |= ENTITY_TYPE_CODES[key]
+                continue
+            words = normalize_text(entity_type)
+            matched = {code for code, label in labels.items() if label.startswith(words)}
+            if matched:
+                codes |= matched
+            else:
+                logger.warning(f"Unknown eligibility type in org profile: {entity_type!r}")
+        return frozenset(codes - OPEN_CODES)
+
+    def _compile_excluded(self, excluded_types: List[str]) -> Optional["re.Pattern"]:
+        """One alternation with a named group per excluded entity type"""
+        groups = []
+        for i, entity_type in enumerate(excluded_types):
+            pattern = EXCLUDED_ENTITY_PATTERNS.get(entity_type)
+            if pattern is None:
+                words = normalize_text(entity_type).split()
+                if not words:
+                    continue
+                pattern = r"\b" + r"[\s_-]+".join(map(re.escape, words)) + r"\b"
+            groups.append(f"(?P<excluded{i}>{pattern})")
+        return re.compile("|".join(groups), re.IGNORECASE) if groups else None
+
+    # Rules - each returns a rejection detail or None
+
+    def _check_size(self, grant: Dict[str, Any], text: str) -> Optional[str]:
+        ceiling, floor = grant.get('award_ceiling'), grant.get('award_floor')
+        size_min, size_max = self.profile.grant_size_min, self.profile.grant_size_max
+        if size_min and ceiling and ceiling < size_min:
+            return f"award ceiling ${ceiling:,.0f} below minimum ${size_min:,.0f}"
+        if size_max and floor and floor > size_max:
+            return f"award floor ${floor:,.0f} above maximum ${size_max:,.0f}"
+        return None
+
+    def _check_codes(self, grant: Dict[str, Any], text: str) -> Optional[str]:
+        codes = set(grant.get('eligibility_codes') or [])
+        if not codes or codes & OPEN_CODES or codes & self.codes:
+            return None
+        return "open only to " + "; ".join(ELIGIBILITY_CODES.get(c, c) for c in sorted(codes))
+
+    def _check_excluded(self, grant: Dict[str, Any], text: str) -> Optional[str]:
+        if self._excluded is None:
+            return None
+        match = self._excluded.search(text)
+        if match is None:
+            return None
+        entity_type = self.profile.excluded_entity_types[int(match.lastgroup[len('excluded'):])]
+        return f"{entity_type} ({match.group(0)!r})"
+
+    def _check_restriction(self, grant: Dict[str, Any], text: str) -> Optional[str]:
+        if self._other_entity is None:
+            return None
+        for match in RESTRICTION_PATTERN.finditer(grant.get('eligibility') or ''):
+            clause = next(g for g in match.groups() if g)
+            # Only clauses naming applicant types count ("limited to two proposals" doesn't)
+            if self._other_entity.search(clause) and not (self._own_entity and self._own_entity.search(clause)):
+                return f"{match.group(0).strip()[:120]!r}"
+        return None
+
+    def _check_geography(self, grant: Dict[str, Any], text: str) -> Optional[str]:
+        if not self.state:
+            return None
+        text = grant.get('eligibility') or text
+        states = {s for m in GEOGRAPHY_PATTERN.finditer(text) for s in m.groups() if s}
+        if states and self.state not in {s.casefold() for s in states}:
+            return "limited to " + ", ".join(sorted(states))
+        return None
+
+    # Evaluation
+
+    def check(self, grant: Dict[str, Any]) -> Optional[str]:
+        """
+        Run the rules in order
+
+        The result is also stored on the grant as 'eligibility_rejection'.
+
+        Returns:
+            None if the org can apply, otherwise "<rule>: <detail>"
+        """
+        text = f"{grant.get('title', '')}\n{grant.get('eligibility') or ''}\n{grant.get('description', '')}"
+        reason = None
+        for name, rule in self.rules:
+            detail = rule(grant, text)
+            if detail:
+                self.rejections[name] += 1
+                reason = f"{name}: {detail}"
+                break
+        grant['eligibility_rejection'] = reason
+        return reason
+
+    def is_eligible(self, grant: Dict[str, Any]) -> bool:
+        return self.check(grant) is None
+
+
+if __name__ == "__main__":
+    from types import SimpleNamespace
+
+    profile = SimpleNamespace(
+        entity_type="university",
+        location="Massachusetts",
+        grant_size_min=1000,
+        grant_size_max=None,
+        eligibility_types=["Nonprofits having a 501(c)(3) status", "Private institutions of higher education",
+                           "higher_education", "nonprofit"],
+        excluded_entity_types=["individual", "k12_only", "international_only"],
+    )
+    engine = EligibilityEngine(profile)
+    assert engine.codes == {'06', '12', '20'}
+
+    assert engine.check({'eligibility_codes': ['20', '21']}) is None
+    assert engine.check({'eligibility_codes': ['99']}) is None
+    assert engine.check({'eligibility_codes': ['21']}).startswith('eligibility_code')
+    assert engine.check({'award_ceiling': 500}).startswith('grant_size')
+    assert engine.check({'eligibility': 'Fellowships are open to individuals only.'}).startswith('excluded_entity')
+    assert engine.check({'eligibility_codes': ['25'],
+                         'eligibility': 'Eligibility is limited to State governments and tribes.'}
+                        ).startswith('restricted_text')
+    assert engine.check({'eligibility': 'Eligibility is limited to institutions of higher education.'}) is None
+    assert engine.check({'eligibility': 'Applications are limited to two per institution.'}) is None
+    assert engine.check({'description': 'For nonprofits based in Ohio.'}).startswith('geography')
+    assert engine.check({'description': 'For nonprofits located in the Commonwealth of Massachusetts.'}) is None
+    assert engine.check({'description': 'Organizations based in Washington, DC are preferred.'}) is None
+    grant = {'eligibility': 'Open to accredited universities nationwide.',
+             'description': 'Expands a program for students residing in Ohio.'}
+    assert engine.check(grant) is None and grant['eligibility_rejection'] is None
+    grant = {'eligibility': 'Applicants must be located in Texas.'}
+    assert engine.check(grant) == grant['eligibility_rejection'] == 'geography: limited to Texas'
+    assert engine.rejections == Counter({'eligibility_code': 1, 'grant_size': 1, 'excluded_entity': 1,
+                                         'restricted_text': 1, 'geography': 2})
+    print("Eligibility engine tests passed!")
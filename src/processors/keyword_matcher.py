@@ -0,0 +1,120 @@
+"""
+Keyword Matcher
+
+Single-pass multi-phrase matching (Aho-Corasick) for relevance scoring.
+
+All phrases are compiled once into one automaton, so a grant's text is
+scanned once no matter how many keywords the org profile lists. Text and
+phrases are normalized the same way - case-folded, underscores and
+punctuation turned into spaces - which makes `stem_education` match
+"STEM education" and gives every match whole-word boundaries.
+"""
+
+import re
+import logging
+from collections import deque
+from typing import Dict, Iterable, List, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+_NON_WORD = re.compile(r"[^0-9a-z]+")
+
+
+def normalize_text(text: str) -> str:
+    """Case-fold and reduce text to space-separated words"""
+    return _NON_WORD.sub(' ', (text or '').casefold().replace('_', ' ')).strip()
+
+
+class KeywordMatcher:
+    """
+    Compiled matcher for a fixed set of labelled phrases
+
+    Usage:
+        matcher = KeywordMatcher([("focus", "stem_education"), ("exclude", "clinical trial")])
+        matcher.find("New STEM Education grants")  # {("focus", "stem_education")}
+    """
+
+    def __init__(self, phrases: Iterable[Tuple[str, str]], match_plurals: bool = True):
+        """
+        Build the automaton
+
+        Args:
+            phrases: (label, phrase) pairs; the pair is reported on a match
+            match_plurals: Also match the phrase with a trailing "s"
+        """
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._output: List[List[Tuple[str, str]]] = [[]]
+        self.phrase_count = 0
+
+        for label, phrase in phrases:
+            words = normalize_text(phrase)
+            if not words:
+                continue
+            self._add(f" {words} ", (label, phrase))
+            if match_plurals and not words.endswith('s'):
+                self._add(f" {words}s ", (label, phrase))
+            self.phrase_count += 1
+
+        self._build_failure_links()
+
+    def _add(self, pattern: str, value: Tuple[str, str]):
+        """Insert one pattern into the trie"""
+        state = 0
+        for char in pattern:
+            next_state = self._goto[state].get(char)
+            if next_state is None:
+                next_state = len(self._goto)
+                self._goto[state][char] = next_state
+                self._goto.append({})
+                self._fail.append(0)
+                self._output.append([])
+            state = next_state
+        if value not in self._output[state]:
+            self._output[state].append(value)
+
+    def _build_failure_links(self):
+        """Breadth-first pass linking each state to its longest proper suffix"""
+        queue = deque(self._goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self._goto[state].items():
+                queue.append(next_state)
+                fallback = self._fail[state]
+                while fallback and char not in self._goto[fallback]:
+                    fallback = self._fail[fallback]
+                target = self._goto[fallback].get(char, 0)
+                self._fail[next_state] = target if target != next_state else 0
+                self._output[next_state].extend(
+                    v for v in self._output[self._fail[next_state]] if v not in self._output[next_state]
+                )
+
+    def find(self, text: str) -> Set[Tuple[str, str]]:
+        """Return every (label, phrase) pair occurring in the text"""
+        found: Set[Tuple[str, str]] = set()
+        goto, fail, output = self._goto, self._fail, self._output
+        state = 0
+
+        for char in f" {normalize_text(text)} ":
+            while state and char not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(char, 0)
+            if output[state]:
+                found.update(output[state])
+
+        return found
+
+
+if __name__ == "__main__":
+    matcher = KeywordMatcher([
+        ("focus", "stem_education"),
+        ("include", "AI"),
+        ("include", "startup"),
+        ("exclude", "clinical trial"),
+    ])
+    assert matcher.find("Funding for STEM-education and AI startups") == {
+        ("focus", "stem_education"), ("include", "AI"), ("include", "startup")
+    }
+    assert matcher.find("Said the chair") == set()  # no "ai" inside words
+    assert matcher.find("Phase II Clinical Trials") == {("exclude", "clinical trial")}
+    print("Keyword matcher tests passed!")
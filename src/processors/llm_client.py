@@ -0,0 +1,357 @@
+"""
+LLM Client
+
+Provider-agnostic access to Claude and OpenAI for the analyzer.
+
+Each provider keeps a rolling window of recent calls (latency and
+success) and a CircuitBreaker. Every request is routed to the healthiest
+provider first - lowest p95 latency, penalized by error rate - and fails
+over to the next one when a call errors or the provider's circuit is
+open. A provider in a slow period is skipped instead of stalling the run;
+every `probe_every`-th request goes to the runner-up so a recovered
+provider's statistics get refreshed and it can win traffic back.
+
+Prompts may be split into a stable prefix (instructions, org profile) and
+a per-request suffix. The prefix is sent as the system prompt - marked
+with cache_control for Claude, and placed first so OpenAI's automatic
+prefix caching applies - and token usage is accounted per run: estimated
+prefix and suffix tokens plus the provider-reported cache reads.
+Providers ignore cache markers on prefixes shorter than their minimum
+(PROMPT_CACHE_MIN_TOKENS); the first such prefix per model is logged.
+"""
+
+import json
+import time
+import logging
+import itertools
+import threading
+from collections import Counter, deque
+from typing import Any, Deque, Dict, List, Optional, Tuple
+
+# Support both Claude and OpenAI
+try:
+    import anthropic
+    CLAUDE_AVAILABLE = True
+except ImportError:
+    CLAUDE_AVAILABLE = False
+
+try:
+    import openai
+    OPENAI_AVAILABLE = True
+except ImportError:
+    OPENAI_AVAILABLE = False
+
+from utils.error_handling import CircuitBreaker, RateLimiter
+
+logger = logging.getLogger(__name__)
+
+# HTTP statuses worth retrying (rate limited / overloaded / transient)
+RETRYABLE_STATUS = {429, 500, 502, 503, 529}
+
+# Assumed p95 (seconds) for a provider without enough samples yet
+UNMEASURED_P95 = 15.0
+
+# Rough characters per token, for prefix/suffix estimates
+CHARS_PER_TOKEN = 4
+
+# Shortest prefix (tokens, including any tool/response schema) a provider
+# will cache; Claude Haiku models need twice the usual minimum
+PROMPT_CACHE_MIN_TOKENS = {'claude': 1024, 'claude-haiku': 2048, 'openai': 1024}
+
+
+class ProviderHealth:
+    """Rolling latency and error statistics for one provider"""
+
+    def __init__(self, window: int = 100, max_age: float = 300.0, min_samples: int = 5):
+        """
+        Args:
+            window: Most recent calls kept
+            max_age: Calls older than this many seconds are forgotten
+            min_samples: Calls needed before the statistics drive routing
+        """
+        self.calls: Deque[Tuple[float, float, bool]] = deque(maxlen=window)
+        self.max_age = max_age
+        self.min_samples = min_samples
+        self._lock = threading.Lock()
+
+    def record(self, seconds: float, ok: bool):
+        with self._lock:
+            self.calls.append((time.time(), seconds, ok))
+
+    def snapshot(self) -> Dict[str, Any]:
+        """p50/p95 latency (seconds) and error rate over the window"""
+        cutoff = time.time() - self.max_age
+        with self._lock:
+            while self.calls and self.calls[0][0] < cutoff:
+                self.calls.popleft()
+            calls = list(self.calls)
+        if not calls:
+            return {'calls': 0, 'p50': None, 'p95': None, 'error_rate': 0.0}
+        latencies = sorted(seconds for _, seconds, _ in calls)
+        return {
+            'calls': len(calls),
+            'p50': latencies[len(latencies) // 2],
+            'p95': latencies[min(len(latencies) - 1, int(len(latencies) * 0.95))],
+            'error_rate': sum(1 for _, _, ok in calls if not ok) / len(calls),
+        }
+
+    def penalty(self) -> float:
+        """Routing cost: p95 latency inflated by the error rate"""
+        stats = self.snapshot()
+        if stats['calls'] < self.min_samples:
+            return UNMEASURED_P95
+        return stats['p95'] * (1 + 4 * stats['error_rate'])
+
+
+class LLMProvider:
+    """One LLM API with its health tracking and circuit breaker"""
+
+    name = "provider"
+
+    def __init__(self, failure_threshold: int = 3, recovery_timeout: int = 60):
+        self.health = ProviderHealth()
+        self.breaker = CircuitBreaker(failure_threshold=failure_threshold, recovery_timeout=recovery_timeout)
+
+    def cache_min_tokens(self, model: str) -> int:
+        """Shortest prefix this provider caches for a model"""
+        return PROMPT_CACHE_MIN_TOKENS.get(self.name, 1024)
+
+    def complete(self, prompt: str, model: str, max_tokens: int, schema: Optional[Dict[str, Any]] = None,
+                 prefix: Optional[str] = None) -> Tuple[Optional[str], Dict[str, int]]:
+        """
+        Send one prompt
+
+        Args:
+            prefix: Stable leading context, sent so the provider can cache it
+
+        Returns:
+            (text, usage) - with a schema the text is the JSON object; usage
+            has input_tokens, output_tokens, cache_read_tokens, cache_write_tokens
+        """
+        raise NotImplementedError
+
+
+class ClaudeProvider(LLMProvider):
+    name = "claude"
+
+    def __init__(self, api_key: str, timeout: float = 60.0, **kwargs):
+        super().__init__(**kwargs)
+        self.client = anthropic.Anthropic(api_key=api_key, timeout=timeout)
+
+    def cache_min_tokens(self, model: str) -> int:
+        if 'haiku' in model:
+            return PROMPT_CACHE_MIN_TOKENS['claude-haiku']
+        return PROMPT_CACHE_MIN_TOKENS['claude']
+
+    def complete(self, prompt: str, model: str, max_tokens: int, schema: Optional[Dict[str, Any]] = None,
+                 prefix: Optional[str] = None) -> Tuple[Optional[str], Dict[str, int]]:
+        kwargs = {}
+        if schema:
+            # Forcing a tool call makes Claude answer with input matching the schema
+            kwargs['tools'] = [{"name": "record_result", "description": "Record the structured result",
+                                "input_schema": schema}]
+            kwargs['tool_choice'] = {"type": "tool", "name": "record_result"}
+        if prefix:
+            # Tools and system prompt up to this breakpoint are cached between requests
+            kwargs['system'] = [{"type": "text", "text": prefix, "cache_control": {"type": "ephemeral"}}]
+        response = self.client.messages.create(
+            model=model,
+            max_tokens=max_tokens,
+            messages=[{"role": "user", "content": prompt}],
+            **kwargs
+        )
+
+        usage = response.usage
+        tokens = {
+            'input_tokens': usage.input_tokens,
+            'output_tokens': usage.output_tokens,
+            'cache_read_tokens': getattr(usage, 'cache_read_input_tokens', 0) or 0,
+            'cache_write_tokens': getattr(usage, 'cache_creation_input_tokens', 0) or 0,
+        }
+        for block in response.content:
+            if block.type == 'tool_use':
+                return json.dumps(block.input), tokens
+        return ''.join(block.text for block in response.content if block.type == 'text'), tokens
+
+
+class OpenAIProvider(LLMProvider):
+    name = "openai"
+
+    def __init__(self, api_key: Optional[str], base_url: Optional[str] = None, timeout: float = 60.0, **kwargs):
+        super().__init__(**kwargs)
+        # A local OpenAI-compatible server needs no real key
+        self.client = openai.OpenAI(api_key=api_key or "local", base_url=base_url, timeout=timeout)
+
+    def complete(self, prompt: str, model: str, max_tokens: int, schema: Optional[Dict[str, Any]] = None,
+                 prefix: Optional[str] = None) -> Tuple[Optional[str], Dict[str, int]]:
+        kwargs = {}
+        if schema:
+            kwargs['response_format'] = {"type": "json_schema",
+                                         "json_schema": {"name": "result", "schema": schema}}
+        # OpenAI caches identical prompt prefixes automatically; keep the stable part first
+        messages = [{"role": "system", "content": prefix}] if prefix else []
+        messages.append({"role": "user", "content": prompt})
+        response = self.client.chat.completions.create(
+            model=model,
+            max_tokens=max_tokens,
+            messages=messages,
+            **kwargs
+        )
+
+        usage = response.usage
+        details = getattr(usage, 'prompt_tokens_details', None)
+        cached = (getattr(details, 'cached_tokens', 0) or 0) if details else 0
+        tokens = {
+            'input_tokens': usage.prompt_tokens - cached,
+            'output_tokens': usage.completion_tokens,
+            'cache_read_tokens': cached,
+            'cache_write_tokens': 0,
+        }
+        return response.choices[0].message.content, tokens
+
+
+class LLMClient:
+    """
+    Routes requests across providers by health, failing over on errors
+
+    Usage:
+        client = LLMClient.from_keys(claude_key, openai_key)
+        text, model = client.generate(prompt, {"claude": "claude-3-5-haiku-20241022", "openai": "gpt-4o"})
+    """
+
+    def __init__(self, providers: List[LLMProvider], requests_per_minute: int = 50, max_retries: int = 3,
+                 probe_every: int = 20):
+        """
+        Args:
+            providers: In priority order (used to break routing ties)
+            requests_per_minute: Rate limit per provider, shared by all threads
+            max_retries: Rounds over all providers when every one fails with
+                a retryable error (rate limit / overload)
+            probe_every: Send every Nth request to the second-best provider
+        """
+        self.providers = providers
+        self.max_retries = max_retries
+        self.probe_every = probe_every
+        self._requests = itertools.count(1)
+        # Token accounting across every request of this client (one run)
+        self.usage: Counter = Counter()
+        self._usage_lock = threading.Lock()
+        # (provider, model) pairs whose prefix length has been checked
+        self._cache_checked = set()
+        self.rate_limiter = RateLimiter(max_calls=requests_per_minute, time_window=60)
+
+    @classmethod
+    def from_keys(cls, claude_api_key: Optional[str] = None, openai_api_key: Optional[str] = None,
+                  openai_base_url: Optional[str] = None, timeout: float = 60.0, **kwargs) -> "LLMClient":
+        """Build a client with every provider that has an SDK and credentials (Claude first)"""
+        providers: List[LLMProvider] = []
+        if CLAUDE_AVAILABLE and claude_api_key:
+            try:
+                providers.append(ClaudeProvider(claude_api_key, timeout=timeout))
+                logger.info("Claude client initialized")
+            except Exception as e:
+                logger.error(f"Failed to initialize Claude: {str(e)}")
+        if OPENAI_AVAILABLE and (openai_api_key or openai_base_url):
+            try:
+                providers.append(OpenAIProvider(openai_api_key, base_url=openai_base_url, timeout=timeout))
+                logger.info(f"OpenAI client initialized{f' ({openai_base_url})' if openai_base_url else ''}")
+            except Exception as e:
+                logger.error(f"Failed to initialize OpenAI: {str(e)}")
+        return cls(providers, **kwargs)
+
+    @property
+    def available(self) -> bool:
+        return bool(self.providers)
+
+    def route(self) -> List[LLMProvider]:
+        """Providers whose circuit allows calls, healthiest first"""
+        ranked = sorted(enumerate(self.providers), key=lambda item: (item[1].health.penalty(), item[0]))
+        providers = [provider for _, provider in ranked if provider.breaker.allows_calls()]
+        if len(providers) > 1 and self.probe_every and next(self._requests) % self.probe_every == 0:
+            providers[0], providers[1] = providers[1], providers[0]
+        return providers
+
+    def generate(self, prompt: str, models: Dict[str, str], max_tokens: int,
+                 schema: Optional[Dict[str, Any]] = None,
+                 prefix: Optional[str] = None) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Send a prompt to the healthiest provider, failing over to the others
+
+        Args:
+            prompt: Per-request part of the prompt
+            models: Provider name -> model to use on that provider
+            prefix: Stable leading context shared by many requests
+
+        Returns:
+            (response_text, model) or (None, None) if every provider failed
+        """
+        delay = 2.0
+        for attempt in range(1, self.max_retries + 1):
+            retryable = False
+            for provider in self.route():
+                model = models.get(provider.name)
+                if not model:
+                    continue
+                self.rate_limiter.acquire(provider.name)
+                started = time.time()
+                try:
+                    text, tokens = provider.breaker.call(provider.complete, prompt, model, max_tokens,
+                                                         schema, prefix)
+                except Exception as e:
+                    provider.health.record(time.time() - started, False)
+                    status = getattr(e, 'status_code', None)
+                    retryable = retryable or status in RETRYABLE_STATUS
+                    logger.warning(f"{provider.name} API error ({status or type(e).__name__}): {str(e)[:200]}")
+                    continue
+                provider.health.record(time.time() - started, True)
+                self._record_usage(prefix, prompt, tokens)
+                if prefix:
+                    self._check_cacheable(provider, model, prefix, schema)
+                if text:
+                    return text, model
+
+            if not retryable or attempt == self.max_retries:
+                break
+            logger.warning(f"All providers failed, retrying in {delay:.0f}s (attempt {attempt}/{self.max_retries})")
+            time.sleep(delay)
+            delay *= 2
+
+        logger.error("LLM request failed on every provider")
+        return None, None
+
+    def _record_usage(self, prefix: Optional[str], prompt: str, tokens: Dict[str, int]):
+        with self._usage_lock:
+            self.usage['requests'] += 1
+            self.usage['prefix_tokens_est'] += len(prefix or '') // CHARS_PER_TOKEN
+            self.usage['suffix_tokens_est'] += len(prompt) // CHARS_PER_TOKEN
+            self.usage.update(tokens)
+
+    def _check_cacheable(self, provider: LLMProvider, model: str, prefix: str,
+                         schema: Optional[Dict[str, Any]]):
+        """Log once per model when a prefix is too short for the provider to cache"""
+        if (provider.name, model) in self._cache_checked:
+            return
+        self._cache_checked.add((provider.name, model))
+        estimate = (len(prefix) + (len(json.dumps(schema)) if schema else 0)) // CHARS_PER_TOKEN
+        minimum = provider.cache_min_tokens(model)
+        if estimate < minimum:
+            logger.info(f"Prompt prefix for {model} is ~{estimate} tokens, below the {minimum}-token "
+                        f"minimum {provider.name} caches; it is billed in full on every request")
+
+    def get_usage(self) -> Dict[str, int]:
+        """
+        Token totals so far
+
+        prefix/suffix_tokens_est are character-based estimates of the shared
+        and per-request prompt parts; the rest is what providers reported.
+        input_tokens excludes tokens read from the provider's prompt cache.
+        """
+        with self._usage_lock:
+            return dict(self.usage)
+
+    def get_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-provider latency, error rate and circuit state"""
+        return {
+            provider.name: {**provider.health.snapshot(), 'circuit': provider.breaker.get_state()}
+            for provider in self.providers
+        }
@@ -10,7 +10,12 @@ Reference implementations:
 
 import logging
 from typing import List, Dict, Any
-from dataclasses import dataclass
+from dataclasses import dataclass, field
+
+from processors.eligibility import EligibilityEngine
+from processors.keyword_matcher import KeywordMatcher
+from processors.relevance import RelevanceEngine, SCIPY_AVAILABLE
+from processors.semantic import SemanticMatcher, SEMANTIC_AVAILABLE, DEFAULT_MODEL
 
 logger = logging.getLogger(__name__)
 
@@ -23,26 +28,81 @@ class OrgProfile:
     focus_areas: List[str]  # Keywords for relevance matching
     grant_size_min: int
     grant_size_max: int
+    include_keywords: List[str] = field(default_factory=list)  # Keywords signalling a good fit
+    exclude_keywords: List[str] = field(default_factory=list)  # Keywords signalling a poor fit
+    eligibility_types: List[str] = field(default_factory=list)  # Applicant types we can apply as
+    excluded_entity_types: List[str] = field(default_factory=list)  # Restrictions that rule a grant out
 
 
 class GrantMatcher:
     """Matches grants against organization profile"""
 
-    def __init__(self, org_profile: OrgProfile):
+    # Relevance points per distinct phrase found; 10 points is a perfect score
+    FOCUS_AREA_POINTS = 2.0
+    KEYWORD_POINTS = 1.0
+    TITLE_BONUS_POINTS = 1.0
+
+    def __init__(self, org_profile: OrgProfile, mode: str = "bm25", cache_dir: str = "cache/relevance",
+                 embedding_model: str = DEFAULT_MODEL, embedding_cache_dir: str = "cache/embeddings"):
+        """
+        Args:
+            org_profile: Organization to match against
+            mode: "bm25" (vectorized over the catalog), "semantic" (local
+                embedding model) or "keyword" (per grant)
+            cache_dir: Where the bm25 index persists between runs
+            embedding_model: sentence-transformers model for semantic mode
+            embedding_cache_dir: Where grant embeddings persist between runs
+        """
         self.profile = org_profile
+        self.eligibility = EligibilityEngine(org_profile)
+        # Compiled once per profile - each grant's text is then scanned once
+        self.keyword_matcher = KeywordMatcher(
+            [('focus', area) for area in org_profile.focus_areas] +
+            [('include', keyword) for keyword in org_profile.include_keywords] +
+            [('exclude', keyword) for keyword in org_profile.exclude_keywords]
+        )
+
+        self.mode = mode
+        self.relevance_engine = None
+        if mode == "semantic":
+            if SEMANTIC_AVAILABLE:
+                self.relevance_engine = SemanticMatcher(
+                    org_profile.focus_areas + org_profile.include_keywords,
+                    model_name=embedding_model,
+                    cache_dir=embedding_cache_dir
+                )
+            else:
+                logger.warning("sentence-transformers not installed, falling back to bm25 relevance scoring")
+                mode = "bm25"
+
+        if mode == "bm25":
+            if SCIPY_AVAILABLE:
+                query = {keyword: self.KEYWORD_POINTS for keyword in org_profile.include_keywords}
+                for area in org_profile.focus_areas:
+                    query[area] = query.get(area, 0.0) + self.FOCUS_AREA_POINTS
+                self.relevance_engine = RelevanceEngine(
+                    query,
+                    exclude_matcher=self.keyword_matcher,
+                    exclude_phrases=org_profile.exclude_keywords,
+                    cache_dir=cache_dir
+                )
+            else:
+                logger.warning("numpy/scipy not installed, falling back to keyword relevance scoring")
 
     def is_eligible(self, grant: Dict[str, Any]) -> bool:
         """
         Check if org is eligible for this grant
 
         Checks:
-        - Entity type (university, nonprofit, etc.)
-        - Geographic restrictions
         - Grant size range
+        - grants.gov eligibility codes
+        - Excluded entity types and restrictive eligibility text
+        - Geographic restrictions
         """
-        # TODO: Implement eligibility checking
-        # Parse grant eligibility field and match against profile
-        logger.warning("GrantMatcher.is_eligible() not implemented")
+        reason = self.eligibility.check(grant)
+        if reason:
+            logger.debug(f"Ineligible: {grant.get('title', '')[:80]} - {reason}")
+            return False
         return True
 
     def calculate_relevance_score(self, grant: Dict[str, Any]) -> float:
@@ -50,14 +110,26 @@ class GrantMatcher:
         Calculate relevance score (0-10) based on focus area alignment
 
         Uses keyword matching and optionally LLM for semantic matching.
+        Any exclude keyword scores 0. Otherwise each distinct focus area and
+        include keyword adds points, with a bonus for phrases in the title.
         """
-        # TODO: Implement scoring
-        # Options:
-        # 1. Simple keyword overlap
-        # 2. TF-IDF similarity
-        # 3. LLM-based semantic matching (see Vanderbilt grant-match)
-        logger.warning("GrantMatcher.calculate_relevance_score() not implemented")
-        return 5.0
+        title_matches = self.keyword_matcher.find(grant.get('title', ''))
+        body_matches = self.keyword_matcher.find(grant.get('description', ''))
+        matches = title_matches | body_matches
+
+        if any(label == 'exclude' for label, _ in matches):
+            return 0.0
+
+        points = 0.0
+        for label, _ in matches:
+            points += self.FOCUS_AREA_POINTS if label == 'focus' else self.KEYWORD_POINTS
+        points += self.TITLE_BONUS_POINTS * len(title_matches)
+
+        return min(10.0, points)
+
+    def _has_exclude_keyword(self, grant: Dict[str, Any]) -> bool:
+        matches = self.keyword_matcher.find(f"{grant.get('title', '')}\n{grant.get('description', '')}")
+        return any(label == 'exclude' for label, _ in matches)
 
     def filter_and_rank(self, grants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
         """
@@ -65,7 +137,26 @@ class GrantMatcher:
 
         Returns grants sorted by relevance score with eligibility confirmed.
         """
+        rejected_before = self.eligibility.rejections.copy()
         eligible = [g for g in grants if self.is_eligible(g)]
-        for grant in eligible:
-            grant['relevance_score'] = self.calculate_relevance_score(grant)
-        return sorted(eligible, key=lambda g: g['relevance_score'], reverse=True)
+        rejected = self.eligibility.rejections - rejected_before
+        logger.info(f"Eligible: {len(eligible)} of {len(grants)} grants; rejected by rule: "
+                    f"{dict(rejected.most_common()) or 'none'}")
+
+        if self.relevance_engine is None:
+            for grant in eligible:
+                grant['relevance_score'] = self.calculate_relevance_score(grant)
+            return sorted(eligible, key=lambda g: g['relevance_score'], reverse=True)
+
+        # Score and sort the whole catalog in one vectorized pass
+        scores = self.relevance_engine.score_grants(eligible)
+        if isinstance(self.relevance_engine, SemanticMatcher):
+            # Embeddings don't see exclude keywords - apply them explicitly
+            for i, grant in enumerate(eligible):
+                if self._has_exclude_keyword(grant):
+                    scores[i] = 0.0
+        order = (-scores).argsort(kind='stable')
+        ranked = [eligible[i] for i in order]
+        for grant, score in zip(ranked, scores[order].round(2).tolist()):
+            grant['relevance_score'] = score
+        return ranked
@@ -0,0 +1,319 @@
+"""
+Relevance Engine
+
+Vectorized BM25 scoring of the org profile against the whole catalog.
+
+Each run the catalog is held as a sparse document-term matrix (one row per
+grant, raw term counts). The vocabulary, document frequencies and per-grant
+rows are persisted, so only grants that are new or whose text changed are
+tokenized again. Scoring every grant against the profile is then a handful
+of NumPy operations over the matrix instead of a Python loop per grant.
+Terms no longer used by any grant are pruned from the vocabulary on update.
+
+Scores are absolute. Raw BM25 is on GrantMatcher's keyword points scale (a
+grant mentioning a profile phrase about once per average-length document
+earns roughly that phrase's weight) and is squashed into 0-10 with
+10 * s / (s + SATURATION_POINTS). Weak matches keep about their keyword
+points, strong ones approach 10 without ever tying at a cap, so ranking
+follows the raw score. A run of poor matches scores low instead of its best
+grant being stretched to 10, so fixed thresholds (heuristic triage) stay
+meaningful.
+
+Requires numpy and scipy; GrantMatcher falls back to keyword scoring
+without them.
+"""
+
+import os
+import json
+import hashlib
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+try:
+    import numpy as np
+    from scipy import sparse
+    SCIPY_AVAILABLE = True
+except ImportError:
+    SCIPY_AVAILABLE = False
+
+from processors.keyword_matcher import KeywordMatcher, normalize_text
+
+logger = logging.getLogger(__name__)
+
+STOPWORDS = frozenset("""
+a an and are as at be by for from has have in into is it its of on or that the
+their this to was were will with which who whom may must can also such these those
+""".split())
+
+
+def tokenize(text: str) -> List[str]:
+    """Split normalized text into index terms"""
+    return [t for t in normalize_text(text).split() if t not in STOPWORDS]
+
+
+class RelevanceEngine:
+    """
+    BM25 relevance of grants to a weighted set of profile phrases
+
+    Usage:
+        engine = RelevanceEngine({"entrepreneurship": 2.0, "AI": 1.0})
+        scores = engine.score_grants(grants)  # numpy array, 0-10
+    """
+
+    # Raw BM25 points that score 5; the profile's query weights sum to ~60
+    SATURATION_POINTS = 10.0
+
+    def __init__(self,
+                 query_phrases: Dict[str, float],
+                 exclude_matcher: Optional[KeywordMatcher] = None,
+                 exclude_phrases: Optional[List[str]] = None,
+                 cache_dir: str = "cache/relevance",
+                 k1: float = 1.5,
+                 b: float = 0.75):
+        """
+        Args:
+            query_phrases: Phrase -> weight (focus areas, include keywords)
+            exclude_matcher: Matcher confirming exclude phrases in grant text
+            exclude_phrases: Phrases that zero a grant's score
+            cache_dir: Where vocabulary, IDF stats and term counts persist
+            k1, b: BM25 term-frequency saturation and length normalization
+        """
+        if not SCIPY_AVAILABLE:
+            raise ImportError("RelevanceEngine requires numpy and scipy")
+
+        self.query_phrases = query_phrases
+        self.exclude_matcher = exclude_matcher
+        self.exclude_phrases = exclude_phrases or []
+        self.cache_dir = cache_dir
+        self.k1 = k1
+        self.b = b
+
+        self.vocabulary: Dict[str, int] = {}
+        self.doc_ids: List[str] = []
+        self.doc_hashes: List[str] = []
+        self.term_counts = sparse.csr_matrix((0, 0), dtype=np.float32)
+        self.doc_freq = np.zeros(0, dtype=np.int64)
+        self._load()
+
+    # Index maintenance
+
+    def update(self, grants: List[Dict[str, Any]]):
+        """
+        Align the index with the given grants, tokenizing only new or changed text
+
+        Rows for grants no longer present are dropped. Afterwards row i of the
+        term matrix corresponds to grants[i].
+        """
+        known = {doc_id: (row, doc_hash) for row, (doc_id, doc_hash)
+                 in enumerate(zip(self.doc_ids, self.doc_hashes))}
+
+        source_rows = np.empty(len(grants), dtype=np.int64)
+        new_docs: List[Tuple[int, Counter]] = []
+        ids, hashes = [], []
+
+        for i, grant in enumerate(grants):
+            doc_id = str(grant.get('opportunity_id') or grant.get('title', ''))
+            title = grant.get('title', '')
+            text = f"{title}\n{grant.get('description', '')}"
+            doc_hash = hashlib.md5(text.encode()).hexdigest()
+            ids.append(doc_id)
+            hashes.append(doc_hash)
+
+            cached = known.get(doc_id)
+            if cached and cached[1] == doc_hash:
+                source_rows[i] = cached[0]
+            else:
+                source_rows[i] = -1
+                # Title terms count twice so title matches weigh more
+                new_docs.append((i, Counter(tokenize(text) + tokenize(title))))
+
+        new_matrix = self._vectorize([counts for _, counts in new_docs])
+        vocab_size = len(self.vocabulary)
+
+        old = self.term_counts
+        old = sparse.csr_matrix((old.data, old.indices, old.indptr), shape=(old.shape[0], vocab_size))
+        kept_positions = np.flatnonzero(source_rows >= 0)
+        new_positions = np.array([i for i, _ in new_docs], dtype=np.int64)
+
+        stacked = sparse.vstack([old[source_rows[kept_positions]], new_matrix], format='csr')
+        # Reorder so row i is grants[i]
+        order = np.empty(len(grants), dtype=np.int64)
+        order[np.concatenate([kept_positions, new_positions]).astype(np.int64)] = np.arange(len(grants))
+        self.term_counts = stacked[order] if len(grants) else stacked
+
+        self.doc_ids, self.doc_hashes = ids, hashes
+        self.doc_freq = np.bincount(self.term_counts.indices, minlength=vocab_size)
+        pruned = self._prune_vocabulary()
+        logger.info(f"Relevance index: {len(grants)} grants, {len(new_docs)} (re)tokenized, "
+                    f"{len(self.vocabulary)} terms ({pruned} pruned)")
+        self._save()
+
+    def _prune_vocabulary(self) -> int:
+        """Drop terms no remaining grant contains; returns how many were dropped"""
+        keep = np.flatnonzero(self.doc_freq > 0)
+        dropped = len(self.vocabulary) - keep.size
+        if not dropped:
+            return 0
+        remap = np.full(len(self.vocabulary), -1, dtype=np.int64)
+        remap[keep] = np.arange(keep.size)
+        self.vocabulary = {term: int(remap[index]) for term, index in self.vocabulary.items()
+                           if remap[index] >= 0}
+        self.term_counts = self.term_counts[:, keep].tocsr()
+        self.doc_freq = self.doc_freq[keep]
+        return dropped
+
+    def _vectorize(self, docs: List[Counter]) -> "sparse.csr_matrix":
+        """Turn term counters into CSR rows, growing the vocabulary as needed"""
+        indptr, indices, data = [0], [], []
+        vocabulary = self.vocabulary
+        for counts in docs:
+            for term, count in counts.items():
+                index = vocabulary.get(term)
+                if index is None:
+                    index = vocabulary[term] = len(vocabulary)
+                indices.append(index)
+                data.append(count)
+            indptr.append(len(indices))
+        return sparse.csr_matrix(
+            (np.array(data, dtype=np.float32), np.array(indices, dtype=np.int32), np.array(indptr)),
+            shape=(len(docs), len(vocabulary))
+        )
+
+    # Scoring
+
+    def score_grants(self, grants: List[Dict[str, Any]]) -> "np.ndarray":
+        """
+        Score grants 0-10 against the profile phrases
+
+        Scores are absolute (see the module docstring), not relative to the
+        run's best grant, and strictly increase with the raw BM25 score.
+        Grants containing an exclude phrase score 0.
+        """
+        self.update(grants)
+        raw = self._bm25(self._query_vector())
+        scores = 10.0 * raw / (raw + self.SATURATION_POINTS)
+
+        excluded = self._excluded_rows(grants)
+        if excluded.size:
+            scores[excluded] = 0.0
+        return scores
+
+    def _query_vector(self) -> "np.ndarray":
+        """
+        Weighted query terms as a dense vocabulary-length vector
+
+        A phrase's weight is split across its terms, so matching the whole
+        phrase is worth the weight once, as in keyword scoring.
+        """
+        query = np.zeros(len(self.vocabulary), dtype=np.float64)
+        for phrase, weight in self.query_phrases.items():
+            terms = tokenize(phrase)
+            for term in terms:
+                index = self.vocabulary.get(term)
+                if index is not None:
+                    query[index] += weight / len(terms)
+        return query
+
+    def _bm25(self, query: "np.ndarray") -> "np.ndarray":
+        """
+        BM25 score of every row against the query vector
+
+        IDF is normalized to mean 1 over the query's terms: rarer terms still
+        count for more, but the overall scale follows the query weights
+        rather than the catalog size.
+        """
+        n_docs = self.term_counts.shape[0]
+        if n_docs == 0:
+            return np.zeros(0)
+
+        terms = np.flatnonzero(query)
+        if terms.size == 0:
+            return np.zeros(n_docs)
+
+        doc_len = np.asarray(self.term_counts.sum(axis=1)).ravel()
+        avg_len = max(doc_len.mean(), 1e-9)
+        idf = np.log1p((n_docs - self.doc_freq + 0.5) / (self.doc_freq + 0.5))
+        idf = idf / max(idf[terms].mean(), 1e-9)
+
+        # Only the query's columns matter
+        sub = self.term_counts[:, terms].tocsr()
+        rows = np.repeat(np.arange(n_docs), np.diff(sub.indptr))
+        tf = sub.data
+        norm = self.k1 * (1 - self.b + self.b * doc_len[rows] / avg_len)
+        weights = tf * (self.k1 + 1) / (tf + norm) * idf[terms][sub.indices] * query[terms][sub.indices]
+        return np.bincount(rows, weights=weights, minlength=n_docs)
+
+    def _excluded_rows(self, grants: List[Dict[str, Any]]) -> "np.ndarray":
+        """
+        Rows containing an exclude phrase
+
+        Rows holding every word of a phrase are found with sparse ops; only
+        those few candidates are confirmed with the exact phrase matcher.
+        """
+        candidates = np.zeros(self.term_counts.shape[0], dtype=bool)
+        for phrase in self.exclude_phrases:
+            terms = [self.vocabulary.get(t) for t in tokenize(phrase)]
+            if not terms or None in terms:
+                continue
+            present = (self.term_counts[:, terms] > 0).sum(axis=1)
+            candidates |= np.asarray(present).ravel() == len(terms)
+
+        rows = np.flatnonzero(candidates)
+        if self.exclude_matcher is None:
+            return rows
+        return np.array([
+            row for row in rows
+            if any(label == 'exclude' for label, _ in self.exclude_matcher.find(
+                f"{grants[row].get('title', '')}\n{grants[row].get('description', '')}"
+            ))
+        ], dtype=np.int64)
+
+    # Persistence
+
+    def _paths(self) -> Tuple[str, str, str]:
+        return (os.path.join(self.cache_dir, "vocabulary.json"),
+                os.path.join(self.cache_dir, "documents.json"),
+                os.path.join(self.cache_dir, "term_counts.npz"))
+
+    def _load(self):
+        """Load the persisted index, starting empty if missing or inconsistent"""
+        vocab_path, docs_path, matrix_path = self._paths()
+        if not all(os.path.exists(p) for p in self._paths()):
+            return
+        try:
+            with open(vocab_path, 'r') as f:
+                vocabulary = json.load(f)
+            with open(docs_path, 'r') as f:
+                docs = json.load(f)
+            arrays = np.load(matrix_path)
+            term_counts = sparse.csr_matrix(
+                (arrays['data'], arrays['indices'], arrays['indptr']),
+                shape=tuple(arrays['shape'])
+            )
+            if term_counts.shape != (len(docs['ids']), len(vocabulary)):
+                raise ValueError("index files are out of sync")
+        except Exception as e:
+            logger.warning(f"Ignoring relevance index in {self.cache_dir}: {e}")
+            return
+
+        self.vocabulary = vocabulary
+        self.doc_ids, self.doc_hashes = docs['ids'], docs['hashes']
+        self.term_counts = term_counts
+        self.doc_freq = arrays['doc_freq']
+
+    def _save(self):
+        """Persist vocabulary, IDF stats and term counts"""
+        vocab_path, docs_path, matrix_path = self._paths()
+        try:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            with open(vocab_path, 'w') as f:
+                json.dump(self.vocabulary, f)
+            with open(docs_path, 'w') as f:
+                json.dump({'ids': self.doc_ids, 'hashes': self.doc_hashes}, f)
+            matrix = self.term_counts
+            with open(matrix_path, 'wb') as f:
+                np.savez(f, data=matrix.data, indices=matrix.indices, indptr=matrix.indptr,
+                         shape=np.array(matrix.shape), doc_freq=self.doc_freq)
+        except Exception as e:
+            logger.error(f"Failed to save relevance index: {e}")
@@ -0,0 +1,200 @@
+"""
+Semantic Matcher
+
+Embedding-based relevance for grants that fit the profile without sharing
+its keywords ("workforce upskilling for emerging technology").
+
+Grant texts are embedded with a local CPU sentence-transformers model. The
+vectors live in an append-only float32 file that is memory-mapped on read,
+indexed by opportunity id plus a hash of the embedded text, so a grant is
+only embedded again when its title or description changes. Similarity to
+the profile centroid is one matrix-vector product over all grants.
+
+Requires numpy and sentence-transformers (imported only when used).
+"""
+
+import os
+import json
+import hashlib
+import logging
+import importlib.util
+from typing import Any, Dict, List, Optional
+
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+SEMANTIC_AVAILABLE = NUMPY_AVAILABLE and importlib.util.find_spec("sentence_transformers") is not None
+
+
+class SemanticMatcher:
+    """
+    Cosine similarity of grants to the org profile centroid
+
+    Usage:
+        matcher = SemanticMatcher(["entrepreneurship", "AI impact"])
+        scores = matcher.score_grants(grants)  # numpy array, 0-10
+    """
+
+    # Cosine similarity that scores 10. Grant text against a short profile
+    # rarely gets past this with MiniLM-style models, even for close fits
+    FULL_SCORE_SIMILARITY = 0.6
+
+    def __init__(self,
+                 profile_phrases: List[str],
+                 model_name: str = DEFAULT_MODEL,
+                 cache_dir: str = "cache/embeddings",
+                 batch_size: int = 64,
+                 max_chars: int = 2000):
+        """
+        Args:
+            profile_phrases: Focus areas / keywords describing the org
+            model_name: sentence-transformers model to run locally
+            cache_dir: Where the vector file and its index are stored
+            batch_size: Texts per encoder call
+            max_chars: Grant text is truncated to this length before embedding
+        """
+        if not SEMANTIC_AVAILABLE:
+            raise ImportError("SemanticMatcher requires numpy and sentence-transformers")
+
+        self.profile_phrases = [p.replace('_', ' ') for p in profile_phrases]
+        self.model_name = model_name
+        self.cache_dir = cache_dir
+        self.batch_size = batch_size
+        self.max_chars = max_chars
+        self._model = None
+        self._centroid = None
+
+        # Each model gets its own vector file - dimensions and spaces differ
+        model_key = hashlib.md5(model_name.encode()).hexdigest()[:12]
+        self.vectors_path = os.path.join(cache_dir, f"vectors-{model_key}.f32")
+        self.index_path = os.path.join(cache_dir, f"index-{model_key}.json")
+        self.dim: Optional[int] = None
+        self.index: Dict[str, int] = {}  # "<opportunity_id>:<text hash>" -> row
+        self._load_index()
+
+    def _load_model(self):
+        if self._model is None:
+            from sentence_transformers import SentenceTransformer
+            logger.info(f"Loading embedding model {self.model_name}")
+            self._model = SentenceTransformer(self.model_name, device="cpu")
+        return self._model
+
+    def _embed(self, texts: List[str]) -> "np.ndarray":
+        """Embed texts as unit-length float32 vectors"""
+        model = self._load_model()
+        vectors = model.encode(texts, batch_size=self.batch_size,
+                               normalize_embeddings=True, show_progress_bar=False)
+        return np.asarray(vectors, dtype=np.float32)
+
+    def _profile_centroid(self) -> "np.ndarray":
+        """Unit-length mean of the profile phrase embeddings"""
+        if self._centroid is None:
+            phrases = self._embed(self.profile_phrases)
+            centroid = phrases.mean(axis=0)
+            self._centroid = centroid / max(np.linalg.norm(centroid), 1e-9)
+        return self._centroid
+
+    def _grant_text(self, grant: Dict[str, Any]) -> str:
+        return f"{grant.get('title', '')}. {grant.get('description', '')}"[:self.max_chars]
+
+    def _grant_key(self, grant: Dict[str, Any], text: str) -> str:
+        opportunity_id = grant.get('opportunity_id') or grant.get('title', '')
+        return f"{opportunity_id}:{hashlib.md5(text.encode()).hexdigest()}"
+
+    def score_grants(self, grants: List[Dict[str, Any]]) -> "np.ndarray":
+        """
+        Score grants 0-10 by cosine similarity to the profile centroid
+
+        Only grants missing from the vector cache are embedded. Scores are
+        absolute (similarity / FULL_SCORE_SIMILARITY, capped at 10), not
+        relative to the run's best grant, so fixed thresholds keep meaning.
+        """
+        if not grants:
+            return np.zeros(0)
+
+        texts = [self._grant_text(g) for g in grants]
+        keys = [self._grant_key(g, t) for g, t in zip(grants, texts)]
+
+        missing = [i for i, key in enumerate(keys) if key not in self.index]
+        if missing:
+            logger.info(f"Embedding {len(missing)} new or changed grants ({len(grants) - len(missing)} cached)")
+            self._append_vectors([keys[i] for i in missing], self._embed([texts[i] for i in missing]))
+
+        vectors = self._open_vectors()
+        rows = np.fromiter((self.index[key] for key in keys), dtype=np.int64, count=len(keys))
+        similarity = vectors[rows] @ self._profile_centroid()
+
+        scores = np.clip(similarity * (10.0 / self.FULL_SCORE_SIMILARITY), 0.0, 10.0)
+
+        self._compact_if_needed(set(keys))
+        return scores
+
+    # Vector cache
+
+    def _load_index(self):
+        if not os.path.exists(self.index_path):
+            return
+        try:
+            with open(self.index_path, 'r') as f:
+                data = json.load(f)
+            self.dim = data['dim']
+            self.index = data['rows']
+        except Exception as e:
+            logger.warning(f"Ignoring embedding index {self.index_path}: {e}")
+            self.index = {}
+
+    def _save_index(self):
+        tmp_path = f"{self.index_path}.tmp"
+        with open(tmp_path, 'w') as f:
+            json.dump({'dim': self.dim, 'rows': self.index}, f)
+        os.replace(tmp_path, self.index_path)
+
+    def _row_count(self) -> int:
+        if not self.dim or not os.path.exists(self.vectors_path):
+            return 0
+        return os.path.getsize(self.vectors_path) // (4 * self.dim)
+
+    def _open_vectors(self) -> "np.ndarray":
+        """Memory-map the vector file read-only"""
+        return np.memmap(self.vectors_path, dtype=np.float32, mode='r', shape=(self._row_count(), self.dim))
+
+    def _append_vectors(self, keys: List[str], vectors: "np.ndarray"):
+        """Append vectors to the file and record their rows"""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        if self.dim is None or not os.path.exists(self.vectors_path):
+            self.dim = int(vectors.shape[1])
+            self.index = {}
+            open(self.vectors_path, 'wb').close()
+
+        start = self._row_count()
+        with open(self.vectors_path, 'ab') as f:
+            f.write(np.ascontiguousarray(vectors, dtype=np.float32).tobytes())
+        for offset, key in enumerate(keys):
+            self.index[key] = start + offset
+        self._save_index()
+
+    def _compact_if_needed(self, live_keys: set):
+        """Rewrite the vector file once most rows belong to stale keys"""
+        total = self._row_count()
+        if total < 1000 or len(live_keys) > total // 2:
+            return
+
+        vectors = self._open_vectors()
+        live = sorted((row, key) for key, row in self.index.items() if key in live_keys)
+        tmp_path = f"{self.vectors_path}.tmp"
+        with open(tmp_path, 'wb') as f:
+            for row, _ in live:
+                f.write(np.ascontiguousarray(vectors[row]).tobytes())
+        del vectors
+        os.replace(tmp_path, self.vectors_path)
+
+        self.index = {key: new_row for new_row, (_, key) in enumerate(live)}
+        self._save_index()
+        logger.info(f"Compacted embedding cache from {total} to {len(live)} vectors")
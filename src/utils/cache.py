@@ -1,22 +1,473 @@
 """
-Simple File-Based Caching System
+Simple Persistent Caching System
 Provides TTL-based caching for API responses and processed data
+
+Entries are stored in a single SQLite database per cache directory
+(SQLiteBackend); the original two-files-per-key layout (FileBackend) is
+still available with backend="files".
+
+Values are serialized by a Codec chosen per namespace (the part of the key
+before the first ':'): pickle, JSON or msgpack, optionally gzip or zstd
+compressed. Values are only stored as JSON or msgpack when they round-trip
+exactly; anything else (tuples, non-string keys, datetimes, objects) is
+pickled with a warning. API payloads default to msgpack+zstd, everything
+else to JSON.
+
+Unpickling a cache file can run arbitrary code, so pickle is only written
+and read for namespaces that opt in (pickle_namespaces, or a namespace
+whose codec is "pickle"). Elsewhere a value that needs pickle isn't cached
+and a pickled entry on disk is discarded as a miss.
 """
 
 import os
+import gzip
 import json
+import math
+import time
 import pickle
+import sqlite3
 import hashlib
 import logging
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
 from datetime import datetime, timedelta
-from typing import Any, Optional, Union
+from typing import Any, Dict, Iterable, Iterator, Optional, Tuple, Union
 from pathlib import Path
 
+try:
+    import fcntl
+    FCNTL_AVAILABLE = True
+except ImportError:  # Windows: single-flight within one process only
+    FCNTL_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:
+    ZSTD_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
+
+class PickleNotAllowed(ValueError):
+    """A value needs pickle in a namespace that hasn't opted in to it"""
+
+
+def namespace_of(key: str) -> str:
+    """Namespace of a cache key: the part before the first ':' ('' if none)"""
+    return key.split(':', 1)[0] if ':' in key else ''
+
+
+class Codec:
+    """
+    Serialization format plus optional compression for cached values
+    
+    Specs are "format[+compression]", e.g. "json", "msgpack+zstd" or
+    "pickle+gzip". Every payload starts with a two-byte header naming its
+    format and compression, so entries stay readable after a namespace's
+    codec changes.
+    
+    JSON and msgpack only take values they give back unchanged: dicts with
+    string keys, lists, strings, numbers, booleans and None (plus bytes for
+    msgpack). Anything else - a tuple, an int key, a datetime - would come
+    back as a different type, so it is pickled instead and a warning is
+    logged once per codec and type - if the caller allows pickle at all.
+    
+    msgpack and zstandard are listed in requirements.txt; if either is
+    missing a codec asking for it warns and uses JSON or gzip.
+    """
+    
+    FORMAT_TAGS = {'pickle': b'p', 'json': b'j', 'msgpack': b'm'}
+    COMPRESSION_TAGS = {None: b'-', 'gzip': b'g', 'zstd': b'z'}
+    
+    def __init__(self, format: str = "pickle", compression: Optional[str] = None, level: Optional[int] = None):
+        """
+        Args:
+            format: "pickle", "json" or "msgpack"
+            compression: None, "gzip" or "zstd"
+            level: Compression level (default 6 for gzip, 3 for zstd)
+        """
+        if format not in self.FORMAT_TAGS:
+            raise ValueError(f"Unknown cache format {format!r}, expected one of {sorted(self.FORMAT_TAGS)}")
+        if compression not in self.COMPRESSION_TAGS:
+            raise ValueError(f"Unknown cache compression {compression!r}, expected gzip or zstd")
+        if format == "msgpack" and not MSGPACK_AVAILABLE:
+            logger.warning("msgpack not installed, caching as JSON instead")
+            format = "json"
+        if compression == "zstd" and not ZSTD_AVAILABLE:
+            logger.warning("zstandard not installed, compressing with gzip instead")
+            compression = "gzip"
+        self.format = format
+        self.compression = compression
+        self.level = level
+        self._warned_types = set()
+    
+    @classmethod
+    def parse(cls, spec: Union[str, 'Codec']) -> 'Codec':
+        """Codec from a "format[+compression]" spec"""
+        if isinstance(spec, Codec):
+            return spec
+        format, _, compression = spec.partition('+')
+        return cls(format, compression or None)
+    
+    @property
+    def spec(self) -> str:
+        return f"{self.format}+{self.compression}" if self.compression else self.format
+    
+    def encode(self, value: Any, allow_pickle: bool = True) -> Tuple[bytes, int]:
+        """
+        Args:
+            allow_pickle: Whether a value JSON/msgpack can't hold may be pickled
+        
+        Returns:
+            (payload, raw size) - raw size is the serialized size before compression
+        
+        Raises:
+            PickleNotAllowed: The value needs pickle and allow_pickle is False
+        """
+        format = self.format
+        if format != "pickle":
+            problem = _inexact_type(value, allow_bytes=format == "msgpack")
+            if problem and not allow_pickle:
+                raise PickleNotAllowed(f"{format} can't store {problem} values unchanged "
+                                       f"and pickle is not enabled")
+            if problem:
+                if problem not in self._warned_types:
+                    self._warned_types.add(problem)
+                    logger.warning(f"{format} can't store {problem} values unchanged, "
+                                   f"pickling them instead")
+                format = "pickle"
+        data = _serialize(format, value)
+        raw_size = len(data)
+        if self.compression == "gzip":
+            data = gzip.compress(data, compresslevel=self.level or 6)
+        elif self.compression == "zstd":
+            data = zstandard.ZstdCompressor(level=self.level or 3).compress(data)
+        return self.FORMAT_TAGS[format] + self.COMPRESSION_TAGS[self.compression] + data, raw_size
+    
+    @classmethod
+    def decode(cls, payload: bytes, allow_pickle: bool = False) -> Any:
+        """
+        Decode a payload written by any codec (or a headerless pickle from older caches)
+        
+        Raises:
+            PickleNotAllowed: The payload is pickled and allow_pickle is False
+        """
+        format_tag = payload[:1]
+        if format_tag in (b'\x80', cls.FORMAT_TAGS['pickle']) and not allow_pickle:
+            raise PickleNotAllowed("entry is pickled and pickle is not enabled")
+        if format_tag == b'\x80':
+            return pickle.loads(payload)
+        compression_tag, data = payload[1:2], payload[2:]
+        if compression_tag == b'g':
+            data = gzip.decompress(data)
+        elif compression_tag == b'z':
+            if not ZSTD_AVAILABLE:
+                raise ValueError("entry is zstd-compressed but zstandard is not installed")
+            data = zstandard.ZstdDecompressor().decompress(data)
+        if format_tag == b'j':
+            return json.loads(data)
+        if format_tag == b'm':
+            if not MSGPACK_AVAILABLE:
+                raise ValueError("entry is msgpack-encoded but msgpack is not installed")
+            return msgpack.unpackb(data, raw=False)
+        return pickle.loads(data)
+
+
+def _inexact_type(value: Any, allow_bytes: bool = False) -> Optional[str]:
+    """
+    Name of the first type in value that JSON/msgpack would not give back
+    unchanged, or None if the whole value round-trips exactly
+    """
+    stack = [value]
+    visited = set()
+    while stack:
+        item = stack.pop()
+        kind = type(item)
+        if kind in (list, dict):
+            if id(item) in visited:
+                return "shared or self-referencing container"
+            visited.add(id(item))
+        if item is None or kind in (str, bool, int):
+            continue
+        if kind is float:
+            if not math.isfinite(item):
+                return "non-finite float"
+        elif kind is bytes and allow_bytes:
+            continue
+        elif kind is list:
+            stack.extend(item)
+        elif kind is dict:
+            for key in item:
+                if type(key) is not str and not (allow_bytes and type(key) is bytes):
+                    return f"{type(key).__name__}-keyed dict"
+            stack.extend(item.values())
+        else:
+            return kind.__name__
+    return None
+
+
+def _serialize(format: str, value: Any) -> bytes:
+    if format == "json":
+        return json.dumps(value, separators=(',', ':'), allow_nan=False).encode()
+    if format == "msgpack":
+        return msgpack.packb(value, use_bin_type=True)
+    return pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+
+class FileBackend:
+    """
+    Original layout: a pickle file and a JSON metadata file per key
+    
+    Every read opens two files and every sweep or stats call walks the
+    whole directory, which gets slow with tens of thousands of entries.
+    """
+    
+    name = "files"
+    
+    def __init__(self, cache_dir: Path):
+        self.cache_dir = cache_dir
+    
+    def _paths(self, key: str) -> Tuple[Path, Path]:
+        # Hash the key to handle special characters
+        key_hash = hashlib.md5(key.encode()).hexdigest()
+        return self.cache_dir / f"{key_hash}.cache", self.cache_dir / f"{key_hash}.meta"
+    
+    def read(self, key: str) -> Optional[Tuple[bytes, float, int]]:
+        """(payload, expires timestamp, raw size) or None if not stored"""
+        cache_path, meta_path = self._paths(key)
+        if not cache_path.exists() or not meta_path.exists():
+            return None
+        with open(meta_path, 'r') as f:
+            metadata = json.load(f)
+        with open(cache_path, 'rb') as f:
+            payload = f.read()
+        return payload, datetime.fromisoformat(metadata['expires']).timestamp(), metadata.get('raw_size', len(payload))
+    
+    def write(self, key: str, payload: bytes, created: float, expires: float, raw_size: int):
+        cache_path, meta_path = self._paths(key)
+        with open(cache_path, 'wb') as f:
+            f.write(payload)
+        metadata = {
+            'key': key,
+            'created': datetime.fromtimestamp(created).isoformat(),
+            'expires': datetime.fromtimestamp(expires).isoformat(),
+            'ttl_hours': (expires - created) / 3600,
+            'raw_size': raw_size
+        }
+        with open(meta_path, 'w') as f:
+            json.dump(metadata, f)
+    
+    def delete(self, key: str):
+        for path in self._paths(key):
+            if path.exists():
+                path.unlink()
+    
+    def clear(self) -> int:
+        count = 0
+        for cache_file in self.cache_dir.glob("*.cache"):
+            cache_file.unlink()
+            count += 1
+        for meta_file in self.cache_dir.glob("*.meta"):
+            meta_file.unlink()
+        return count
+    
+    def delete_expired(self, now: float) -> int:
+        count = 0
+        for meta_file in self.cache_dir.glob("*.meta"):
+            try:
+                with open(meta_file, 'r') as f:
+                    metadata = json.load(f)
+                if datetime.fromisoformat(metadata['expires']).timestamp() < now:
+                    self.delete(metadata['key'])
+                    count += 1
+            except Exception as e:
+                logger.debug(f"Error checking {meta_file}: {str(e)}")
+        return count
+    
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """Per namespace: items, stored bytes and raw (uncompressed) bytes"""
+        usage: Dict[str, Dict[str, int]] = {}
+        for meta_file in self.cache_dir.glob("*.meta"):
+            try:
+                with open(meta_file, 'r') as f:
+                    metadata = json.load(f)
+                stored = meta_file.with_suffix('.cache').stat().st_size
+            except Exception as e:
+                logger.debug(f"Error reading {meta_file}: {str(e)}")
+                continue
+            entry = usage.setdefault(namespace_of(metadata['key']), {'items': 0, 'bytes': 0, 'raw_bytes': 0})
+            entry['items'] += 1
+            entry['bytes'] += stored
+            entry['raw_bytes'] += metadata.get('raw_size', stored)
+        return usage
+
+
+class SQLiteBackend:
+    """
+    All entries in one SQLite file (WAL mode) with an indexed expiry column
+    
+    Reads are a primary-key lookup, expiry sweeps a single DELETE and stats
+    a single aggregate query. WAL lets readers in other processes proceed
+    while one process writes.
+    """
+    
+    name = "sqlite"
+    
+    SCHEMA = """
+    CREATE TABLE IF NOT EXISTS entries (
+        key TEXT PRIMARY KEY,
+        value BLOB NOT NULL,
+        created REAL NOT NULL,
+        expires REAL NOT NULL,
+        raw_size INTEGER
+    );
+    CREATE INDEX IF NOT EXISTS idx_entries_expires ON entries(expires);
+    """
+    
+    def __init__(self, cache_dir: Path, filename: str = "cache.db"):
+        self.db_path = cache_dir / filename
+        self._lock = threading.RLock()
+        # timeout: wait for another process's write instead of failing
+        self.conn = sqlite3.connect(str(self.db_path), timeout=30, check_same_thread=False)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.executescript(self.SCHEMA)
+        columns = {row[1] for row in self.conn.execute("PRAGMA table_info(entries)")}
+        if 'raw_size' not in columns:
+            self.conn.execute("ALTER TABLE entries ADD COLUMN raw_size INTEGER")
+        self.conn.commit()
+    
+    def read(self, key: str) -> Optional[Tuple[bytes, float, int]]:
+        """(payload, expires timestamp, raw size) or None if not stored"""
+        with self._lock:
+            row = self.conn.execute("SELECT value, expires, raw_size FROM entries WHERE key = ?", (key,)).fetchone()
+        return (bytes(row[0]), row[1], row[2] or len(row[0])) if row else None
+    
+    def write(self, key: str, payload: bytes, created: float, expires: float, raw_size: int):
+        with self._lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO entries (key, value, created, expires, raw_size) "
+                              "VALUES (?, ?, ?, ?, ?)",
+                              (key, sqlite3.Binary(payload), created, expires, raw_size))
+    
+    def delete(self, key: str):
+        with self._lock, self.conn:
+            self.conn.execute("DELETE FROM entries WHERE key = ?", (key,))
+    
+    def clear(self) -> int:
+        with self._lock, self.conn:
+            return self.conn.execute("DELETE FROM entries").rowcount
+    
+    def delete_expired(self, now: float) -> int:
+        with self._lock, self.conn:
+            return self.conn.execute("DELETE FROM entries WHERE expires < ?", (now,)).rowcount
+    
+    def usage(self) -> Dict[str, Dict[str, int]]:
+        """Per namespace: items, stored bytes and raw (uncompressed) bytes"""
+        with self._lock:
+            rows = self.conn.execute("""
+                SELECT CASE WHEN instr(key, ':') > 0 THEN substr(key, 1, instr(key, ':') - 1) ELSE '' END,
+                       COUNT(*), SUM(LENGTH(value)), SUM(COALESCE(raw_size, LENGTH(value)))
+                FROM entries GROUP BY 1
+            """).fetchall()
+        return {namespace: {'items': items, 'bytes': stored, 'raw_bytes': raw}
+                for namespace, items, stored, raw in rows}
+    
+    def close(self):
+        with self._lock:
+            self.conn.close()
+
+
+BACKENDS = {backend.name: backend for backend in (FileBackend, SQLiteBackend)}
+
+
+class MemoryTier:
+    """
+    Bounded in-process LRU of decoded values in front of the disk backend
+    
+    Bounded by entry count and by the approximate size of the entries
+    (their serialized, uncompressed length); least recently used entries are evicted first.
+    Values are shared, not copied: don't mutate what get() returns.
+    """
+    
+    def __init__(self, max_items: int = 1024, max_bytes: int = 32 * 1024 * 1024):
+        self.max_items = max_items
+        self.max_bytes = max_bytes
+        self.entries: OrderedDict = OrderedDict()  # key -> (value, expires, size)
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+    
+    def get(self, key: str, now: float) -> Tuple[bool, Any]:
+        """(found, value); expired entries are dropped and count as misses"""
+        with self._lock:
+            entry = self.entries.get(key)
+            if entry is not None and entry[1] < now:
+                self._discard(key)
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return False, None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return True, entry[0]
+    
+    def put(self, key: str, value: Any, expires: float, size: int):
+        with self._lock:
+            self._discard(key)
+            if self.max_items <= 0 or size > self.max_bytes:
+                return
+            self.entries[key] = (value, expires, size)
+            self.bytes += size
+            while len(self.entries) > self.max_items or self.bytes > self.max_bytes:
+                _, (_, _, evicted_size) = self.entries.popitem(last=False)
+                self.bytes -= evicted_size
+    
+    def _discard(self, key: str):
+        """Remove an entry (caller holds the lock)"""
+        entry = self.entries.pop(key, None)
+        if entry is not None:
+            self.bytes -= entry[2]
+    
+    def discard(self, key: str):
+        with self._lock:
+            self._discard(key)
+    
+    def discard_expired(self, now: float):
+        with self._lock:
+            for key in [k for k, (_, expires, _) in self.entries.items() if expires < now]:
+                self._discard(key)
+    
+    def clear(self):
+        with self._lock:
+            self.entries.clear()
+            self.bytes = 0
+    
+    def get_stats(self) -> dict:
+        return {'items': len(self.entries), 'bytes': self.bytes, 'hits': self.hits, 'misses': self.misses}
+
+
 class SimpleCache:
     """
-    Simple file-based cache with TTL support
+    Simple persistent cache with TTL support
+    
+    Entries live in a single SQLite file under cache_dir by default;
+    backend="files" keeps the older one-pickle-plus-metadata-file-per-key
+    layout. A bounded in-memory LRU tier sits in front of the backend:
+    reads fill it, writes go through it to disk, so repeated lookups in a
+    run skip the disk and unpickling. The memory tier is per process; use
+    memory_items=0 when another process may rewrite the same keys.
+    
+    Each namespace (key prefix before ':') can have its own Codec; keys in
+    other namespaces use the default codec. Only namespaces listed in
+    pickle_namespaces, or whose codec is "pickle", read or write pickles.
     
     Usage:
         cache = SimpleCache(cache_dir="cache")
@@ -28,13 +479,24 @@ class SimpleCache:
         data = cache.get("my_key")
     """
     
-    def __init__(self, cache_dir: str = "cache", default_ttl_hours: float = 1.0):
+    def __init__(self, cache_dir: str = "cache", default_ttl_hours: float = 1.0, backend: str = "sqlite",
+                 memory_items: int = 1024, memory_bytes: int = 32 * 1024 * 1024,
+                 codec: Union[str, Codec] = "json",
+                 codecs: Optional[Dict[str, Union[str, Codec]]] = None,
+                 pickle_namespaces: Iterable[str] = ()):
         """
         Initialize cache
         
         Args:
             cache_dir: Directory to store cache files
             default_ttl_hours: Default time-to-live in hours
+            backend: "sqlite" (one WAL-mode database file) or "files"
+            memory_items: Most entries kept in memory; 0 disables the memory tier
+            memory_bytes: Approximate memory budget (serialized size) for the memory tier
+            codec: Default codec spec, e.g. "json", "json+gzip" or "pickle"
+            codecs: Codec spec per namespace, e.g. {"grants_gov": "msgpack+zstd"}
+            pickle_namespaces: Namespaces trusted to store pickled values
+                ('' for keys without a namespace)
         """
         self.cache_dir = Path(cache_dir)
         self.default_ttl_hours = default_ttl_hours
@@ -42,20 +504,27 @@ class SimpleCache:
         # Create cache directory
         self.cache_dir.mkdir(parents=True, exist_ok=True)
         
-        # Stats tracking
+        if backend not in BACKENDS:
+            raise ValueError(f"Unknown cache backend {backend!r}, expected one of {sorted(BACKENDS)}")
+        self.backend = BACKENDS[backend](self.cache_dir)
+        self.memory = MemoryTier(memory_items, memory_bytes)
+        self.codec = Codec.parse(codec)
+        self.codecs = {namespace: Codec.parse(spec) for namespace, spec in (codecs or {}).items()}
+        self.pickle_namespaces = frozenset(pickle_namespaces)
+        
+        # Stats tracking: hits/misses are overall, disk_* count backend lookups
         self.hits = 0
         self.misses = 0
+        self.disk_hits = 0
+        self.disk_misses = 0
     
-    def _get_cache_path(self, key: str) -> Path:
-        """Generate cache file path from key"""
-        # Hash the key to handle special characters
-        key_hash = hashlib.md5(key.encode()).hexdigest()
-        return self.cache_dir / f"{key_hash}.cache"
+    def codec_for(self, key: str) -> Codec:
+        """Codec used to store a key"""
+        return self.codecs.get(namespace_of(key), self.codec)
     
-    def _get_metadata_path(self, key: str) -> Path:
-        """Generate metadata file path from key"""
-        key_hash = hashlib.md5(key.encode()).hexdigest()
-        return self.cache_dir / f"{key_hash}.meta"
+    def allows_pickle(self, key: str) -> bool:
+        """Whether a key's namespace opted in to pickled values"""
+        return namespace_of(key) in self.pickle_namespaces or self.codec_for(key).format == "pickle"
     
     def set(self, key: str, value: Any, ttl_hours: Optional[float] = None) -> bool:
         """
@@ -70,28 +539,18 @@ class SimpleCache:
             True if successfully cached
         """
         try:
-            cache_path = self._get_cache_path(key)
-            meta_path = self._get_metadata_path(key)
-            
-            # Store the data
-            with open(cache_path, 'wb') as f:
-                pickle.dump(value, f)
-            
-            # Store metadata
             ttl = ttl_hours if ttl_hours is not None else self.default_ttl_hours
-            metadata = {
-                'key': key,
-                'created': datetime.now().isoformat(),
-                'expires': (datetime.now() + timedelta(hours=ttl)).isoformat(),
-                'ttl_hours': ttl
-            }
-            
-            with open(meta_path, 'w') as f:
-                json.dump(metadata, f)
+            now = time.time()
+            payload, raw_size = self.codec_for(key).encode(value, self.allows_pickle(key))
+            self.backend.write(key, payload, now, now + ttl * 3600, raw_size)
+            self.memory.put(key, value, now + ttl * 3600, raw_size)
             
             logger.debug(f"Cached {key} with TTL of {ttl} hours")
             return True
             
+        except PickleNotAllowed as e:
+            logger.warning(f"Not caching {key}: {str(e)} for namespace {namespace_of(key)!r}")
+            return False
         except Exception as e:
             logger.error(f"Failed to cache {key}: {str(e)}")
             return False
@@ -107,32 +566,38 @@ class SimpleCache:
             Cached value or None if not found/expired
         """
         try:
-            cache_path = self._get_cache_path(key)
-            meta_path = self._get_metadata_path(key)
+            found, value = self.memory.get(key, time.time())
+            if found:
+                self.hits += 1
+                return value
             
-            # Check if cache exists
-            if not cache_path.exists() or not meta_path.exists():
+            entry = self.backend.read(key)
+            if entry is None:
+                self.disk_misses += 1
                 self.misses += 1
-                logger.debug(f"Cache miss for {key}: files not found")
+                logger.debug(f"Cache miss for {key}: not found")
                 return None
             
-            # Check metadata
-            with open(meta_path, 'r') as f:
-                metadata = json.load(f)
-            
-            # Check expiration
-            expires = datetime.fromisoformat(metadata['expires'])
-            if datetime.now() > expires:
+            payload, expires, raw_size = entry
+            if time.time() > expires:
+                self.disk_misses += 1
                 self.misses += 1
                 logger.debug(f"Cache miss for {key}: expired")
                 # Clean up expired cache
                 self.delete(key)
                 return None
             
-            # Load and return data
-            with open(cache_path, 'rb') as f:
-                value = pickle.load(f)
-            
+            try:
+                value = Codec.decode(payload, self.allows_pickle(key))
+            except PickleNotAllowed:
+                self.disk_misses += 1
+                self.misses += 1
+                logger.warning(f"Discarding pickled cache entry {key}: pickle is not enabled "
+                               f"for namespace {namespace_of(key)!r}")
+                self.delete(key)
+                return None
+            self.memory.put(key, value, expires, raw_size)
+            self.disk_hits += 1
             self.hits += 1
             logger.debug(f"Cache hit for {key}")
             return value
@@ -153,14 +618,8 @@ class SimpleCache:
             True if deleted successfully
         """
         try:
-            cache_path = self._get_cache_path(key)
-            meta_path = self._get_metadata_path(key)
-            
-            if cache_path.exists():
-                cache_path.unlink()
-            if meta_path.exists():
-                meta_path.unlink()
-            
+            self.memory.discard(key)
+            self.backend.delete(key)
             logger.debug(f"Deleted cache for {key}")
             return True
             
@@ -170,27 +629,20 @@ class SimpleCache:
     
     def clear(self) -> int:
         """
-        Clear all cache files
+        Clear all cache entries
         
         Returns:
             Number of items cleared
         """
-        count = 0
-        
         try:
-            for cache_file in self.cache_dir.glob("*.cache"):
-                cache_file.unlink()
-                count += 1
-            
-            for meta_file in self.cache_dir.glob("*.meta"):
-                meta_file.unlink()
-            
+            self.memory.clear()
+            count = self.backend.clear()
             logger.info(f"Cleared {count} items from cache")
             return count
             
         except Exception as e:
             logger.error(f"Failed to clear cache: {str(e)}")
-            return count
+            return 0
     
     def cleanup_expired(self) -> int:
         """
@@ -199,58 +651,80 @@ class SimpleCache:
         Returns:
             Number of expired items removed
         """
-        count = 0
-        
         try:
-            for meta_file in self.cache_dir.glob("*.meta"):
-                try:
-                    with open(meta_file, 'r') as f:
-                        metadata = json.load(f)
-                    
-                    expires = datetime.fromisoformat(metadata['expires'])
-                    if datetime.now() > expires:
-                        key = metadata['key']
-                        if self.delete(key):
-                            count += 1
-                            
-                except Exception as e:
-                    logger.debug(f"Error checking {meta_file}: {str(e)}")
-            
+            now = time.time()
+            self.memory.discard_expired(now)
+            count = self.backend.delete_expired(now)
             if count > 0:
                 logger.info(f"Cleaned up {count} expired cache items")
-            
             return count
             
         except Exception as e:
             logger.error(f"Failed to cleanup cache: {str(e)}")
-            return count
+            return 0
     
     def get_stats(self) -> dict:
         """Get cache statistics"""
-        total_files = len(list(self.cache_dir.glob("*.cache")))
-        
-        # Calculate cache size
-        total_size = 0
-        for cache_file in self.cache_dir.glob("*.cache"):
-            total_size += cache_file.stat().st_size
+        usage = self.backend.usage()
+        total_items = sum(entry['items'] for entry in usage.values())
+        total_size = sum(entry['bytes'] for entry in usage.values())
+        namespaces = {
+            namespace: {**entry, 'codec': self.codec_for(f"{namespace}:").spec,
+                        'ratio': round(entry['raw_bytes'] / entry['bytes'], 2) if entry['bytes'] else 0}
+            for namespace, entry in sorted(usage.items())
+        }
         
         hit_rate = (self.hits / (self.hits + self.misses) * 100) if (self.hits + self.misses) > 0 else 0
         
         return {
-            'total_items': total_files,
+            'total_items': total_items,
             'total_size_bytes': total_size,
             'total_size_mb': round(total_size / (1024 * 1024), 2),
             'hits': self.hits,
             'misses': self.misses,
             'hit_rate': round(hit_rate, 2),
-            'cache_dir': str(self.cache_dir)
+            'cache_dir': str(self.cache_dir),
+            'backend': self.backend.name,
+            'namespaces': namespaces,
+            'tiers': {
+                'memory': self.memory.get_stats(),
+                'disk': {'items': total_items, 'bytes': total_size,
+                         'hits': self.disk_hits, 'misses': self.disk_misses}
+            }
         }
 
 
+# Returned by a conditional fetch_func when the upstream answered 304
+NOT_MODIFIED = object()
+
+
+def response_validators(response: Any) -> Dict[str, Optional[str]]:
+    """ETag / Last-Modified of an HTTP response, for conditional refreshes"""
+    return {'etag': response.headers.get('ETag'), 'last_modified': response.headers.get('Last-Modified')}
+
+
+class _Flight:
+    """An in-progress fetch that other callers for the same key wait on"""
+    
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+
+
 class APIResponseCache(SimpleCache):
     """
     Specialized cache for API responses with automatic key generation
     
+    get_or_fetch is single-flight: concurrent misses on one key make a
+    single fetch_func call. Threads in this process wait for the leader
+    and share its result; other processes using the same cache directory
+    wait on a lock file and then read what the leader cached.
+    
+    Entries outlive their TTL by stale_hours. Within that window
+    get_or_fetch returns the stale response at once and refreshes it in a
+    background thread. With conditional=True the refresh sends the stored
+    ETag / Last-Modified, and a 304 just extends the entry.
+    
     Usage:
         cache = APIResponseCache()
         
@@ -261,8 +735,45 @@ class APIResponseCache(SimpleCache):
             fetch_func=lambda: weather_api.get_forecast("01701"),
             ttl_hours=1
         )
+        
+        # Conditional refreshes: fetch_func gets the validator headers
+        def fetch(headers):
+            response = session.get(url, headers=headers)
+            if response.status_code == 304:
+                return NOT_MODIFIED
+            response.raise_for_status()
+            return response.json(), response_validators(response)
+        
+        data = cache.get_or_fetch("nsf", params, fetch, conditional=True)
     """
     
+    # Keys hash onto this many lock files, so the directory never fills with them
+    LOCK_STRIPES = 64
+    
+    ENVELOPE_KEYS = frozenset({'data', 'fresh_until', 'etag', 'last_modified'})
+    
+    def __init__(self, cache_dir: str = "cache", default_ttl_hours: float = 1.0,
+                 stale_hours: float = 24.0, **kwargs):
+        """
+        Args:
+            stale_hours: How long past its TTL an entry may still be served
+                while it is refreshed in the background; 0 disables
+        """
+        # API payloads are plain JSON data, so store them compactly by default
+        kwargs.setdefault('codec', "msgpack+zstd")
+        super().__init__(cache_dir, default_ttl_hours, **kwargs)
+        self.stale_hours = stale_hours
+        self.lock_dir = self.cache_dir / "locks"
+        self.lock_dir.mkdir(exist_ok=True)
+        self._flights: Dict[str, _Flight] = {}
+        self._flights_lock = threading.Lock()
+        # fetches: fetch_func calls; coalesced: callers that shared another
+        # thread's fetch; process_waits: callers served by another process's
+        # fetch; stale_served: stale responses returned during a refresh;
+        # not_modified: refreshes answered with 304
+        self.fetch_stats = {'fetches': 0, 'coalesced': 0, 'process_waits': 0,
+                            'stale_served': 0, 'background_refreshes': 0, 'not_modified': 0}
+    
     def make_key(self, api_name: str, params: dict) -> str:
         """Generate cache key from API name and parameters"""
         # Sort params for consistent keys
@@ -270,11 +781,47 @@ class APIResponseCache(SimpleCache):
         param_str = json.dumps(sorted_params)
         return f"{api_name}:{param_str}"
     
+    def set(self, key: str, value: Any, ttl_hours: Optional[float] = None,
+            validators: Optional[Dict[str, Optional[str]]] = None) -> bool:
+        """
+        Store a response, fresh for ttl_hours and kept stale_hours longer
+        
+        Args:
+            validators: 'etag' / 'last_modified' from the response, if any
+        """
+        ttl = ttl_hours if ttl_hours is not None else self.default_ttl_hours
+        envelope = {
+            'data': value,
+            'fresh_until': time.time() + ttl * 3600,
+            'etag': (validators or {}).get('etag'),
+            'last_modified': (validators or {}).get('last_modified'),
+        }
+        return super().set(key, envelope, ttl + self.stale_hours)
+    
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        """Stored envelope, fresh or stale"""
+        entry = super().get(key)
+        if entry is None:
+            return None
+        if isinstance(entry, dict) and entry.keys() == self.ENVELOPE_KEYS:
+            return entry
+        # Written before responses were wrapped: fresh until it expires
+        return {'data': entry, 'fresh_until': float('inf'), 'etag': None, 'last_modified': None}
+    
+    def get(self, key: str) -> Optional[Any]:
+        """Cached response if still fresh"""
+        envelope = self._lookup(key)
+        if envelope is None or time.time() > envelope['fresh_until']:
+            return None
+        return envelope['data']
+    
     def get_or_fetch(self, 
                      api_name: str,
                      params: dict,
                      fetch_func: callable,
-                     ttl_hours: Optional[float] = None) -> Any:
+                     ttl_hours: Optional[float] = None,
+                     conditional: bool = False,
+                     serve_stale: bool = True) -> Any:
         """
         Get from cache or fetch from API
         
@@ -283,6 +830,11 @@ class APIResponseCache(SimpleCache):
             params: API parameters
             fetch_func: Function to call if cache miss
             ttl_hours: Cache TTL in hours
+            conditional: Call fetch_func(headers) with If-None-Match /
+                If-Modified-Since from the cached entry; it returns
+                NOT_MODIFIED or (data, validators)
+            serve_stale: Return a stale entry at once and refresh it in the
+                background; False refreshes (revalidates) it before returning
         
         Returns:
             Cached or fetched data
@@ -290,31 +842,176 @@ class APIResponseCache(SimpleCache):
         key = self.make_key(api_name, params)
         
         # Try cache first
-        cached = self.get(key)
-        if cached is not None:
-            logger.debug(f"Using cached response for {api_name}")
-            return cached
+        envelope = self._lookup(key)
+        if envelope is not None:
+            if time.time() <= envelope['fresh_until']:
+                logger.debug(f"Using cached response for {api_name}")
+                return envelope['data']
+            if serve_stale:
+                # Stale: answer now, refresh behind the caller
+                self._refresh_in_background(key, api_name, fetch_func, ttl_hours, conditional)
+                with self._flights_lock:
+                    self.fetch_stats['stale_served'] += 1
+                logger.debug(f"Using stale response for {api_name} while it refreshes")
+                return envelope['data']
+        
+        # Join a fetch already in flight for this key, or lead one
+        with self._flights_lock:
+            flight = self._flights.get(key)
+            leader = flight is None
+            if leader:
+                flight = self._flights[key] = _Flight()
+            else:
+                self.fetch_stats['coalesced'] += 1
         
-        # Fetch from API
-        logger.debug(f"Fetching fresh data for {api_name}")
+        if not leader:
+            logger.debug(f"Waiting for in-flight fetch of {api_name}")
+            flight.done.wait()
+            return flight.result
+        
+        self._lead(flight, key, api_name, fetch_func, ttl_hours, conditional)
+        return flight.result
+    
+    def _lead(self, flight: _Flight, key: str, api_name: str, fetch_func: callable,
+              ttl_hours: Optional[float], conditional: bool):
+        """Run a flight's fetch, then release everyone waiting on it"""
         try:
-            data = fetch_func()
-            
-            # Cache the response
-            if data is not None:
-                self.set(key, data, ttl_hours)
-            
-            return data
+            flight.result = self._fetch_once(key, api_name, fetch_func, ttl_hours, conditional)
+        finally:
+            with self._flights_lock:
+                del self._flights[key]
+            flight.done.set()
+    
+    def _refresh_in_background(self, key: str, api_name: str, fetch_func: callable,
+                               ttl_hours: Optional[float], conditional: bool):
+        """Start a refresh thread unless one is already in flight for the key"""
+        with self._flights_lock:
+            if key in self._flights:
+                return
+            flight = self._flights[key] = _Flight()
+            self.fetch_stats['background_refreshes'] += 1
+        threading.Thread(target=self._lead, args=(flight, key, api_name, fetch_func, ttl_hours, conditional),
+                         name=f"refresh-{api_name}", daemon=True).start()
+    
+    def _fetch_once(self, key: str, api_name: str, fetch_func: callable, ttl_hours: Optional[float],
+                    conditional: bool) -> Any:
+        """Fetch under the cross-process lock, unless another process just did"""
+        with self._process_lock(key) as contended:
+            envelope = self._lookup(key)
+            if contended and envelope is not None and time.time() <= envelope['fresh_until']:
+                with self._flights_lock:
+                    self.fetch_stats['process_waits'] += 1
+                logger.debug(f"Using response for {api_name} fetched by another process")
+                return envelope['data']
             
-        except Exception as e:
-            logger.error(f"Failed to fetch {api_name}: {str(e)}")
-            return None
+            # Fetch from API
+            logger.debug(f"Fetching fresh data for {api_name}")
+            with self._flights_lock:
+                self.fetch_stats['fetches'] += 1
+            try:
+                if not conditional:
+                    data, validators = fetch_func(), None
+                else:
+                    headers = {}
+                    if envelope and envelope['etag']:
+                        headers['If-None-Match'] = envelope['etag']
+                    if envelope and envelope['last_modified']:
+                        headers['If-Modified-Since'] = envelope['last_modified']
+                    result = fetch_func(headers)
+                    if result is NOT_MODIFIED:
+                        if envelope is None:
+                            logger.warning(f"{api_name} answered 304 with nothing cached")
+                            return None
+                        with self._flights_lock:
+                            self.fetch_stats['not_modified'] += 1
+                        self.set(key, envelope['data'], ttl_hours, envelope)
+                        return envelope['data']
+                    data, validators = result
+                
+                # Cache the response
+                if data is not None:
+                    self.set(key, data, ttl_hours, validators)
+                
+                return data
+                
+            except Exception as e:
+                logger.error(f"Failed to fetch {api_name}: {str(e)}")
+                return None
+    
+    @contextmanager
+    def _process_lock(self, key: str) -> Iterator[bool]:
+        """
+        Exclusive lock on the key's lock file
+        
+        Yields:
+            True if another holder made us wait
+        """
+        if not FCNTL_AVAILABLE:
+            yield False
+            return
+        stripe = int(hashlib.md5(key.encode()).hexdigest(), 16) % self.LOCK_STRIPES
+        with open(self.lock_dir / f"{stripe:02x}.lock", 'a') as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                contended = False
+            except BlockingIOError:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                contended = True
+            try:
+                yield contended
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+    
+    def get_stats(self) -> dict:
+        """Cache statistics plus fetch coalescing counts"""
+        stats = super().get_stats()
+        with self._flights_lock:
+            stats.update(self.fetch_stats)
+        return stats
+
+
+class BloomFilter:
+    """
+    Fixed-size probabilistic set: no false negatives, false positives at
+    about error_rate while it holds no more than capacity items
+    """
+    
+    def __init__(self, capacity: int, error_rate: float = 0.001):
+        self.capacity = capacity
+        self.num_bits = max(8, int(-capacity * math.log(error_rate) / (math.log(2) ** 2)))
+        self.num_hashes = max(1, round(self.num_bits / capacity * math.log(2)))
+        self.bits = bytearray((self.num_bits + 7) // 8)
+        self.count = 0
+    
+    def _positions(self, item: str) -> Iterator[int]:
+        # Double hashing: k positions from two 64-bit halves of one digest
+        digest = hashlib.blake2b(item.encode(), digest_size=16).digest()
+        h1, h2 = int.from_bytes(digest[:8], 'little'), int.from_bytes(digest[8:], 'little') | 1
+        return ((h1 + i * h2) % self.num_bits for i in range(self.num_hashes))
+    
+    def add(self, item: str):
+        for position in self._positions(item):
+            self.bits[position >> 3] |= 1 << (position & 7)
+        self.count += 1
+    
+    def __contains__(self, item: str) -> bool:
+        return all(self.bits[position >> 3] & (1 << (position & 7)) for position in self._positions(item))
 
 
 class ContentCache(SimpleCache):
     """
     Specialized cache for processed content with deduplication
     
+    Processed keys (URLs, opportunity ids) are kept with the time they were
+    last marked. Marks are appended to processed.log, so marking a batch is
+    one sequential write; the log is compacted once it holds more than
+    twice the live entries. Entries older than max_age_days are dropped.
+    
+    With bloom_capacity set, only a Bloom filter is held in memory instead
+    of every key - for very large histories. Lookups then have a small
+    false-positive rate (an unseen key reported as processed) and ages are
+    only enforced when the log is loaded or compacted.
+    
     Usage:
         cache = ContentCache()
         
@@ -322,54 +1019,300 @@ class ContentCache(SimpleCache):
         if not cache.is_duplicate(article_url):
             process_article(article)
             cache.mark_processed(article_url)
+        
+        # Or mark a whole batch with one write
+        cache.mark_many(urls)
     """
     
-    def __init__(self, cache_dir: str = "cache/content", default_ttl_hours: float = 24.0):
-        super().__init__(cache_dir, default_ttl_hours)
-        self.processed_urls = set()
+    # Never compact logs shorter than this
+    COMPACT_MIN_LINES = 1000
+    
+    def __init__(self, cache_dir: str = "cache/content", default_ttl_hours: float = 24.0,
+                 max_age_days: Optional[float] = 90, bloom_capacity: int = 0,
+                 bloom_error_rate: float = 0.001, **kwargs):
+        """
+        Args:
+            max_age_days: Forget keys not marked for this long; None keeps them forever
+            bloom_capacity: Expected number of keys; > 0 switches to a Bloom filter
+            bloom_error_rate: Target false-positive rate of the Bloom filter
+        """
+        super().__init__(cache_dir, default_ttl_hours, **kwargs)
+        self.max_age_days = max_age_days
+        self.log_path = self.cache_dir / "processed.log"
+        self.bloom_error_rate = bloom_error_rate
+        self.bloom = BloomFilter(bloom_capacity, bloom_error_rate) if bloom_capacity > 0 else None
+        self.processed_urls: Dict[str, float] = {}  # key -> last marked (exact mode only)
+        self._log_lines = 0
+        self._live_at_compaction = 0
+        self._log_lock = threading.RLock()
         self._load_processed_urls()
     
+    def _cutoff(self, days: Optional[float]) -> float:
+        return time.time() - days * 86400 if days is not None else float('-inf')
+    
+    def _read_log(self) -> Iterator[Tuple[str, float]]:
+        """(key, timestamp) for every well-formed log line"""
+        if not self.log_path.exists():
+            return
+        with open(self.log_path, 'r', encoding='utf-8') as f:
+            for line in f:
+                stamp, sep, key = line.rstrip('\n').partition('\t')
+                if not sep or not key:
+                    continue  # e.g. a partial last line from an interrupted write
+                try:
+                    yield key, float(stamp)
+                except ValueError:
+                    continue
+    
     def _load_processed_urls(self):
-        """Load set of processed URLs"""
-        urls_file = self.cache_dir / "processed_urls.json"
-        if urls_file.exists():
+        """Replay the log (importing the old processed_urls.json once)"""
+        legacy = self.cache_dir / "processed_urls.json"
+        if legacy.exists():
             try:
-                with open(urls_file, 'r') as f:
-                    self.processed_urls = set(json.load(f))
+                with open(legacy, 'r') as f:
+                    self.mark_many(json.load(f))
+                legacy.unlink()
+                logger.info(f"Migrated {legacy} to {self.log_path.name}")
             except Exception as e:
-                logger.error(f"Failed to load processed URLs: {str(e)}")
+                logger.error(f"Failed to migrate processed URLs: {str(e)}")
+        
+        cutoff = self._cutoff(self.max_age_days)
+        self._log_lines = 0
+        for key, stamp in self._read_log():
+            self._log_lines += 1
+            if stamp < cutoff:
+                continue
+            if self.bloom is not None:
+                self.bloom.add(key)
+            elif stamp > self.processed_urls.get(key, float('-inf')):
+                self.processed_urls[key] = stamp
+        self._live_at_compaction = self._live_count()
+        self._maybe_compact()
     
-    def _save_processed_urls(self):
-        """Save set of processed URLs"""
-        urls_file = self.cache_dir / "processed_urls.json"
-        try:
-            with open(urls_file, 'w') as f:
-                json.dump(list(self.processed_urls), f)
-        except Exception as e:
-            logger.error(f"Failed to save processed URLs: {str(e)}")
+    def _live_count(self) -> int:
+        return self.bloom.count if self.bloom is not None else len(self.processed_urls)
+    
+    def _maybe_compact(self):
+        if self._log_lines > max(self.COMPACT_MIN_LINES, 2 * max(self._live_count(), self._live_at_compaction)):
+            self.compact()
     
     def is_duplicate(self, url: str) -> bool:
         """Check if URL has been processed recently"""
-        return url in self.processed_urls
+        if self.bloom is not None:
+            return url in self.bloom
+        stamp = self.processed_urls.get(url)
+        return stamp is not None and stamp >= self._cutoff(self.max_age_days)
     
     def mark_processed(self, url: str):
         """Mark URL as processed"""
-        self.processed_urls.add(url)
-        self._save_processed_urls()
+        self.mark_many([url])
     
-    def clear_old_urls(self, days: int = 7):
-        """Clear URLs older than specified days"""
-        # For simplicity, just clear all if set is too large
-        if len(self.processed_urls) > 10000:
-            self.processed_urls.clear()
-            self._save_processed_urls()
-            logger.info("Cleared processed URLs cache")
+    def mark_many(self, urls: Iterable[str]) -> int:
+        """
+        Mark keys as processed with a single append to the log
+        
+        Returns:
+            Number of keys marked
+        """
+        now = time.time()
+        keys = [' '.join(str(url).split()) for url in urls]  # Tabs/newlines would break the log
+        keys = [key for key in keys if key]
+        if not keys:
+            return 0
+        
+        with self._log_lock:
+            for key in keys:
+                if self.bloom is not None:
+                    self.bloom.add(key)
+                else:
+                    self.processed_urls[key] = now
+            try:
+                with open(self.log_path, 'a', encoding='utf-8') as f:
+                    f.write(''.join(f"{now:.0f}\t{key}\n" for key in keys))
+                self._log_lines += len(keys)
+            except Exception as e:
+                logger.error(f"Failed to save processed URLs: {str(e)}")
+            
+            if self.bloom is not None and self.bloom.count > self.bloom.capacity:
+                logger.warning(f"Seen-set Bloom filter holds {self.bloom.count} keys, over its capacity "
+                               f"of {self.bloom.capacity}; false positives will rise")
+            self._maybe_compact()
+        return len(keys)
+    
+    def compact(self, days: Optional[float] = None) -> int:
+        """
+        Rewrite the log with one line per live key, dropping entries older
+        than days (default max_age_days)
+        
+        Returns:
+            Number of keys kept
+        """
+        cutoff = self._cutoff(days if days is not None else self.max_age_days)
+        with self._log_lock:
+            if self.bloom is not None:
+                # Only the log knows ages and duplicates; rebuild the filter from it
+                latest: Dict[str, float] = {}
+                for key, stamp in self._read_log():
+                    if stamp >= cutoff and stamp > latest.get(key, float('-inf')):
+                        latest[key] = stamp
+                self.bloom = BloomFilter(self.bloom.capacity, self.bloom_error_rate)
+                for key in latest:
+                    self.bloom.add(key)
+            else:
+                self.processed_urls = {key: stamp for key, stamp in self.processed_urls.items() if stamp >= cutoff}
+                latest = self.processed_urls
+            
+            tmp_path = self.log_path.with_suffix('.tmp')
+            try:
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    f.writelines(f"{stamp:.0f}\t{key}\n" for key, stamp in latest.items())
+                os.replace(tmp_path, self.log_path)
+                self._log_lines = self._live_at_compaction = len(latest)
+                logger.debug(f"Compacted {self.log_path.name} to {len(latest)} entries")
+            except Exception as e:
+                logger.error(f"Failed to compact processed URLs: {str(e)}")
+            return len(latest)
+    
+    def clear_old_urls(self, days: int = 7) -> int:
+        """
+        Forget URLs not marked in the last days
+        
+        Returns:
+            Number of URLs removed
+        """
+        before = self._live_count()
+        kept = self.compact(days)
+        removed = before - kept
+        if removed > 0:
+            logger.info(f"Cleared {removed} processed URLs older than {days} days")
+        return removed
+
+
+class AnalysisCache(SimpleCache):
+    """
+    Content-addressed cache for LLM grant analyses
+    
+    The key is a hash of the normalized grant fields, the org profile, the
+    prompt template version and the model name, so changing any of them is
+    a miss. Entries expire at the end of the grant's deadline day, and a
+    per-opportunity pointer evicts the previous entry whenever a grant is
+    analyzed under a new key. Triage and full analyses are kept in separate
+    slots of the pointer so one never evicts the other.
+    
+    Usage:
+        cache = AnalysisCache()
+        analysis = cache.get_analysis(grant, profile, "v1", "claude-3-5-haiku")
+        if analysis is None:
+            analysis = run_llm(grant)
+            cache.set_analysis(grant, profile, "v1", "claude-3-5-haiku", analysis)
+    """
+    
+    # Grant fields that influence the analysis
+    GRANT_FIELDS = ('title', 'agency', 'description', 'eligibility', 'eligibility_codes',
+                    'deadline', 'award_floor', 'award_ceiling', 'url')
+    
+    def __init__(self, cache_dir: str = "cache/analysis", default_ttl_hours: float = 24.0 * 30):
+        """
+        Args:
+            cache_dir: Directory to store cached analyses
+            default_ttl_hours: TTL for grants without a deadline
+        """
+        super().__init__(cache_dir, default_ttl_hours,
+                         codecs={'analysis': "json+gzip", 'opportunity': "json"})
+        # hits/misses also count pointer lookups; these count analyses only
+        self.analysis_hits = 0
+        self.analysis_misses = 0
+    
+    @staticmethod
+    def _normalize(value: Any) -> Any:
+        """Collapse whitespace so cosmetic source changes don't invalidate entries"""
+        if isinstance(value, str):
+            return ' '.join(value.split())
+        if isinstance(value, (list, tuple)):
+            return [AnalysisCache._normalize(v) for v in value]
+        return value
+    
+    def make_key(self, grant: Dict[str, Any], org_profile: Dict[str, Any],
+                 prompt_version: str, model: str) -> str:
+        """Content hash of everything that determines an analysis"""
+        content = {
+            'grant': {field: self._normalize(grant.get(field)) for field in self.GRANT_FIELDS},
+            'profile': org_profile,
+            'prompt_version': prompt_version,
+            'model': model,
+        }
+        digest = hashlib.sha256(json.dumps(content, sort_keys=True, default=str).encode()).hexdigest()
+        return f"analysis:{digest}"
+    
+    def _pointer_key(self, grant: Dict[str, Any]) -> Optional[str]:
+        opportunity_id = grant.get('opportunity_id')
+        return f"opportunity:{opportunity_id}" if opportunity_id else None
+    
+    def _ttl_hours(self, grant: Dict[str, Any]) -> Optional[float]:
+        """Hours until the end of the deadline day; None if already closed"""
+        deadline = grant.get('deadline')
+        if not deadline:
+            return self.default_ttl_hours
+        try:
+            closes = datetime.fromisoformat(str(deadline)[:10]) + timedelta(days=1)
+        except ValueError:
+            return self.default_ttl_hours
+        hours = (closes - datetime.now()).total_seconds() / 3600
+        return hours if hours > 0 else None
+    
+    def get_analysis(self, grant: Dict[str, Any], org_profile: Dict[str, Any],
+                     prompt_version: str, model: str) -> Optional[Dict[str, Any]]:
+        """Cached analysis for exactly this grant content, profile, prompt and model"""
+        analysis = self.get(self.make_key(grant, org_profile, prompt_version, model))
+        if analysis is None:
+            self.analysis_misses += 1
+        else:
+            self.analysis_hits += 1
+        return analysis
+    
+    def set_analysis(self, grant: Dict[str, Any], org_profile: Dict[str, Any],
+                     prompt_version: str, model: str, analysis: Dict[str, Any],
+                     slot: str = 'analysis') -> bool:
+        """
+        Store an analysis until the grant closes, evicting the grant's previous entry
+        
+        Args:
+            slot: Kind of result ("analysis", "triage"); each slot keeps its
+                own latest entry per opportunity
+        
+        Returns:
+            True if cached (closed grants are not cached)
+        """
+        ttl = self._ttl_hours(grant)
+        if ttl is None:
+            return False
+        
+        key = self.make_key(grant, org_profile, prompt_version, model)
+        pointer = self._pointer_key(grant)
+        if pointer:
+            entries = self.get(pointer) or {}
+            previous = entries.get(slot)
+            if previous and previous != key:
+                self.delete(previous)
+                logger.debug(f"Evicted stale {slot} for {grant.get('opportunity_id')}")
+            entries[slot] = key
+            self.set(pointer, entries, ttl)
+        return self.set(key, analysis, ttl)
+    
+    def evict_opportunity(self, opportunity_id: str) -> bool:
+        """Drop every cached result for an opportunity (e.g. when it closes)"""
+        pointer = f"opportunity:{opportunity_id}"
+        entries = self.get(pointer)
+        if not entries:
+            return False
+        for key in entries.values():
+            self.delete(key)
+        self.delete(pointer)
+        return True
 
 
 # Test the cache system
 if __name__ == "__main__":
-    import time
-    
     # Set up logging
     logging.basicConfig(
         level=logging.DEBUG,
@@ -1,15 +1,32 @@
 """
 Article Deduplication System
 Prevents the same articles from appearing in multiple daily updates
+
+OpportunityDeduplicator finds the same funding program listed by several
+sources (grants.gov, NSF RSS, a foundation page) under slightly different
+titles. Each opportunity gets a MinHash signature over shingles of its
+normalized title and description; an LSH index over signature bands finds
+candidate pairs without comparing every pair, and candidates whose
+estimated similarity clears the threshold are merged into one canonical
+record listing every source.
 """
 
 import os
+import re
 import json
+import random
 import hashlib
+from collections import defaultdict
 from datetime import datetime, timedelta
-from typing import List, Dict, Set
+from typing import Any, List, Dict, Optional, Set, Tuple
 import logging
 
+try:
+    import numpy as np
+    NUMPY_AVAILABLE = True
+except ImportError:
+    NUMPY_AVAILABLE = False
+
 logger = logging.getLogger(__name__)
 
 class ArticleDeduplicator:
@@ -111,6 +128,194 @@ class ArticleDeduplicator:
         return removed
 
 
+MERSENNE_PRIME = (1 << 61) - 1
+
+# Structured feeds make the best canonical record
+SOURCE_PRIORITY = ('grants.gov', 'nsf')
+
+# Past funding (NSF awards) is never the same thing as an open call,
+# however closely its abstract echoes the solicitation
+UNMERGED_RECORD_TYPES = frozenset({'award'})
+
+# Fields a canonical record takes from its duplicates when it lacks them
+MERGE_FIELDS = ('description', 'deadline', 'award_floor', 'award_ceiling', 'eligibility',
+                'eligibility_codes', 'url', 'agency', 'posted_date')
+
+
+class OpportunityDeduplicator:
+    """
+    Near-duplicate detection across sources with MinHash and LSH
+
+    Shingles are character 5-grams of the title plus word 3-grams of the
+    first description_words words, so a one-paragraph RSS summary and a
+    full grants.gov synopsis of the same program still overlap. Only
+    records from different origins are merged: two listings from one feed
+    or API are separate opportunities even when their text is nearly
+    identical. The origin is the source plus its record_type, so a
+    collector with several announcement feeds can still merge across them.
+    Records of a type in UNMERGED_RECORD_TYPES (awards) are never merged.
+
+    Usage:
+        dedup = OpportunityDeduplicator(threshold=0.5)
+        grants = dedup.merge(grants)
+    """
+
+    def __init__(self, threshold: float = 0.5, num_perm: int = 128, description_words: int = 80,
+                 max_bucket: int = 50, seed: int = 1):
+        """
+        Args:
+            threshold: Estimated Jaccard similarity needed to merge two records
+            num_perm: MinHash signature length
+            description_words: Leading description words that are shingled
+            max_bucket: LSH buckets larger than this (shared boilerplate) are skipped
+            seed: Seed for the hash permutations
+        """
+        self.threshold = threshold
+        self.num_perm = num_perm
+        self.description_words = description_words
+        self.max_bucket = max_bucket
+        self.bands, self.rows = self._band_layout(num_perm, threshold)
+        rng = random.Random(seed)
+        # a, b < 2**32 keep a * h + b inside uint64 for the NumPy path
+        self.perm_a = [rng.randrange(1, 1 << 32) for _ in range(num_perm)]
+        self.perm_b = [rng.randrange(0, 1 << 32) for _ in range(num_perm)]
+
+    @staticmethod
+    def _band_layout(num_perm: int, threshold: float) -> Tuple[int, int]:
+        """(bands, rows) whose LSH threshold (1/b)^(1/r) is closest to the merge threshold"""
+        layouts = [(b, num_perm // b) for b in range(1, num_perm + 1) if num_perm % b == 0]
+        return min(layouts, key=lambda layout: abs((1 / layout[0]) ** (1 / layout[1]) - threshold))
+
+    def shingles(self, grant: Dict[str, Any]) -> Set[int]:
+        """32-bit hashes of the grant's title and description shingles"""
+        title = ' '.join(re.sub(r'[^a-z0-9]+', ' ', (grant.get('title') or '').lower()).split())
+        words = re.sub(r'[^a-z0-9]+', ' ', (grant.get('description') or '').lower()).split()
+        words = words[:self.description_words]
+
+        grams = {f"t:{title[i:i + 5]}" for i in range(max(1, len(title) - 4))} if title else set()
+        grams.update(f"d:{' '.join(words[i:i + 3])}" for i in range(max(1, len(words) - 2)) if words)
+        return {int.from_bytes(hashlib.blake2b(g.encode(), digest_size=4).digest(), 'little') for g in grams}
+
+    def signature(self, shingles: Set[int]) -> Tuple[int, ...]:
+        """MinHash signature: per permutation, the minimum of (a * h + b) mod p"""
+        if not shingles:
+            return ()
+        if NUMPY_AVAILABLE:
+            hashes = np.fromiter(shingles, dtype=np.uint64, count=len(shingles))
+            a = np.array(self.perm_a, dtype=np.uint64)[:, None]
+            b = np.array(self.perm_b, dtype=np.uint64)[:, None]
+            return tuple(((a * hashes + b) % np.uint64(MERSENNE_PRIME)).min(axis=1).tolist())
+        return tuple(min((a * h + b) % MERSENNE_PRIME for h in shingles)
+                     for a, b in zip(self.perm_a, self.perm_b))
+
+    def find_duplicates(self, grants: List[Dict[str, Any]]) -> List[List[int]]:
+        """
+        Cluster near-duplicate grants
+
+        Returns:
+            Index lists of clusters with more than one grant
+        """
+        signatures = [() if grant.get('record_type') in UNMERGED_RECORD_TYPES
+                      else self.signature(self.shingles(grant)) for grant in grants]
+        origins = [self.origin(grant) for grant in grants]
+
+        # LSH: grants sharing any whole band of their signature are candidates
+        candidates: Set[Tuple[int, int]] = set()
+        for band in range(self.bands):
+            buckets: Dict[Tuple[int, ...], List[int]] = defaultdict(list)
+            start = band * self.rows
+            for i, signature in enumerate(signatures):
+                if signature:
+                    buckets[signature[start:start + self.rows]].append(i)
+            for members in buckets.values():
+                if len(members) > self.max_bucket:
+                    logger.debug(f"Skipping LSH bucket of {len(members)} grants (shared boilerplate)")
+                    continue
+                candidates.update((members[x], members[y])
+                                  for x in range(len(members)) for y in range(x + 1, len(members)))
+
+        pairs = []
+        for i, j in candidates:
+            if origins[i] == origins[j]:
+                continue
+            similarity = sum(x == y for x, y in zip(signatures[i], signatures[j])) / self.num_perm
+            if similarity >= self.threshold:
+                pairs.append((similarity, i, j))
+
+        # Union the most similar pairs first, never joining two records from one origin
+        parent = list(range(len(grants)))
+        sources = [{origin} for origin in origins]
+
+        def find(i: int) -> int:
+            while parent[i] != i:
+                parent[i] = parent[parent[i]]
+                i = parent[i]
+            return i
+
+        for _, i, j in sorted(pairs, reverse=True):
+            root_i, root_j = find(i), find(j)
+            if root_i != root_j and not sources[root_i] & sources[root_j]:
+                parent[root_j] = root_i
+                sources[root_i] |= sources[root_j]
+
+        clusters: Dict[int, List[int]] = defaultdict(list)
+        for i in range(len(grants)):
+            clusters[find(i)].append(i)
+        return [members for members in clusters.values() if len(members) > 1]
+
+    @staticmethod
+    def origin(grant: Dict[str, Any]) -> Tuple[str, str]:
+        """Feed or API a record came from: (source, record_type)"""
+        return grant.get('source') or '', grant.get('record_type') or ''
+
+    @staticmethod
+    def _canonical_rank(grant: Dict[str, Any]) -> Tuple[int, int]:
+        source = grant.get('source') or ''
+        priority = SOURCE_PRIORITY.index(source) if source in SOURCE_PRIORITY else len(SOURCE_PRIORITY)
+        return priority, -sum(1 for field in MERGE_FIELDS if grant.get(field))
+
+    def merge_cluster(self, cluster: List[Dict[str, Any]]) -> Dict[str, Any]:
+        """One canonical record for a cluster, filled in from the others and listing every source"""
+        ranked = sorted(cluster, key=self._canonical_rank)
+        canonical = dict(ranked[0])
+        for other in ranked[1:]:
+            for field in MERGE_FIELDS:
+                if not canonical.get(field) and other.get(field):
+                    canonical[field] = other[field]
+        canonical['sources'] = [
+            {'source': g.get('source'), 'record_type': g.get('record_type'),
+             'opportunity_id': g.get('opportunity_id'), 'title': g.get('title'), 'url': g.get('url')}
+            for g in ranked
+        ]
+        canonical['duplicate_ids'] = [g.get('opportunity_id') for g in ranked[1:]]
+        return canonical
+
+    def merge(self, grants: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """
+        Replace each cluster of near-duplicates with its canonical record
+
+        Returns:
+            Grants in their original order, each cluster at the position of
+            its first member
+        """
+        if len(grants) < 2:
+            return grants
+        clusters = self.find_duplicates(grants)
+        if not clusters:
+            return grants
+
+        merged_at: Dict[int, Dict[str, Any]] = {}
+        absorbed: Set[int] = set()
+        for members in clusters:
+            merged_at[min(members)] = self.merge_cluster([grants[i] for i in members])
+            absorbed.update(members)
+
+        result = [merged_at.get(i, grant) for i, grant in enumerate(grants) if i in merged_at or i not in absorbed]
+        logger.info(f"Merged {len(absorbed)} cross-source listings into {len(clusters)} opportunities "
+                    f"({len(grants)} -> {len(result)})")
+        return result
+
+
 if __name__ == "__main__":
     # Test deduplication
     deduplicator = ArticleDeduplicator()
@@ -123,4 +328,27 @@ if __name__ == "__main__":
 
     filtered = deduplicator.filter_duplicates(test_articles)
     print(f"Original: {len(test_articles)}, Filtered: {len(filtered)}")
-    print(f"Duplicates removed: {len(test_articles) - len(filtered)}")
\ No newline at end of file
+    print(f"Duplicates removed: {len(test_articles) - len(filtered)}")
+
+    # Test cross-source near-duplicate merging
+    synopsis = ("The NSF Research Traineeship program encourages the development of bold, new "
+                "potentially transformative models for STEM graduate education training.")
+    grants = [
+        {'opportunity_id': 'gg-1', 'source': 'grants.gov', 'title': 'NSF Research Traineeship (NRT) Program',
+         'description': synopsis + " Awards up to $3,000,000.", 'deadline': '2025-09-01'},
+        {'opportunity_id': 'nsf-rss-1', 'source': 'nsf', 'title': 'NSF Research Traineeship Program (NRT)',
+         'description': synopsis, 'url': 'https://www.nsf.gov/nrt'},
+        {'opportunity_id': 'gg-2', 'source': 'grants.gov', 'title': 'Cyberinfrastructure for Sustained Innovation',
+         'description': 'Supports software and data infrastructure for science and engineering.'},
+    ]
+    merged = OpportunityDeduplicator().merge(grants)
+    assert [g['opportunity_id'] for g in merged] == ['gg-1', 'gg-2']
+    assert merged[0]['duplicate_ids'] == ['nsf-rss-1'] and merged[0]['url'] == 'https://www.nsf.gov/nrt'
+
+    # Awards never merge, not even into the announcement they were funded under
+    announcement = dict(grants[1], record_type='program_announcement')
+    award = dict(grants[1], opportunity_id='nsf-2', record_type='award')
+    merged = OpportunityDeduplicator().merge([grants[0], announcement, award])
+    assert [g['opportunity_id'] for g in merged] == ['gg-1', 'nsf-2']
+    assert merged[0]['duplicate_ids'] == ['nsf-rss-1'] and not merged[1].get('duplicate_ids')
+    print(f"Opportunities: {len(grants)} -> {len(merged)}")
\ No newline at end of file
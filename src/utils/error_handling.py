@@ -5,6 +5,7 @@ Provides retry logic, circuit breakers, and robust error recovery
 
 import time
 import logging
+import threading
 from functools import wraps
 from typing import Any, Callable, Optional, Type, Tuple
 from datetime import datetime, timedelta
@@ -48,6 +49,8 @@ class CircuitBreaker:
         self.last_failure_time = None
         self.state = CircuitState.CLOSED
         self.success_count = 0
+        # State changes are locked so one breaker can guard calls from many threads
+        self._lock = threading.Lock()
     
     def call(self, func: Callable, *args, **kwargs) -> Any:
         """
@@ -56,12 +59,13 @@ class CircuitBreaker:
         Raises:
             Exception: If circuit is open or function fails
         """
-        if self.state == CircuitState.OPEN:
-            if self._should_attempt_reset():
-                self.state = CircuitState.HALF_OPEN
-                logger.info(f"Circuit breaker entering HALF_OPEN state for {func.__name__}")
-            else:
-                raise Exception(f"Circuit breaker is OPEN for {func.__name__}")
+        with self._lock:
+            if self.state == CircuitState.OPEN:
+                if self._should_attempt_reset():
+                    self.state = CircuitState.HALF_OPEN
+                    logger.info(f"Circuit breaker entering HALF_OPEN state for {func.__name__}")
+                else:
+                    raise Exception(f"Circuit breaker is OPEN for {func.__name__}")
         
         try:
             result = func(*args, **kwargs)
@@ -77,26 +81,32 @@ class CircuitBreaker:
         return (self.last_failure_time and 
                 datetime.now() - self.last_failure_time > timedelta(seconds=self.recovery_timeout))
     
+    def allows_calls(self) -> bool:
+        """True unless the circuit is open and still inside its recovery timeout"""
+        return self.state != CircuitState.OPEN or bool(self._should_attempt_reset())
+    
     def _on_success(self):
         """Handle successful call"""
-        self.failure_count = 0
-        
-        if self.state == CircuitState.HALF_OPEN:
-            self.success_count += 1
-            if self.success_count > 2:  # Require multiple successes
-                self.state = CircuitState.CLOSED
-                self.success_count = 0
-                logger.info("Circuit breaker closed after successful recovery")
+        with self._lock:
+            self.failure_count = 0
+            
+            if self.state == CircuitState.HALF_OPEN:
+                self.success_count += 1
+                if self.success_count > 2:  # Require multiple successes
+                    self.state = CircuitState.CLOSED
+                    self.success_count = 0
+                    logger.info("Circuit breaker closed after successful recovery")
     
     def _on_failure(self):
         """Handle failed call"""
-        self.failure_count += 1
-        self.last_failure_time = datetime.now()
-        self.success_count = 0
-        
-        if self.failure_count >= self.failure_threshold:
-            self.state = CircuitState.OPEN
-            logger.warning(f"Circuit breaker opened after {self.failure_count} failures")
+        with self._lock:
+            self.failure_count += 1
+            self.last_failure_time = datetime.now()
+            self.success_count = 0
+            
+            if self.failure_count >= self.failure_threshold:
+                self.state = CircuitState.OPEN
+                logger.warning(f"Circuit breaker opened after {self.failure_count} failures")
     
     def get_state(self) -> str:
         """Get current circuit state"""
@@ -202,11 +212,16 @@ class RateLimiter:
     """
     Rate limiter to prevent overwhelming external services
     
+    Thread-safe: concurrent workers can share one limiter.
+    
     Usage:
         limiter = RateLimiter(max_calls=10, time_window=60)
         if limiter.can_call('api_name'):
             limiter.record_call('api_name')
             # Make API call
+        
+        # Or block until a slot is free and claim it atomically
+        limiter.acquire('api_name')
     """
     
     def __init__(self, max_calls: int = 10, time_window: int = 60):
@@ -220,28 +235,46 @@ class RateLimiter:
         self.max_calls = max_calls
         self.time_window = time_window
         self.calls = {}  # service_name -> list of timestamps
+        self._lock = threading.Lock()
+    
+    def _prune(self, service_name: str, now: float) -> list:
+        """Drop calls outside the time window (caller holds the lock)"""
+        calls = [t for t in self.calls.get(service_name, []) if now - t < self.time_window]
+        self.calls[service_name] = calls
+        return calls
     
     def can_call(self, service_name: str) -> bool:
         """Check if call is allowed"""
-        now = time.time()
-        
-        if service_name not in self.calls:
-            self.calls[service_name] = []
-        
-        # Remove old calls outside time window
-        self.calls[service_name] = [
-            t for t in self.calls[service_name]
-            if now - t < self.time_window
-        ]
-        
-        return len(self.calls[service_name]) < self.max_calls
+        with self._lock:
+            return len(self._prune(service_name, time.time())) < self.max_calls
     
     def record_call(self, service_name: str):
         """Record that a call was made"""
-        if service_name not in self.calls:
-            self.calls[service_name] = []
+        with self._lock:
+            self.calls.setdefault(service_name, []).append(time.time())
+    
+    def acquire(self, service_name: str) -> float:
+        """
+        Block until a call is allowed, then record it
+        
+        Checking and recording happen under one lock, so concurrent callers
+        never overshoot max_calls.
         
-        self.calls[service_name].append(time.time())
+        Returns:
+            Time waited in seconds
+        """
+        started = time.time()
+        while True:
+            with self._lock:
+                now = time.time()
+                calls = self._prune(service_name, now)
+                if len(calls) < self.max_calls:
+                    calls.append(now)
+                    return now - started
+                # Sleep until the oldest call leaves the window
+                wait_time = self.time_window - (now - calls[0])
+            logger.debug(f"Rate limit reached for {service_name}, waiting {wait_time:.1f}s")
+            time.sleep(max(wait_time, 0.01))
     
     def wait_if_needed(self, service_name: str) -> float:
         """
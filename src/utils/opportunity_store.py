@@ -0,0 +1,498 @@
+"""
+Opportunity Store
+SQLite-backed storage for collected grant opportunities
+
+Keeps every opportunity seen across runs with typed columns for the fields
+the matcher filters on, an FTS5 index over title and description, and an
+event log for historical tracking (new/updated/closed, applied, outcomes).
+
+Opportunities close when their deadline passes. Records without a deadline
+(NSF awards, RSS announcements, web page listings) close instead once no
+collector has returned them for expire_unseen_days (expire_unseen()).
+Delta sources don't resend unchanged records, so their runs report every
+id still listed and touch() keeps those records' last_seen current.
+"""
+
+import os
+import json
+import sqlite3
+import hashlib
+import logging
+import threading
+from datetime import datetime, timedelta
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+logger = logging.getLogger(__name__)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS opportunities (
+    opportunity_id TEXT PRIMARY KEY,
+    source TEXT,
+    title TEXT,
+    agency TEXT,
+    description TEXT,
+    deadline TEXT,
+    posted_date TEXT,
+    last_updated TEXT,
+    award_ceiling REAL,
+    award_floor REAL,
+    eligibility TEXT,
+    url TEXT,
+    status TEXT NOT NULL DEFAULT 'open',
+    content_hash TEXT NOT NULL,
+    data TEXT NOT NULL,
+    first_seen TEXT NOT NULL,
+    last_seen TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_opportunities_deadline ON opportunities(deadline);
+CREATE INDEX IF NOT EXISTS idx_opportunities_agency ON opportunities(agency);
+CREATE INDEX IF NOT EXISTS idx_opportunities_source ON opportunities(source);
+
+CREATE TABLE IF NOT EXISTS opportunity_eligibility (
+    opportunity_id TEXT NOT NULL REFERENCES opportunities(opportunity_id) ON DELETE CASCADE,
+    code TEXT NOT NULL,
+    PRIMARY KEY (opportunity_id, code)
+);
+CREATE INDEX IF NOT EXISTS idx_eligibility_code ON opportunity_eligibility(code);
+
+CREATE TABLE IF NOT EXISTS opportunity_events (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    opportunity_id TEXT NOT NULL,
+    event TEXT NOT NULL,
+    detail TEXT,
+    recorded_at TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_events_opportunity ON opportunity_events(opportunity_id);
+
+CREATE VIRTUAL TABLE IF NOT EXISTS opportunities_fts USING fts5(
+    title, description, content='opportunities', content_rowid='rowid'
+);
+CREATE TRIGGER IF NOT EXISTS opportunities_ai AFTER INSERT ON opportunities BEGIN
+    INSERT INTO opportunities_fts(rowid, title, description)
+    VALUES (new.rowid, new.title, new.description);
+END;
+CREATE TRIGGER IF NOT EXISTS opportunities_ad AFTER DELETE ON opportunities BEGIN
+    INSERT INTO opportunities_fts(opportunities_fts, rowid, title, description)
+    VALUES ('delete', old.rowid, old.title, old.description);
+END;
+CREATE TRIGGER IF NOT EXISTS opportunities_au AFTER UPDATE OF title, description ON opportunities BEGIN
+    INSERT INTO opportunities_fts(opportunities_fts, rowid, title, description)
+    VALUES ('delete', old.rowid, old.title, old.description);
+    INSERT INTO opportunities_fts(rowid, title, description)
+    VALUES (new.rowid, new.title, new.description);
+END;
+"""
+
+UPSERT_SQL = """
+INSERT INTO opportunities (
+    opportunity_id, source, title, agency, description, deadline, posted_date,
+    last_updated, award_ceiling, award_floor, eligibility, url, status,
+    content_hash, data, first_seen, last_seen
+) VALUES (
+    :opportunity_id, :source, :title, :agency, :description, :deadline, :posted_date,
+    :last_updated, :award_ceiling, :award_floor, :eligibility, :url, :status,
+    :content_hash, :data, :now, :now
+)
+ON CONFLICT(opportunity_id) DO UPDATE SET
+    source = excluded.source,
+    title = excluded.title,
+    agency = excluded.agency,
+    description = excluded.description,
+    deadline = excluded.deadline,
+    posted_date = excluded.posted_date,
+    last_updated = excluded.last_updated,
+    award_ceiling = excluded.award_ceiling,
+    award_floor = excluded.award_floor,
+    eligibility = excluded.eligibility,
+    url = excluded.url,
+    status = excluded.status,
+    content_hash = excluded.content_hash,
+    data = excluded.data,
+    last_seen = excluded.last_seen
+"""
+
+
+class OpportunityStore:
+    """
+    Persistent store of grant opportunities
+
+    Usage:
+        store = OpportunityStore("data/opportunities.db")
+        store.upsert_many(collector.fetch_opportunities())
+
+        for grant in store.query(open_only=True, eligibility_codes=["06", "20"]):
+            ...
+        matches = store.search("entrepreneurship OR \"artificial intelligence\"")
+    """
+
+    def __init__(self, db_path: str = "data/opportunities.db", expire_unseen_days: Optional[float] = 30):
+        """
+        Open (and create if needed) the opportunity database
+
+        Args:
+            db_path: Path to the SQLite file, or ":memory:"
+            expire_unseen_days: Close opportunities without a deadline once
+                they haven't been collected for this long; None keeps them open
+        """
+        self.db_path = db_path
+        self.expire_unseen_days = expire_unseen_days
+        if db_path != ":memory:":
+            os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+
+        self._lock = threading.RLock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA foreign_keys=ON")
+        self.conn.executescript(SCHEMA)
+        self.conn.commit()
+
+    def upsert(self, opportunity: Dict[str, Any]) -> Optional[str]:
+        """
+        Insert or update a single opportunity
+
+        Returns:
+            'new', 'updated', 'closed' or None if nothing changed
+        """
+        with self._lock, self.conn:
+            return self._upsert_row(opportunity, datetime.now().isoformat())
+
+    def upsert_many(self, opportunities: Iterable[Dict[str, Any]]) -> Dict[str, int]:
+        """
+        Insert or update opportunities in a single transaction
+
+        Accepts any iterable, so collector generators can stream straight in.
+
+        Returns:
+            Counts of 'new', 'updated', 'closed' and 'unchanged' records
+        """
+        counts = {'new': 0, 'updated': 0, 'closed': 0, 'unchanged': 0}
+        now = datetime.now().isoformat()
+
+        with self._lock, self.conn:
+            for opportunity in opportunities:
+                if not opportunity.get('opportunity_id'):
+                    logger.debug(f"Skipping opportunity without id: {opportunity.get('title')}")
+                    continue
+                event = self._upsert_row(opportunity, now)
+                counts[event or 'unchanged'] += 1
+
+        logger.debug(f"Opportunity store: {counts['new']} new, {counts['updated']} updated, "
+                    f"{counts['closed']} closed, {counts['unchanged']} unchanged")
+        return counts
+
+    def touch(self, opportunity_ids: Iterable[str]) -> int:
+        """
+        Mark opportunities as seen now without rewriting them
+
+        For delta syncs, whose unchanged records are still listed but never
+        sent again.
+
+        Returns:
+            Number of stored opportunities touched
+        """
+        now = datetime.now().isoformat()
+        with self._lock, self.conn:
+            return self.conn.executemany(
+                "UPDATE opportunities SET last_seen = ? WHERE opportunity_id = ?",
+                ((now, str(opportunity_id)) for opportunity_id in opportunity_ids)
+            ).rowcount
+
+    def expire_unseen(self) -> int:
+        """
+        Close open deadline-less opportunities last seen before the expiry window
+
+        Call once per run, after every source has been stored and touched.
+
+        Returns:
+            Number of opportunities closed
+        """
+        if self.expire_unseen_days is None:
+            return 0
+        now = datetime.now().isoformat()
+        cutoff = (datetime.now() - timedelta(days=self.expire_unseen_days)).isoformat()
+        with self._lock, self.conn:
+            stale = [row[0] for row in self.conn.execute(
+                "SELECT opportunity_id FROM opportunities "
+                "WHERE status = 'open' AND deadline IS NULL AND last_seen < ?", (cutoff,)
+            )]
+            if not stale:
+                return 0
+            self.conn.executemany(
+                "UPDATE opportunities SET status = 'closed' WHERE opportunity_id = ?",
+                [(opportunity_id,) for opportunity_id in stale]
+            )
+            self.conn.executemany(
+                "INSERT INTO opportunity_events (opportunity_id, event, detail, recorded_at) "
+                "VALUES (?, ?, ?, ?)",
+                [(opportunity_id, 'closed', f"not seen for {self.expire_unseen_days:g} days", now)
+                 for opportunity_id in stale]
+            )
+        logger.info(f"Opportunity store: closed {len(stale)} opportunities without a deadline "
+                    f"not seen for {self.expire_unseen_days:g} days")
+        return len(stale)
+
+    def _upsert_row(self, opportunity: Dict[str, Any], now: str) -> Optional[str]:
+        """Write one opportunity and log an event if it changed"""
+        opportunity_id = str(opportunity['opportunity_id'])
+        # change_type describes this sync, not the opportunity itself
+        record = {k: v for k, v in opportunity.items() if k != 'change_type'}
+        data = json.dumps(record, sort_keys=True, default=str)
+        content_hash = hashlib.md5(data.encode()).hexdigest()
+
+        existing = self.conn.execute(
+            "SELECT content_hash, status, json_extract(data, '$.is_forecast') AS is_forecast "
+            "FROM opportunities WHERE opportunity_id = ?",
+            (opportunity_id,)
+        ).fetchone()
+        if existing is not None and opportunity.get('is_forecast') and existing['is_forecast'] == 0:
+            # A stale forecast never replaces the synopsis that superseded it
+            self.conn.execute("UPDATE opportunities SET last_seen = ? WHERE opportunity_id = ?",
+                              (now, opportunity_id))
+            return None
+
+        deadline = opportunity.get('deadline')
+        is_closed = (opportunity.get('change_type') == 'closed' or
+                     bool(deadline and deadline < now[:10]))
+        status = 'closed' if is_closed else 'open'
+        if existing is None:
+            event = 'new'
+        elif status == 'closed' and existing['status'] != 'closed':
+            event = 'closed'
+        elif existing['content_hash'] != content_hash:
+            event = 'updated'
+        else:
+            event = None
+
+        self.conn.execute(UPSERT_SQL, {
+            'opportunity_id': opportunity_id,
+            'source': opportunity.get('source'),
+            'title': opportunity.get('title', ''),
+            'agency': opportunity.get('agency'),
+            'description': opportunity.get('description', ''),
+            'deadline': deadline,
+            'posted_date': opportunity.get('posted_date'),
+            'last_updated': opportunity.get('last_updated'),
+            'award_ceiling': opportunity.get('award_ceiling'),
+            'award_floor': opportunity.get('award_floor'),
+            'eligibility': opportunity.get('eligibility'),
+            'url': opportunity.get('url'),
+            'status': status,
+            'content_hash': content_hash,
+            'data': data,
+            'now': now,
+        })
+
+        if event in ('new', 'updated'):
+            self.conn.execute(
+                "DELETE FROM opportunity_eligibility WHERE opportunity_id = ?", (opportunity_id,)
+            )
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO opportunity_eligibility (opportunity_id, code) VALUES (?, ?)",
+                [(opportunity_id, code) for code in opportunity.get('eligibility_codes') or []]
+            )
+
+        if event:
+            self.conn.execute(
+                "INSERT INTO opportunity_events (opportunity_id, event, recorded_at) VALUES (?, ?, ?)",
+                (opportunity_id, event, now)
+            )
+        return event
+
+    def get(self, opportunity_id: str) -> Optional[Dict[str, Any]]:
+        """Fetch a single opportunity by id"""
+        with self._lock:
+            row = self.conn.execute(
+                "SELECT * FROM opportunities WHERE opportunity_id = ?", (str(opportunity_id),)
+            ).fetchone()
+        return self._row_to_dict(row) if row else None
+
+    def query(self,
+              open_only: bool = True,
+              agency: Optional[str] = None,
+              sources: Optional[List[str]] = None,
+              deadline_after: Optional[str] = None,
+              deadline_before: Optional[str] = None,
+              min_award: Optional[float] = None,
+              eligibility_codes: Optional[List[str]] = None,
+              limit: Optional[int] = None) -> Iterator[Dict[str, Any]]:
+        """
+        Query opportunities by their typed columns
+
+        Args:
+            open_only: Skip closed opportunities and those past their deadline
+            agency: Exact agency name
+            sources: Limit to these collector sources
+            deadline_after / deadline_before: ISO date bounds
+            min_award: Minimum award ceiling (unknown ceilings are kept)
+            eligibility_codes: Keep opportunities listing any of these codes
+            limit: Maximum number of rows
+
+        Yields:
+            Opportunity dicts as originally collected, plus first_seen/last_seen
+        """
+        clauses, params = [], []
+
+        if open_only:
+            clauses.append("status = 'open' AND (deadline IS NULL OR deadline >= ?)")
+            params.append(datetime.now().date().isoformat())
+        if agency:
+            clauses.append("agency = ?")
+            params.append(agency)
+        if sources:
+            clauses.append(f"source IN ({','.join('?' * len(sources))})")
+            params.extend(sources)
+        if deadline_after:
+            clauses.append("deadline >= ?")
+            params.append(deadline_after)
+        if deadline_before:
+            clauses.append("deadline <= ?")
+            params.append(deadline_before)
+        if min_award is not None:
+            clauses.append("(award_ceiling IS NULL OR award_ceiling >= ?)")
+            params.append(min_award)
+        if eligibility_codes:
+            clauses.append(
+                "opportunity_id IN (SELECT opportunity_id FROM opportunity_eligibility "
+                f"WHERE code IN ({','.join('?' * len(eligibility_codes))}))"
+            )
+            params.extend(eligibility_codes)
+
+        sql = "SELECT * FROM opportunities"
+        if clauses:
+            sql += " WHERE " + " AND ".join(clauses)
+        sql += " ORDER BY deadline IS NULL, deadline"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self.conn.execute(sql, params).fetchall()
+        for row in rows:
+            yield self._row_to_dict(row)
+
+    def search(self, match_query: str, open_only: bool = True, limit: int = 200) -> List[Dict[str, Any]]:
+        """
+        Full-text search over title and description
+
+        Args:
+            match_query: FTS5 MATCH expression
+            open_only: Skip closed opportunities and those past their deadline
+            limit: Maximum number of results
+
+        Returns:
+            Opportunities ordered by bm25 rank, each with a 'search_rank'
+        """
+        sql = (
+            "SELECT o.*, bm25(opportunities_fts) AS search_rank FROM opportunities_fts "
+            "JOIN opportunities o ON o.rowid = opportunities_fts.rowid "
+            "WHERE opportunities_fts MATCH ?"
+        )
+        params: List[Any] = [match_query]
+        if open_only:
+            sql += " AND o.status = 'open' AND (o.deadline IS NULL OR o.deadline >= ?)"
+            params.append(datetime.now().date().isoformat())
+        sql += " ORDER BY search_rank LIMIT ?"
+        params.append(limit)
+
+        try:
+            with self._lock:
+                rows = self.conn.execute(sql, params).fetchall()
+        except sqlite3.OperationalError as e:
+            logger.error(f"Invalid full-text query {match_query!r}: {e}")
+            return []
+
+        results = []
+        for row in rows:
+            opportunity = self._row_to_dict(row)
+            opportunity['search_rank'] = row['search_rank']
+            results.append(opportunity)
+        return results
+
+    def search_keywords(self, keywords: List[str], **kwargs) -> List[Dict[str, Any]]:
+        """Full-text search for opportunities mentioning any of the keywords"""
+        phrases = []
+        for keyword in keywords:
+            words = keyword.replace('_', ' ').replace('"', ' ').split()
+            if words:
+                phrases.append('"' + ' '.join(words) + '"')
+        if not phrases:
+            return []
+        return self.search(' OR '.join(phrases), **kwargs)
+
+    def record_event(self, opportunity_id: str, event: str, detail: str = None):
+        """
+        Record a tracking event (e.g. 'applied', 'awarded', 'declined')
+        """
+        with self._lock, self.conn:
+            self.conn.execute(
+                "INSERT INTO opportunity_events (opportunity_id, event, detail, recorded_at) "
+                "VALUES (?, ?, ?, ?)",
+                (str(opportunity_id), event, detail, datetime.now().isoformat())
+            )
+
+    def history(self, opportunity_id: str) -> List[Dict[str, Any]]:
+        """Get the event history of an opportunity, oldest first"""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT event, detail, recorded_at FROM opportunity_events "
+                "WHERE opportunity_id = ? ORDER BY id",
+                (str(opportunity_id),)
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def count(self, open_only: bool = False) -> int:
+        """Number of stored opportunities"""
+        sql = "SELECT COUNT(*) FROM opportunities"
+        params: List[Any] = []
+        if open_only:
+            sql += " WHERE status = 'open' AND (deadline IS NULL OR deadline >= ?)"
+            params.append(datetime.now().date().isoformat())
+        with self._lock:
+            return self.conn.execute(sql, params).fetchone()[0]
+
+    def close(self):
+        """Close the database connection"""
+        with self._lock:
+            self.conn.close()
+
+    def _row_to_dict(self, row: sqlite3.Row) -> Dict[str, Any]:
+        """Rebuild the collected opportunity dict from a row"""
+        opportunity = json.loads(row['data'])
+        opportunity['status'] = row['status']
+        opportunity['first_seen'] = row['first_seen']
+        opportunity['last_seen'] = row['last_seen']
+        return opportunity
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+
+    store = OpportunityStore(":memory:")
+    store.upsert_many([
+        {'opportunity_id': '1', 'title': 'AI in Higher Education', 'description': 'Entrepreneurship curriculum',
+         'agency': 'NSF', 'deadline': '2099-01-01', 'eligibility_codes': ['06', '20'], 'award_ceiling': 50000},
+        {'opportunity_id': '2', 'title': 'Clinical Trial Support', 'description': 'Drug development',
+         'agency': 'NIH', 'deadline': '2099-01-01', 'eligibility_codes': ['12']},
+    ])
+    assert [g['opportunity_id'] for g in store.search('entrepreneurship')] == ['1']
+    assert [g['opportunity_id'] for g in store.query(eligibility_codes=['06'])] == ['1']
+    assert store.upsert({'opportunity_id': '1', 'title': 'AI in Higher Education', 'description': 'Updated',
+                         'agency': 'NSF', 'deadline': '2099-01-01'}) == 'updated'
+    assert store.search('entrepreneurship') == []
+    for opportunity_id in ('3', '4'):
+        store.conn.execute("INSERT INTO opportunities (opportunity_id, title, content_hash, data, first_seen, "
+                           "last_seen) VALUES (?, 'Old announcement', '', '{}', '2000-01-01', '2000-01-01')",
+                           (opportunity_id,))
+    # '4' is still listed by a delta source that didn't resend it
+    assert store.touch(['4']) == 1
+    assert store.expire_unseen() == 1
+    assert dict(store.conn.execute("SELECT opportunity_id, status FROM opportunities "
+                                   "WHERE opportunity_id IN ('3', '4')").fetchall()) == {'3': 'closed', '4': 'open'}
+    # A forecast read before its synopsis is replaced by it, never the reverse
+    assert store.upsert({'opportunity_id': '5', 'title': 'Forecast', 'is_forecast': True}) == 'new'
+    assert store.upsert({'opportunity_id': '5', 'title': 'Synopsis', 'is_forecast': False}) == 'updated'
+    assert store.upsert({'opportunity_id': '5', 'title': 'Forecast', 'is_forecast': True}) is None
+    assert [g['title'] for g in store.query() if g.get('opportunity_id') == '5'] == ['Synopsis']
+    print(store.history('1'))
+    print("Opportunity store tests passed!")